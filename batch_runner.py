@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Offline batch runner: answer question sets over many policies without the HTTP API
+
+Reads JSONL records shaped like the query endpoint's request body, one per line:
+    {"documents": "https://.../policy.pdf", "questions": ["...", "..."]}
+    {"id": "acme-2024", "documents": ["https://.../policy.pdf", "https://.../rider.pdf"], "questions": ["..."]}
+
+Records are processed in input order with several in flight at once:
+- documents are parsed and chunked in a pool of worker processes
+- chunk and question embeddings from concurrent records share the embedding batcher
+- at most --llm-concurrency question sets call Gemini at any moment
+- a document used by several records is ingested once and dropped after its last record
+
+Each result is appended to the output JSONL as soon as it is ready (completion
+order, keyed by input line). Re-running with the same output resumes: lines already
+answered are skipped and failed ones are retried.
+
+Usage:
+    python batch_runner.py nightly.jsonl --output answers.jsonl
+    python batch_runner.py nightly.jsonl --output answers.jsonl --parse-workers 8 --llm-concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+from config.settings import settings
+from models.schemas import QueryRequest
+from services.resources import apply_allocation, available_cpus, plan_allocation
+from services.sibling_tasks import gather_or_cancel
+
+
+# Key of the stand-in record for an input line that is not a JSON object
+INVALID_LINE = "_invalid_line"
+
+
+def read_records(path: str) -> List[Tuple[int, Dict]]:
+    """Input records with their 1-based line numbers; blank lines are skipped.
+
+    A line that is not a JSON object becomes a record that fails with the reason,
+    so one bad line is reported in the output instead of aborting the batch.
+    """
+    records = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {INVALID_LINE: f"Invalid JSON: {str(e)}"}
+            if not isinstance(record, dict):
+                record = {INVALID_LINE: f"Expected a JSON object, got {type(record).__name__}"}
+            records.append((line_number, record))
+    return records
+
+
+def completed_lines(path: str) -> Set[int]:
+    """Input lines already answered in an earlier run; a line cut off by an interruption is dropped"""
+    done: Set[int] = set()
+    if not os.path.exists(path):
+        return done
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                result = json.loads(raw)
+            except ValueError:
+                break
+            valid_bytes += len(raw)
+            # A later retry of a failed line supersedes the failure
+            if "error" in result:
+                done.discard(result["line"])
+            else:
+                done.add(result["line"])
+    if valid_bytes < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+class BatchRunner:
+    """Streams records through one QueryEngine with bounded ingestion and LLM concurrency"""
+
+    def __init__(self, engine, output_path: str, records_in_flight: int):
+        self.engine = engine
+        self.output_path = output_path
+        self.records_in_flight = records_in_flight
+        self.pending_uses: Dict[str, int] = {}  # blob URL -> records still to use it
+        self.answered = 0
+        self.failed = 0
+        self.questions = 0
+        self._output = None
+
+    async def run(self, records: List[Tuple[int, Dict]]):
+        for _, record in records:
+            try:
+                urls = set(self._request(record).document_urls())
+            except Exception:
+                continue  # Reported as a failed line when its turn comes
+            for url in urls:
+                self.pending_uses[url] = self.pending_uses.get(url, 0) + 1
+
+        queue = iter(records)
+        start = time.perf_counter()
+        with open(self.output_path, "a") as self._output:
+            async def worker():
+                for line_number, record in queue:
+                    await self._process(line_number, record)
+                    self._progress(len(records), start)
+            await asyncio.gather(*[worker() for _ in range(self.records_in_flight)])
+        print(file=sys.stderr)
+
+    def _request(self, record: Dict) -> QueryRequest:
+        if INVALID_LINE in record:
+            raise ValueError(record[INVALID_LINE])
+        return QueryRequest(**{key: value for key, value in record.items() if key != "id"})
+
+    async def _process(self, line_number: int, record: Dict):
+        result = {"line": line_number}
+        if "id" in record:
+            result["id"] = record["id"]
+        urls = []
+        try:
+            request = self._request(record)
+            urls = list(dict.fromkeys(request.document_urls()))
+            # A failed ingestion cancels its siblings before the finally below releases their documents
+            document_ids = await gather_or_cancel([self.engine.ingest_document(url, retain=True) for url in urls])
+            result["answers"] = await self.engine.answer_questions(list(document_ids), request.questions)
+            self.answered += 1
+            self.questions += len(request.questions)
+        except Exception as e:
+            result["error"] = str(e)
+            self.failed += 1
+        finally:
+            for url in urls:
+                self.pending_uses[url] -= 1
+                if not self.pending_uses[url]:
+                    self.engine.release_document(self.engine.document_id_for(url))
+        # One line per record, flushed at once, so an interrupted run loses at most the lines in flight
+        self._output.write(json.dumps(result) + "\n")
+        self._output.flush()
+
+    def _progress(self, total: int, start: float):
+        elapsed = time.perf_counter() - start
+        done = self.answered + self.failed
+        print(f"\r{done}/{total} records ({self.failed} failed)  "
+              f"{done / elapsed:.2f} records/s  {self.questions / elapsed:.2f} questions/s",
+              end="", file=sys.stderr, flush=True)
+
+
+def configure(llm_concurrency: int, records_in_flight: int):
+    """Admission limits sized for the runner's own concurrency: queue instead of shedding"""
+    settings.MAX_CONCURRENT_ANSWERING = llm_concurrency
+    settings.MAX_WAITING_ANSWERING = records_in_flight
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL of {documents, questions} records")
+    parser.add_argument("--output", required=True, help="Results JSONL; appended to and resumed from")
+    parser.add_argument("--parse-workers", type=int, default=available_cpus()["effective"], help="Processes parsing documents")
+    parser.add_argument("--llm-concurrency", type=int, default=settings.MAX_CONCURRENT_ANSWERING,
+                        help="Question sets calling Gemini at once")
+    parser.add_argument("--records-in-flight", type=int, help="Records being ingested or answered at once "
+                        "(default: twice --llm-concurrency, so ingestion overlaps answering)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the engine's per-question logging")
+    args = parser.parse_args()
+
+    records_in_flight = args.records_in_flight or 2 * args.llm_concurrency
+    configure(args.llm_concurrency, records_in_flight)
+
+    records = read_records(args.input)
+    done = completed_lines(args.output)
+    pending = [(line_number, record) for line_number, record in records if line_number not in done]
+    print(f"{len(records)} records, {len(records) - len(pending)} already answered, {len(pending)} to run", file=sys.stderr)
+    if not pending:
+        return
+
+    # One process doing bulk ingestion: size torch and FAISS threads before the encoder loads
+    apply_allocation(plan_allocation(workers=1, policy="ingestion"))
+    from services.query_engine import QueryEngine
+    from services.parse_pool import ParsePool
+
+    stdout = sys.stdout
+    if not args.verbose:
+        # The engine logs every stage to stdout
+        sys.stdout = open(os.devnull, "w")
+    engine = QueryEngine()
+    engine.parse_pool = ParsePool(args.parse_workers, engine.embedding_service.tokenizer, quiet=not args.verbose)
+    runner = BatchRunner(engine, args.output, records_in_flight)
+    try:
+        asyncio.run(runner.run(pending))
+    finally:
+        engine.parse_pool.shutdown()
+        sys.stdout = stdout
+    print(f"Answered {runner.answered} records ({runner.questions} questions), {runner.failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: LLM input tokens and latency, full prompts vs a per-document context cache
+
+Each policy is chunked and fact-sheeted as at ingestion, then every question is
+answered through LLMService.generate_answer_async with the chunks a simple word
+overlap ranks highest (retrieval quality does not matter here, prompt size does).
+Two modes are compared:
+- full prompts: instructions and all retrieved sections sent with every question
+- context cache: instructions and high-value sections registered once per document
+  with the local stand-in provider; questions send only the sections it lacks
+
+The stand-in Gemini answers after --llm-latency-ms plus --prefill-ms-per-1k for
+every 1,000 prompt tokens it has not cached, so latency follows the input tokens
+processed. Reports input tokens processed per question, tokens served from the
+cache, prefix tokens registered and mean call latency.
+
+Usage:
+    python -m benchmarks.bench_context_cache [--documents a.pdf b.docx] [--questions-per-document 12]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import re
+import tempfile
+import time
+
+import google.generativeai as genai
+
+from config.settings import settings
+from benchmarks.load_test import DEFAULT_QUESTIONS, StandInGemini, write_sample_policies
+from models.schemas import RetrievalResult
+from services.document_processor import DocumentProcessor
+from services.fact_sheet import FactExtractor
+
+WORD = re.compile(r'[a-z]{3,}')
+
+
+def ingest(paths):
+    """(key, chunks, fact chunk ids) per document, as QueryEngine prepares them"""
+    processor = DocumentProcessor()
+    extractor = FactExtractor(processor.detect_section_type)
+    documents = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            chunks = processor.process_file(path, path)
+            facts = extractor.extract(chunks).to_dict()
+            documents.append((path, chunks, {fact["chunk_id"] for fact in facts.values()}))
+    return documents
+
+
+def retrieve(question, chunks, top_k):
+    """Chunks sharing the most words with the question"""
+    words = set(WORD.findall(question.lower()))
+    scored = sorted(((len(words & set(WORD.findall(chunk.text.lower()))) / (len(words) or 1), chunk) for chunk in chunks),
+                    key=lambda pair: pair[0], reverse=True)
+    return [RetrievalResult(chunk=chunk, score=score) for score, chunk in scored[:top_k]]
+
+
+async def run(documents, questions, cached):
+    from services.llm_service import LLMService
+
+    settings.CONTEXT_CACHE_ENABLED = cached
+    settings.CONTEXT_CACHE_PROVIDER = "local"
+    service = LLMService()
+    for key, chunks, fact_chunk_ids in documents:
+        service.prepare_document(key, chunks, fact_chunk_ids)
+    start = time.perf_counter()
+    for key, chunks, _ in documents:
+        for question in questions:
+            await service.generate_answer_async(question, retrieve(question, chunks, settings.TOP_K_RETRIEVAL), key)
+        service.context_cache.release(key)
+    return service.context_cache.stats(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", help="Policy PDF/DOCX files (default: synthetic policies)")
+    parser.add_argument("--questions-per-document", type=int, default=12)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Stand-in Gemini latency before prefill")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=100, help="Stand-in Gemini latency per 1,000 uncached input tokens")
+    args = parser.parse_args()
+
+    StandInGemini.latency = args.llm_latency_ms / 1000.0
+    StandInGemini.prefill_per_1k_tokens = args.prefill_ms_per_1k / 1000.0
+    genai.GenerativeModel = StandInGemini
+
+    if args.documents:
+        paths = args.documents
+    else:
+        directory = tempfile.mkdtemp(prefix="bench-context-cache-")
+        paths = [os.path.join(directory, name) for name in write_sample_policies(directory)]
+    documents = ingest(paths)
+    questions = (DEFAULT_QUESTIONS * args.questions_per_document)[:args.questions_per_document]
+    print(f"{len(documents)} documents, {sum(len(chunks) for _, chunks, _ in documents)} chunks, "
+          f"{len(questions)} questions each, top {settings.TOP_K_RETRIEVAL} chunks per question")
+
+    print(f"{'mode':<16}{'calls':>7}{'input tok/q':>13}{'from cache':>12}{'registered':>12}{'mean ms':>9}{'total s':>9}")
+    for cached in (False, True):
+        stats, seconds = asyncio.run(run(documents, questions, cached))
+        calls = stats["cached_calls"] + stats["uncached_calls"]
+        mean_ms = stats["mean_cached_call_ms"] if cached else stats["mean_uncached_call_ms"]
+        print(f"{'context cache' if cached else 'full prompts':<16}{calls:>7}{stats['uncached_prompt_tokens'] / calls:>13.0f}"
+              f"{stats['tokens_saved']:>12}{stats['prefix_tokens_registered']:>12}{mean_ms:>9.0f}{seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: DOCX text extraction, python-docx object model vs streaming iterparse
+
+Three extractors run on the same policies, each in a fresh process so peak
+memory is its own (lxml's tree is invisible to tracemalloc, so resident set
+size is compared):
+- python-docx paragraphs: the previous extract_text_from_docx, tables skipped
+- python-docx + tables: the same object model walked for paragraphs and table rows
+- streaming: DocumentProcessor.extract_structured_docx over services.docx_stream
+
+Reports the size of the uncompressed word/document.xml, seconds, peak memory
+growth over the interpreter's baseline, characters extracted and heading-styled
+lines found. Without --documents, synthetic policies of --sections sections are
+written, each with a styled heading, clauses and a schedule-of-benefits table.
+
+Usage:
+    python -m benchmarks.bench_docx_extraction [--documents a.docx] [--sections 500 2000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from benchmarks.load_test import POLICY_CLAUSES, SECTIONS
+
+MODES = ["python-docx paragraphs", "python-docx + tables", "streaming"]
+
+
+def write_policy(directory: str, sections: int) -> str:
+    import docx
+
+    rng = random.Random(11)
+    document = docx.Document()
+    document.add_heading("Health Insurance Policy Wording", 0)
+    for n in range(sections):
+        document.add_heading(f"{SECTIONS[n % len(SECTIONS)].title()} {n + 1}", 1)
+        for i in range(rng.randint(2, 6)):
+            document.add_paragraph(f"{n + 1}.{i + 1} {rng.choice(POLICY_CLAUSES)}")
+        table = document.add_table(rows=4, cols=3)
+        for row, cells in enumerate([("Benefit", "Limit", "Waiting period"),
+                                     ("Room rent", f"{rng.randint(1, 3)}% of sum insured", "None"),
+                                     ("ICU charges", f"{rng.randint(2, 5)}% of sum insured", "None"),
+                                     ("Cataract", f"Rs. {rng.randint(20, 60)},000 per eye", f"{rng.randint(1, 3)} years")]):
+            for column, value in enumerate(cells):
+                table.cell(row, column).text = value
+    path = os.path.join(directory, f"policy_{sections}_sections.docx")
+    document.save(path)
+    return path
+
+
+def extract(mode: str, path: str):
+    """Characters extracted and heading lines found by one extractor"""
+    if mode == "streaming":
+        from services.document_processor import DocumentProcessor
+        text, heading_starts = DocumentProcessor().extract_structured_docx(path)
+        return len(text), len(heading_starts)
+    import docx
+    document = docx.Document(path)
+    if mode == "python-docx paragraphs":
+        text = ""
+        for paragraph in document.paragraphs:
+            text += paragraph.text + "\n"
+        return len(text), 0
+    lines = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        lines.extend(" | ".join(cell.text for cell in row.cells) for row in table.rows)
+    return len("\n".join(lines)), 0
+
+
+def measure(mode: str, path: str) -> dict:
+    """Run in the child process: import everything first, so only extraction counts toward peak memory"""
+    import docx  # noqa: F401
+    from services.document_processor import DocumentProcessor  # noqa: F401
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    characters, headings = extract(mode, path)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"seconds": seconds, "peak_mb": (peak - baseline) / 1024, "characters": characters, "headings": headings}
+
+
+def run(mode: str, path: str) -> dict:
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_docx_extraction", "--measure", mode, path],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", help="DOCX policies (default: synthetic policies)")
+    parser.add_argument("--sections", type=int, nargs="*", default=[500, 2000], help="Sections per synthetic policy")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per extractor; the fastest is reported")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    paths = args.documents or [write_policy(tempfile.mkdtemp(prefix="bench-docx-"), n) for n in args.sections]
+    print(f"{'document':<32}{'XML MB':>7}  {'extractor':<24}{'seconds':>9}{'peak MB':>9}{'chars':>11}{'headings':>10}")
+    for path in paths:
+        with zipfile.ZipFile(path) as archive:
+            size = archive.getinfo("word/document.xml").file_size / 1024 / 1024
+        for mode in MODES:
+            results = [run(mode, path) for _ in range(args.repeat)]
+            best = min(results, key=lambda result: result["seconds"])
+            peak = min(result["peak_mb"] for result in results)
+            print(f"{os.path.basename(path)[:31]:<32}{size:>7.1f}  {mode:<24}{best['seconds']:>9.2f}{peak:>9.1f}"
+                  f"{best['characters']:>11}{best['headings']:>10}")
+
+
+if __name__ == "__main__":
+    main()
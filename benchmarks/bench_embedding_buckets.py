@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark: padding waste and encode throughput, one pass per batch vs length buckets
+
+Chunks policy documents the way ingestion does and encodes the chunks in batches
+of --batch-size, in document order, as the embedding batcher hands them over.
+Each batch also carries --questions short question texts, as it does when
+queries arrive during ingestion. Two modes are compared:
+- single pass: the whole batch in one forward pass, padded to its longest chunk
+- bucketed: EmbeddingService._encode_batch, sorted into token-budgeted passes
+
+Reports real and padded tokens, padding waste, throughput, the token budget the
+tuner settled on, and checks both modes return the same vectors in the same order.
+
+Without --documents, synthetic DOCX policies are written with sections of one
+to twenty clauses, so chunk lengths vary the way section tails make them vary
+in real wordings; pass real policy PDFs or DOCX files for representative
+numbers. When the embedding model cannot be downloaded, a randomly initialised
+encoder with the same architecture (6 layers, 384 hidden, 12 heads) stands in:
+the values differ, the compute per token does not.
+
+Usage:
+    python -m benchmarks.bench_embedding_buckets [--documents a.pdf b.docx] [--batch-size 64 128] [--questions 8]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from config.settings import settings
+from services.document_processor import DocumentProcessor
+from services.embedding_service import EmbeddingService
+from services.length_buckets import LengthBucketer
+from benchmarks.load_test import DEFAULT_QUESTIONS, POLICY_CLAUSES, SECTIONS
+
+
+def load_model(texts):
+    from sentence_transformers import SentenceTransformer
+    try:
+        return SentenceTransformer(settings.EMBEDDING_MODEL), False
+    except Exception:
+        return stand_in_model(texts), True
+
+
+def stand_in_model(texts):
+    """Same-architecture encoder with random weights and a word-level vocabulary built from the texts"""
+    from sentence_transformers import SentenceTransformer, models
+
+    directory = write_stand_in_encoder(texts)
+    return SentenceTransformer(modules=[models.Transformer(directory, max_seq_length=256), models.Pooling(384, "mean")])
+
+
+def write_stand_in_encoder(texts) -> str:
+    """Save the stand-in encoder's weights and tokenizer; returns the directory"""
+    from tokenizers import Tokenizer, models as tokenizer_models, pre_tokenizers, processors, trainers
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    directory = tempfile.mkdtemp(prefix="stand-in-encoder-")
+    tokenizer = Tokenizer(tokenizer_models.WordLevel(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.train_from_iterator(texts, trainers.WordLevelTrainer(special_tokens=["[PAD]", "[UNK]", "[CLS]", "[SEP]"]))
+    tokenizer.post_processor = processors.TemplateProcessing(single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)])
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="[PAD]", unk_token="[UNK]", cls_token="[CLS]",
+                            sep_token="[SEP]", model_max_length=256).save_pretrained(directory)
+    config = BertConfig(vocab_size=max(tokenizer.get_vocab_size(), 8), hidden_size=384, num_hidden_layers=6,
+                        num_attention_heads=12, intermediate_size=1536, max_position_embeddings=512)
+    BertModel(config).save_pretrained(directory)
+    return directory
+
+
+def write_policies(directory: str, count: int = 8):
+    """Synthetic DOCX policies whose sections range from a single clause to twenty"""
+    import docx
+
+    rng = random.Random(5)
+    paths = []
+    for n in range(count):
+        document = docx.Document()
+        document.add_paragraph(f"HEALTH INSURANCE POLICY WORDING {n + 1}")
+        for part in range(4):
+            for section in SECTIONS:
+                document.add_paragraph(f"{section} - PART {part + 1}")
+                for i in range(rng.choice([1, 1, 2, 3, 5, 8, 12, 20])):
+                    document.add_paragraph(f"{part + 1}.{i + 1} {rng.choice(POLICY_CLAUSES)}")
+        path = os.path.join(directory, f"policy_{n + 1}.docx")
+        document.save(path)
+        paths.append(path)
+    return paths
+
+
+def document_paths(paths):
+    return paths or write_policies(tempfile.mkdtemp(prefix="bench-buckets-"))
+
+
+def chunk_documents(paths, tokenizer):
+    processor = DocumentProcessor(tokenizer=tokenizer)
+    chunks = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            chunks.extend(processor.process_file(path, path))
+    return [chunk.text for chunk in chunks]
+
+
+def make_service(model):
+    """EmbeddingService around an already loaded model, without its batcher thread"""
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.model = model
+    service.tokenizer = model.tokenizer
+    service.dimension = 384
+    service.bucketer = LengthBucketer()
+    return service
+
+
+def batches(texts, batch_size, questions):
+    """Batcher batches: consecutive chunks plus questions from concurrent requests"""
+    rng = random.Random(3)
+    step = max(1, batch_size - questions)
+    return [texts[offset:offset + step] + rng.sample(DEFAULT_QUESTIONS * questions, questions)
+            for offset in range(0, len(texts), step)]
+
+
+def run(service, batch_list, bucketed):
+    vectors = []
+    real = padded = 0
+    start = time.perf_counter()
+    for batch in batch_list:
+        batch_lengths = service._token_lengths(batch)
+        real += int(batch_lengths.sum())
+        if bucketed:
+            before = service.bucketer.stats()["padded_tokens"]
+            vectors.append(service._encode_batch(batch))
+            padded += service.bucketer.stats()["padded_tokens"] - before
+        else:
+            vectors.append(service.model.encode(batch, batch_size=len(batch), convert_to_numpy=True, normalize_embeddings=True))
+            padded += len(batch) * int(batch_lengths.max())
+    seconds = time.perf_counter() - start
+    return np.concatenate(vectors), {"seconds": seconds, "real": real, "padded": padded,
+                                     "texts": sum(len(batch) for batch in batch_list)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", nargs="*", help="Policy PDF/DOCX files (default: synthetic policies)")
+    parser.add_argument("--batch-size", type=int, nargs="*", default=[settings.EMBEDDING_MAX_BATCH_SIZE],
+                        help="Texts per batcher batch")
+    parser.add_argument("--questions", type=int, default=8, help="Question texts mixed into each batch")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the chunks per mode; the first ones also tune")
+    args = parser.parse_args()
+
+    paths = document_paths(args.documents)
+    model, stand_in = load_model(chunk_documents(paths, None))
+    texts = chunk_documents(paths, model.tokenizer)
+    service = make_service(model)
+    lengths = service._token_lengths(texts)
+    print(f"{len(texts)} chunks from {len(paths)} documents, tokens min {lengths.min()} median {int(np.median(lengths))} "
+          f"max {lengths.max()}{'  (stand-in encoder)' if stand_in else ''}")
+    model.encode(texts[:8])
+
+    print(f"{'batch':>6} {'mode':<12}{'real tok':>10}{'padded tok':>12}{'waste':>8}{'texts/s':>10}{'budget':>8}")
+    for batch_size in args.batch_size:
+        service.bucketer = LengthBucketer()
+        batch_list = batches(texts, batch_size, args.questions)
+        results = {}
+        for bucketed in (False, True):
+            for _ in range(args.repeat):
+                vectors, result = run(service, batch_list, bucketed)
+            results[bucketed] = vectors
+            mode = "bucketed" if bucketed else "single pass"
+            budget = service.bucketer.budget if bucketed else "-"
+            print(f"{batch_size:>6} {mode:<12}{result['real']:>10}{result['padded']:>12}"
+                  f"{1 - result['real'] / result['padded']:>8.1%}{result['texts'] / result['seconds']:>10.1f}{budget:>8}")
+        # Padding is masked out of the pooled output, so only float noise may differ
+        difference = float(np.abs(results[True] - results[False]).max())
+        print(f"{'':>6} same vectors in input order: {difference < 1e-4} (max abs difference {difference:.2e})")
+    print(f"Tuner throughput by budget (real tokens/s): {service.bucketer.stats()['tokens_per_second']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encoder-to-FAISS embedding hand-off, nested lists vs one float32 matrix
+
+Starts from a (chunks, 384) float32 matrix as the encoder returns it and times
+getting it into a FAISS index. The previous path converted it with .tolist(),
+stored a List[float] on every DocumentChunk and rebuilt and normalized each row
+in Python. The current path gives the chunks row offsets and hands the matrix to
+FAISS. Also reports peak traced memory during the hand-off.
+
+Usage:
+    python -m benchmarks.bench_embedding_path [--chunks 5000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import time
+import tracemalloc
+
+import faiss
+import numpy as np
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+from models.schemas import DocumentChunk
+from services.vector_store import VectorStore
+
+DIMENSION = 384
+
+
+class LegacyDocumentChunk(BaseModel):
+    """DocumentChunk as it was, with the embedding as a list of floats"""
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+    embedding: Optional[List[float]] = None
+
+
+def legacy_path(matrix: np.ndarray):
+    embeddings = matrix.tolist()
+    chunks = [LegacyDocumentChunk(id=f"chunk_{i}", text="text", metadata={"type": "coverage"}) for i in range(len(matrix))]
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk.embedding = embedding
+
+    index = faiss.IndexFlatIP(DIMENSION)
+    vectors = []
+    for chunk in chunks:
+        embedding = np.array(chunk.embedding, dtype=np.float32)
+        vectors.append(embedding / np.linalg.norm(embedding))
+    index.add(np.array(vectors, dtype=np.float32))
+    return index, chunks
+
+
+def matrix_path(matrix: np.ndarray):
+    chunks = [DocumentChunk(id=f"chunk_{i}", text="text", metadata={"type": "coverage"}) for i in range(len(matrix))]
+    for row, chunk in enumerate(chunks):
+        chunk.embedding_row = row
+    store = VectorStore(index_path=None, metadata_path=None)
+    store.store_chunks(chunks, matrix)
+    return store.index, chunks
+
+
+def measure(path, matrix: np.ndarray, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        data = matrix.copy()
+        gc.collect()
+        start = time.perf_counter()
+        result = path(data)
+        timings.append(time.perf_counter() - start)
+        del result
+
+    data = matrix.copy()
+    gc.collect()
+    tracemalloc.start()
+    result = path(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    matrix = rng.randn(args.chunks, DIMENSION).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):  # VectorStore logs each store
+        results = {name: measure(path, matrix, args.repeat) for name, path in (("lists", legacy_path), ("matrix", matrix_path))}
+
+    print(f"{args.chunks} chunks x {DIMENSION} dims")
+    print(f"{'path':<10}{'seconds':>10}{'peak MB':>10}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<10}{seconds:>10.3f}{peak / 1e6:>10.1f}")
+    lists, current = results["lists"], results["matrix"]
+    print(f"Speedup: {lists[0] / current[0]:.1f}x, peak memory {lists[1] / max(current[1], 1):.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: extractive fast path hit rate, precision and latency
+
+Each case is a question, its intent, the retrieved chunk texts in rank order and
+the expected normalized value ("30 day", "INR 5000", "10%"), or null when the
+answer is not stated and the question should go to the LLM. Reports how many
+eligible questions were answered without the LLM, how many of those answers were
+right, extraction latency and the LLM time saved at --llm-latency-ms per call.
+
+Usage:
+    python -m benchmarks.bench_extractive [--cases cases.jsonl] [--repeat 200] [--llm-latency-ms 1200]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from models.schemas import DocumentChunk, RetrievalResult
+from services.extractive_answerer import ExtractiveAnswerer
+
+GRACE = "A grace period of thirty (30) days is provided for payment of the renewal premium after the due date."
+PED = "Pre-existing diseases shall be covered after a waiting period of thirty-six (36) months of continuous coverage."
+MATERNITY = "Maternity expenses are covered after a waiting period of 24 months from the first policy inception."
+POST_HOSP = "Post-hospitalization medical expenses are covered for up to 60 days from the date of discharge."
+PRE_HOSP = "Pre-hospitalization medical expenses incurred up to 30 days before admission are covered."
+ROOM_RENT = "Room rent is limited to 1% of the sum insured per day subject to a maximum of INR 5,000 per day."
+COPAY = "A co-payment of 10% applies to every admissible claim for insured persons above 60 years."
+NCD = "A No Claim Discount of 5% of the base premium is allowed on renewal for every claim-free year."
+CLAIM_NOTICE = "Claims must be intimated within 7 days of hospitalization and documents submitted within 15 days of discharge."
+CATARACT = "Cataract treatment is limited to Rs. 40,000 per eye in a policy year."
+DEFINITION = "Hospital means an institution established for in-patient care with at least 10 in-patient beds."
+FILLER = "The Company may cancel this policy on grounds of misrepresentation or fraud by the insured person."
+
+DEFAULT_CASES = [
+    ("What is the grace period for premium payment?", "time_period", [GRACE, PED, FILLER], "30 day"),
+    ("What is the waiting period for pre-existing diseases?", "time_period", [PED, GRACE, MATERNITY], "36 month"),
+    ("What is the waiting period for maternity expenses?", "time_period", [MATERNITY, PED, GRACE], "24 month"),
+    ("How many days of post-hospitalization expenses are covered?", "specific_value", [POST_HOSP, PRE_HOSP, FILLER], "60 day"),
+    ("How many days of pre-hospitalization expenses are covered?", "specific_value", [PRE_HOSP, POST_HOSP, FILLER], "30 day"),
+    ("What is the maximum room rent limit?", "limits", [ROOM_RENT, CATARACT, FILLER], "INR 5000"),
+    ("What is the co-pay percentage?", "specific_value", [FILLER, COPAY, NCD], "10%"),
+    ("What is the no claim discount?", "specific_value", [NCD, COPAY, FILLER], "5%"),
+    ("What is the limit for cataract treatment?", "limits", [CATARACT, ROOM_RENT, FILLER], "INR 40000"),
+    ("Within how many days must a claim be intimated?", "time_period", [CLAIM_NOTICE, GRACE, FILLER], "7 day"),
+    # Not stated in the retrieved text: must fall back to the LLM
+    ("What is the waiting period for hernia surgery?", "time_period", [PED, MATERNITY, FILLER], None),
+    ("What is the ambulance cover limit?", "limits", [ROOM_RENT, FILLER, DEFINITION], None),
+    ("How long is the free look period?", "time_period", [FILLER, DEFINITION, GRACE], None),
+    # Not an extractive intent
+    ("What is the definition of hospital?", "definition", [DEFINITION, FILLER, GRACE], None),
+]
+
+
+def load_cases(path):
+    cases = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                case = json.loads(line)
+                cases.append((case["question"], case["intent"], case["chunks"], case.get("expected")))
+    return cases
+
+
+def to_results(texts):
+    return [
+        RetrievalResult(chunk=DocumentChunk(id=str(i), text=text, metadata={"has_numbers": any(c.isdigit() for c in text)}), score=1.0 - 0.1 * i)
+        for i, text in enumerate(texts)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", help="JSONL of {question, intent, chunks, expected}")
+    parser.add_argument("--repeat", type=int, default=200, help="Timing repetitions per case")
+    parser.add_argument("--llm-latency-ms", type=float, default=1200, help="Typical Gemini answer latency, for savings")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases) if args.cases else DEFAULT_CASES
+    answerer = ExtractiveAnswerer()
+
+    answered = correct = wrong = missed = 0
+    latencies = []
+    for question, intent, texts, expected in cases:
+        results = to_results(texts)
+        query_intent = {"intent_type": intent}
+        answer = answerer.answer(question, query_intent, results)
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            answerer.answer(question, query_intent, results)
+            timings.append((time.perf_counter() - start) * 1e6)
+        latencies.append(float(np.median(timings)))
+
+        if answer is None:
+            outcome = "llm" if expected is None else "missed"
+            missed += expected is not None
+        else:
+            answered += 1
+            ok = expected is not None and expected in answer.value.split(", ")
+            correct += ok
+            wrong += not ok
+            outcome = "correct" if ok else "WRONG"
+        if args.verbose or outcome in ("WRONG", "missed"):
+            print(f"[{outcome:>7}] {question} -> {answer.value if answer else None} (expected {expected})")
+
+    answerable = sum(1 for case in cases if case[3] is not None)
+    print(f"\nCases: {len(cases)} ({answerable} with the value in the retrieved text)")
+    print(f"Answered without LLM: {answered}  correct: {correct}  wrong: {wrong}  missed: {missed}")
+    print(f"Hit rate on answerable: {correct / answerable:.1%}" if answerable else "Hit rate: n/a")
+    print(f"Precision: {correct / answered:.1%}" if answered else "Precision: n/a")
+    print(f"Extraction latency: median {np.median(latencies):.0f} us, p95 {np.percentile(latencies, 95):.0f} us per question")
+    print(f"LLM time saved: {answered * args.llm_latency_ms / 1000:.1f}s over {len(cases)} questions "
+          f"({answered / len(cases):.0%} of calls at {args.llm_latency_ms:.0f} ms each)")
+
+
+if __name__ == "__main__":
+    main()
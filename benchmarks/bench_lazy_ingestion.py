@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to first answer on a very large policy, eager vs lazy ingestion
+
+Writes a synthetic PDF of --pages pages. Every page holds a numbered clause set,
+and a few pages state the facts the questions ask about. The PDF is then
+ingested and the questions answered twice, each time with a fresh engine:
+- LAZY_INGESTION_ENABLED off: every chunk is embedded
+- on: a BM25 page index, then only the pages the questions select
+
+Gemini is replaced by the load test's fixed-latency stand-in, so the difference
+is parsing, embedding and indexing. The questions are ones the fact sheet cannot
+answer, so each goes through retrieval. Reports time to first answer, chunks
+embedded and how many of the fact-bearing chunks made it into the index.
+
+Usage:
+    python -m benchmarks.bench_lazy_ingestion [--pages 400] [--questions 3]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import fitz
+
+from benchmarks.load_test import POLICY_CLAUSES, SECTIONS, StandInGemini, start_blob_server
+
+# Retrieval questions; value questions would be answered from the fact sheet
+QUESTIONS = [
+    "Does this policy cover maternity expenses?",
+    "Are post-hospitalization expenses reimbursed after discharge?",
+    "Is cosmetic or aesthetic treatment excluded?",
+    "When must claims be submitted after discharge?",
+]
+
+FILLER = [
+    "The Company may at its discretion verify the particulars of the insured person and the proposal form.",
+    "Any notice or communication under this policy shall be in writing and delivered to the registered address.",
+    "The policy schedule, proposal and endorsements together form one contract and shall be read together.",
+    "Disputes regarding the quantum of a claim admitted shall be referred to arbitration under the applicable law.",
+    "The insured person shall take all reasonable steps to prevent loss and to minimise the amount of any claim.",
+]
+
+
+def write_policy(path: str, pages: int, fact_pages: int = 10):
+    """Synthetic PDF: filler clauses everywhere, the real facts on a handful of pages"""
+    rng = random.Random(11)
+    facts_at = set(rng.sample(range(pages), min(fact_pages, pages)))
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        lines = [f"{SECTIONS[number % len(SECTIONS)]} PART {number + 1}"]
+        for clause in range(30):
+            lines.append(f"{number + 1}.{clause + 1} {rng.choice(FILLER)} Reference {number}-{clause}.")
+        if number in facts_at:
+            lines.extend(rng.sample(POLICY_CLAUSES, 3))
+        page.insert_textbox(fitz.Rect(40, 40, 560, 820), "\n".join(lines), fontsize=7)
+    document.save(path)
+    document.close()
+
+
+async def run(url: str, questions, lazy: bool):
+    import google.generativeai as genai
+    from config.settings import settings
+    from services.query_engine import QueryEngine
+
+    genai.GenerativeModel = StandInGemini
+    settings.LAZY_INGESTION_ENABLED = lazy
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = QueryEngine()
+        engine.embedding_service.encode_texts(["warm up"])
+        start = time.perf_counter()
+        document_id = await engine.ingest_document(url, retain=True)
+        ingested = time.perf_counter() - start
+        await engine.answer_questions([document_id], questions[:1])
+        first_answer = time.perf_counter() - start
+        await engine.answer_questions([document_id], questions[1:])
+        all_answers = time.perf_counter() - start
+    content_hash = engine.documents[document_id]
+    store = await engine.index_pool.get(content_hash)
+    texts = [chunk_data["text"] for chunk_data in store.chunks_metadata.values()]
+    fact_chunks = sum(1 for text in texts if any(clause[:40] in text for clause in POLICY_CLAUSES))
+    return {"ingest": ingested, "first": first_answer, "all": all_answers, "chunks": engine.document_chunks(document_id),
+            "embedded": store.index.ntotal, "fact_chunks": fact_chunks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Stand-in Gemini latency")
+    args = parser.parse_args()
+
+    StandInGemini.latency = args.llm_latency_ms / 1000.0
+    StandInGemini.intent_latency = 0
+    directory = tempfile.mkdtemp()
+    write_policy(os.path.join(directory, "large_policy.pdf"), args.pages)
+    base_url = start_blob_server(directory, "127.0.0.1")
+    questions = QUESTIONS[:args.questions]
+
+    from config.settings import settings
+    print(f"{args.pages} pages, {len(questions)} questions, lazy above {settings.LAZY_INGESTION_MIN_CHUNKS} chunks")
+    print(f"{'mode':<8}{'ingest s':>10}{'first s':>10}{'all s':>10}{'embedded':>16}{'fact chunks':>13}")
+    for lazy in (False, True):
+        # A distinct URL per run, so the second engine cannot share anything with the first
+        result = asyncio.run(run(f"{base_url}/large_policy.pdf?run={int(lazy)}", questions, lazy))
+        print(f"{'lazy' if lazy else 'eager':<8}{result['ingest']:>10.2f}{result['first']:>10.2f}{result['all']:>10.2f}"
+              f"{result['embedded']:>8}/{result['chunks']:<7}{result['fact_chunks']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled TermMatcher vs the previous per-term substring loops
+
+Usage:
+    python -m benchmarks.bench_term_matcher [--text-file policy.txt] [--chunks 2000]
+"""
+import argparse
+import random
+import time
+
+from services.term_matcher import term_matcher, LEXICON, CHUNK_GROUPS
+
+SAMPLE_SENTENCES = [
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "Pre-existing diseases shall be covered after a waiting period of thirty-six (36) months.",
+    "Accident means a sudden, unforeseen and involuntary event caused by external means.",
+    "The Company shall not be liable for any claim arising out of excluded conditions.",
+    "Room rent is limited to one percent of the sum insured per day subject to a maximum of INR 5,000.",
+    "Claims must be submitted within fifteen days of discharge along with all documents.",
+    "Maternity expenses are covered after a continuous coverage of twenty-four months.",
+    "The insured person shall bear a co-pay of 10% on every admissible claim.",
+    "Post-hospitalization expenses are reimbursed for up to 180 days from discharge.",
+    "Cosmetic surgery is not covered unless required due to an accident.",
+    "The policy may be renewed on payment of the renewal premium before expiry.",
+    "Hospital means any institution established for in-patient care and day care treatment.",
+]
+
+QUERIES = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does this policy cover maternity expenses?",
+    "What is excluded under the policy?",
+    "What is the maximum room rent limit?",
+    "How many days of post-hospitalization expenses are covered?",
+]
+
+# Phrasings the whole-word matcher must still put in a group the substring loops found
+SPELLING_CASES = [
+    ("What is the co-payment on each claim?", "deductible_terms"),
+    ("Is there a copayment for senior citizens?", "deductible_terms"),
+    ("How much is the co-pay?", "deductible_terms"),
+    ("Does a copay apply to room rent?", "deductible_terms"),
+    ("A co-payment of 20% applies to every admissible claim.", "topic_deductible"),
+    ("Copayments are waived for network hospitals.", "topic_deductible"),
+]
+
+
+def legacy_detect_section_type(text: str) -> str:
+    """Previous DocumentProcessor.detect_section_type"""
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['definition', 'means', 'defined as', 'shall mean']):
+        return 'definitions'
+    elif any(word in text_lower for word in ['coverage', 'benefit', 'covered', 'insured', 'protection']):
+        return 'coverage'
+    elif any(word in text_lower for word in ['exclusion', 'excluded', 'not covered', 'does not cover']):
+        return 'exclusions'
+    elif any(word in text_lower for word in ['limit', 'maximum', 'minimum', 'deductible', 'amount']):
+        return 'limits'
+    elif any(word in text_lower for word in ['claim', 'procedure', 'process', 'submit']):
+        return 'claims'
+    elif any(word in text_lower for word in ['premium', 'payment', 'cost', 'fee']):
+        return 'premiums'
+    elif any(word in text_lower for word in ['condition', 'requirement', 'must', 'shall']):
+        return 'conditions'
+    return 'policy_clause'
+
+
+def legacy_query_boosts(score: float, query_lower: str, chunk_lower: str, section_type: str) -> float:
+    """Previous VectorStore._apply_insurance_query_boosts"""
+    if any(word in query_lower for word in ['definition', 'define', 'what is', 'meaning']):
+        if 'means' in chunk_lower or 'definition' in chunk_lower:
+            score *= 2.2
+        if section_type == 'definitions':
+            score *= 1.8
+    if any(word in query_lower for word in ['covered', 'coverage', 'benefit', 'include']):
+        if any(word in chunk_lower for word in ['covered', 'coverage', 'benefit', 'include', 'pay', 'reimburse']):
+            score *= 1.8
+    if any(word in query_lower for word in ['excluded', 'exclusion', 'not covered', 'exception']):
+        if any(word in chunk_lower for word in ['excluded', 'exclusion', 'not covered', 'exception', 'does not']):
+            score *= 1.9
+    if any(word in query_lower for word in ['days', 'months', 'years', 'period', 'duration']):
+        if any(char.isdigit() for char in chunk_lower) and any(word in chunk_lower for word in ['days', 'months', 'years']):
+            score *= 1.7
+    if any(word in query_lower for word in ['limit', 'amount', 'maximum', 'minimum', 'sum']):
+        if any(word in chunk_lower for word in ['limit', 'amount', 'maximum', 'minimum', 'sum', 'usd', 'inr', '$']):
+            score *= 1.6
+    insurance_terms = {
+        'premium': ['premium', 'payment', 'cost'],
+        'deductible': ['deductible', 'excess', 'co-pay'],
+        'claim': ['claim', 'settlement', 'reimbursement'],
+        'hospitalization': ['hospitalization', 'hospital', 'inpatient'],
+        'pre-existing': ['pre-existing', 'pre existing', 'prior condition'],
+        'waiting period': ['waiting period', 'waiting', 'exclusion period']
+    }
+    for query_term, chunk_terms in insurance_terms.items():
+        if query_term in query_lower:
+            if any(term in chunk_lower for term in chunk_terms):
+                score *= 1.5
+    return score
+
+
+def build_chunks(text_file: str, count: int) -> list:
+    """Load ~200-word chunks from a text file, or synthesize them"""
+    if text_file:
+        with open(text_file, 'r', encoding='utf-8') as f:
+            words = f.read().split()
+        return [' '.join(words[i:i + 200]) for i in range(0, len(words), 150)][:count]
+    rng = random.Random(7)
+    return [' '.join(rng.choice(SAMPLE_SENTENCES) for _ in range(12)) for _ in range(count)]
+
+
+def check_spellings() -> list:
+    """SPELLING_CASES whose group the matcher misses"""
+    return [(text, group) for text, group in SPELLING_CASES if group not in term_matcher.match(text)]
+
+
+def timed(fn, repeat: int = 3) -> float:
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text-file", help="Plain-text policy wording to chunk")
+    parser.add_argument("--chunks", type=int, default=2000)
+    args = parser.parse_args()
+
+    missed = check_spellings()
+    for text, group in missed:
+        print(f"MISSED {group}: {text}")
+    print(f"Spelling variants: {len(SPELLING_CASES) - len(missed)}/{len(SPELLING_CASES)} matched")
+    if missed:
+        raise SystemExit(1)
+
+    chunks = build_chunks(args.text_file, args.chunks)
+    print(f"Benchmarking on {len(chunks)} chunks")
+
+    # Ingestion: the legacy loops short-circuit on the first section type, so compare
+    # both that and substring scans producing the same output as one matcher pass
+    legacy_classify = timed(lambda: [legacy_detect_section_type(c) for c in chunks])
+
+    def legacy_full():
+        for c in chunks:
+            c_lower = c.lower()
+            legacy_detect_section_type(c)
+            [group for group in CHUNK_GROUPS if any(term in c_lower for term in LEXICON[group])]
+
+    def new_ingest():
+        for c in chunks:
+            hits = term_matcher.match(c)
+            term_matcher.section_type(hits)
+            term_matcher.chunk_groups(hits)
+
+    legacy_ingest = timed(legacy_full)
+    matcher_ingest = timed(new_ingest)
+    print(f"Per-chunk section type only (legacy, short-circuit): {legacy_classify / len(chunks) * 1e6:.1f}us")
+    print(f"Per-chunk section type + rerank term groups: legacy {legacy_ingest / len(chunks) * 1e6:.1f}us, "
+          f"matcher {matcher_ingest / len(chunks) * 1e6:.1f}us ({legacy_ingest / matcher_ingest:.1f}x)")
+
+    # Rerank: legacy scans every candidate's text per query; new reuses ingest-time groups
+    prepared = []
+    for c in chunks:
+        hits = term_matcher.match(c)
+        prepared.append((c.lower(), term_matcher.section_type(hits), set(term_matcher.chunk_groups(hits)), any(ch.isdigit() for ch in c)))
+
+    from services.vector_store import VectorStore
+    store = VectorStore.__new__(VectorStore)
+
+    legacy_rerank = timed(lambda: [
+        legacy_query_boosts(1.0, q.lower(), chunk_lower, section_type)
+        for q in QUERIES for chunk_lower, section_type, _, _ in prepared
+    ])
+
+    def new_rerank():
+        for q in QUERIES:
+            query_hits = term_matcher.match(q)
+            for _, section_type, groups, has_numbers in prepared:
+                store._apply_insurance_query_boosts(1.0, query_hits, groups, section_type, has_numbers)
+
+    matcher_rerank = timed(new_rerank)
+    pairs = len(QUERIES) * len(prepared)
+    print(f"Per-candidate rerank boosts: legacy {legacy_rerank / pairs * 1e6:.2f}us, "
+          f"matcher {matcher_rerank / pairs * 1e6:.2f}us ({legacy_rerank / matcher_rerank:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
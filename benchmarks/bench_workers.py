@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark: query throughput versus uvicorn worker count, with and without CPU allocation
+
+For each --workers count the API is started as a real multi-process uvicorn server
+(WEB_CONCURRENCY=N) with the load test's stand-in Gemini and blob store, then driven
+by the load test's closed-loop generator. Each count runs twice:
+- allocated: RESOURCE_ALLOCATION_ENABLED, every worker sizes torch, FAISS and
+  ingestion from its share of the CPU quota
+- library defaults: every worker's torch and OpenMP pools use every core
+
+Reports throughput, latency percentiles and the allocation one worker reports at
+/resources. Oversubscription shows up as the default rows falling behind once
+workers x threads exceeds the CPUs.
+
+When the embedding model cannot be downloaded (or with --stand-in-encoder), a
+randomly initialised encoder with the same architecture is used.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1 2 4] [--concurrency 16] [--duration 30]
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_test import (
+    LoadGenerator, StandInGemini, default_scenario, start_blob_server, summarize,
+)
+
+SERVE_ENV = "BENCH_WORKERS_SERVE"  # JSON config for the app module when imported by a uvicorn worker
+
+
+def _serving_app():
+    """The API with stand-ins installed; runs in every uvicorn worker process"""
+    config = json.loads(os.environ[SERVE_ENV])
+    import google.generativeai as genai
+
+    StandInGemini.latency = config["llm_latency"]
+    StandInGemini.intent_latency = config["intent_latency"]
+    genai.GenerativeModel = StandInGemini
+
+    if config.get("encoder_dir"):
+        import sentence_transformers
+        from sentence_transformers import models
+
+        real = sentence_transformers.SentenceTransformer
+        directory = config["encoder_dir"]
+        sentence_transformers.SentenceTransformer = lambda *args, **kwargs: real(
+            modules=[models.Transformer(directory, max_seq_length=256), models.Pooling(384, "mean")])
+
+    from config.settings import settings
+    for name, value in config["settings"].items():
+        setattr(settings, name, value)
+
+    import main as api
+    # The benchmark's own token, so the parent never imports the app (and loads the model)
+    api.VALID_TOKEN = config["token"]
+    return api.app
+
+
+if SERVE_ENV in os.environ:
+    app = _serving_app()
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(workers: int, config: dict, verbose: bool):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), **{SERVE_ENV: json.dumps(config)})
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.bench_workers:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=output, stderr=output,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server with {workers} workers exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"Server with {workers} workers did not start")
+
+
+def encoder_dir(force_stand_in: bool, scenario: dict):
+    """None when the real model loads, else a stand-in encoder built from the scenario's policies"""
+    if not force_stand_in:
+        try:
+            from sentence_transformers import SentenceTransformer
+            from config.settings import settings
+            SentenceTransformer(settings.EMBEDDING_MODEL)
+            return None
+        except Exception:
+            pass
+    from benchmarks.bench_embedding_buckets import chunk_documents, write_stand_in_encoder
+    directory = scenario["documents_dir"]
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".docx")]
+    return write_stand_in_encoder(chunk_documents(paths, None))
+
+
+async def drive(base_url: str, token: str, scenario: dict, blob_url: str, args):
+    generator = LoadGenerator(base_url, token, scenario, blob_url, timeout=120)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        # Every worker should see each document once before measuring; requests spread across workers
+        for template in generator.templates:
+            for _ in range(args.warmup):
+                await client.post("/api/v1/hackrx/run", json=generator._payload(template), headers=generator.headers)
+        resources = (await client.get("/resources")).json()
+    start = time.perf_counter()
+    await generator.closed_loop(args.concurrency, args.duration, None)
+    wall = time.perf_counter() - start
+    return summarize(generator.results, wall, {}, None), resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed-loop clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per run")
+    parser.add_argument("--warmup", type=int, default=4, help="Unmeasured requests per template before each run")
+    parser.add_argument("--policy", default="balanced", help="RESOURCE_POLICY for the allocated runs")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Stand-in Gemini answer latency")
+    parser.add_argument("--intent-latency-ms", type=float, default=100, help="Stand-in Gemini intent latency")
+    parser.add_argument("--stand-in-encoder", action="store_true", help="Skip trying to load the real embedding model")
+    parser.add_argument("--verbose", action="store_true", help="Show the servers' output")
+    args = parser.parse_args()
+
+    scenario = default_scenario(tempfile.mkdtemp(prefix="bench-workers-"))
+    blob_url = start_blob_server(scenario["documents_dir"], "127.0.0.1")
+    encoder = encoder_dir(args.stand_in_encoder, scenario)
+    token = secrets.token_hex(16)
+
+    from services.resources import available_cpus
+    cpus = available_cpus()
+    print(f"CPUs: {cpus['effective']} effective (affinity {cpus['affinity']}, quota {cpus['cgroup_quota']}), "
+          f"{args.concurrency} clients, {args.duration:.0f}s per run{'  (stand-in encoder)' if encoder else ''}")
+    print(f"{'workers':>8} {'allocation':<18}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'torch':>7}{'faiss':>7}")
+    for workers in args.workers:
+        for allocated in (True, False):
+            config = {
+                "llm_latency": args.llm_latency_ms / 1000.0,
+                "intent_latency": args.intent_latency_ms / 1000.0,
+                "encoder_dir": encoder,
+                "token": token,
+                "settings": {"RESOURCE_ALLOCATION_ENABLED": allocated, "RESOURCE_POLICY": args.policy},
+            }
+            process, base_url = start_server(workers, config, args.verbose)
+            try:
+                summary, resources = asyncio.run(drive(base_url, token, scenario, blob_url, args))
+            finally:
+                process.terminate()
+                process.wait()
+            latency = summary["latency_ms"]
+            label = args.policy if allocated else "library defaults"
+            threads = resources["live_threads"]
+            print(f"{workers:>8} {label:<18}{summary['throughput_rps']:>8.2f}{latency['p50']:>10.0f}{latency['p95']:>10.0f}"
+                  f"{summary['error_rate']:>8.1%}{threads['torch']:>7}{threads['faiss']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Retrieval evaluation: sweep top-k, candidate depth and threshold against a labeled set
+
+Each policy in the dataset is parsed, chunked, embedded and indexed exactly as at
+ingestion. Every question is then retrieved under each combination of
+TOP_K_RETRIEVAL (--top-k), MAX_SEARCH_CANDIDATES (--candidates) and
+SIMILARITY_THRESHOLD (--threshold) and SECTION_SEARCH_TOP_SECTIONS (--sections,
+0 searches every chunk), once with the hybrid scoring of
+VectorStore.rank_candidates and, with --scoring, once by raw cosine similarity
+alone. This shows whether the hand-set score multipliers pay for themselves.
+
+A retrieved chunk counts as relevant when at least --match of the words of the
+shorter of (chunk, gold passage) appear in the other, so a gold passage split
+across chunks is still found. For each configuration the harness reports:
+- recall@k: a relevant chunk is among those sent to the LLM
+- MRR
+- mean prompt tokens of the Gemini prompt those chunks produce, counted with the
+  embedding model's WordPiece tokenizer as an approximation
+- search + rerank latency
+
+It then picks the cheapest hybrid configuration (fewest prompt tokens) that
+meets --target-recall, i.e. the settings to ship.
+
+Dataset (JSONL). "policy" is a local .pdf/.docx path, relative to the dataset
+file, or a URL. "intent" is optional and takes the values the intent LLM returns
+(time_period, definition, ...). Without it the keyword fallback is used, which
+skips the intent boosts:
+    {"policy": "policies/health.pdf", "question": "What is the grace period?",
+     "gold": "A grace period of thirty days is provided...", "intent": "time_period"}
+
+Regression gate: --save writes the metrics of the configured settings and the
+sweep; --baseline compares the configured settings against a saved run and
+exits 1 when recall@k or MRR drops by more than --tolerance, or when recall@k
+is below --target-recall.
+
+Usage:
+    python -m benchmarks.eval_retrieval --dataset eval.jsonl
+    python -m benchmarks.eval_retrieval --dataset eval.jsonl --top-k 2,3,4,6 --candidates 8,15,30 --threshold 0,0.2
+    python -m benchmarks.eval_retrieval --dataset eval.jsonl --save baseline.json
+    python -m benchmarks.eval_retrieval --dataset eval.jsonl --baseline baseline.json --target-recall 0.9
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from models.schemas import DocumentChunk, RetrievalResult
+from services.vector_store import VectorStore
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def load_dataset(path: str) -> List[Dict]:
+    base = os.path.dirname(os.path.abspath(path))
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            policy = row["policy"]
+            if "://" not in policy and not os.path.isabs(policy):
+                row["policy"] = os.path.join(base, policy)
+            rows.append(row)
+    return rows
+
+
+def words(text: str) -> set:
+    return set(WORD.findall(text.lower()))
+
+
+def is_relevant(chunk_words: set, gold_words: set, match: float) -> bool:
+    shorter = min(len(chunk_words), len(gold_words))
+    return shorter > 0 and len(chunk_words & gold_words) / shorter >= match
+
+
+async def build_indexes(engine, policies: List[str]) -> Dict[str, VectorStore]:
+    """One in-memory index per policy, built through the ingestion pipeline"""
+    stores = {}
+    for policy in policies:
+        if "://" in policy:
+            chunks = await engine.doc_processor.process_document(policy)
+        else:
+            chunks = engine.doc_processor.process_file(policy, policy)
+        embeddings = engine._embed_chunks(chunks)
+        for row, chunk in enumerate(chunks):
+            chunk.embedding_row = row
+        store = VectorStore(index_path=None, metadata_path=None)
+        store.store_chunks(chunks, embeddings)
+        stores[policy] = store
+        print(f"Indexed {os.path.basename(policy.split('?')[0])}: {len(chunks)} chunks", file=sys.stderr)
+    return stores
+
+
+def rank_by_similarity(candidates: List[Tuple[float, Dict]], top_k: int, threshold: float) -> List[RetrievalResult]:
+    """Raw cosine order, no hybrid multipliers"""
+    return [
+        RetrievalResult(chunk=DocumentChunk(id=data["id"], text=data["text"], metadata=data["metadata"]), score=score)
+        for score, data in candidates if score >= threshold
+    ][:top_k]
+
+
+class Evaluator:
+    """Runs every configuration over the prepared questions and aggregates metrics"""
+
+    def __init__(self, engine, stores: Dict[str, VectorStore], rows: List[Dict], match: float, repeat: int):
+        self.engine = engine
+        self.stores = stores
+        self.match = match
+        self.repeat = repeat
+        self.tokenizer = engine.embedding_service.tokenizer
+        self._prompt_tokens: Dict[Tuple, int] = {}
+
+        texts = [row["question"] for row in rows]
+        vectors = engine.embedding_service.encode_texts(texts)
+        self.questions = []
+        for row, vector in zip(rows, vectors):
+            intent = engine._extract_query_intent_fallback(row["question"])
+            if row.get("intent"):
+                intent["intent_type"] = row["intent"]
+            self.questions.append({
+                "question": row["question"],
+                "store": stores[row["policy"]],
+                "query_vector": VectorStore._normalize_query(vector),
+                "intent": intent,
+                "gold_words": words(row["gold"]),
+            })
+
+    def count_tokens(self, question: str, results: List[RetrievalResult]) -> int:
+        if not results:
+            return 0  # No context: the service answers without calling Gemini
+        key = (question,) + tuple(result.chunk.id for result in results)
+        if key not in self._prompt_tokens:
+            prompt = self.engine.llm_service.build_prompt(question, results)
+            if self.tokenizer is not None:
+                self._prompt_tokens[key] = len(self.tokenizer.tokenize(prompt))
+            else:
+                self._prompt_tokens[key] = len(prompt.split())
+        return self._prompt_tokens[key]
+
+    def retrieve(self, item: Dict, top_k: int, search_k: int, threshold: float, sections: int, scoring: str) -> Tuple[List[RetrievalResult], float]:
+        store = item["store"]
+        best = float("inf")
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            candidates = store.search_candidates(item["query_vector"], search_k, top_sections=sections)
+            if scoring == "hybrid":
+                results = store.rank_candidates(candidates, top_k, item["question"], item["intent"], threshold)
+            else:
+                results = rank_by_similarity(candidates, top_k, threshold)
+            best = min(best, time.perf_counter() - start)
+        return results, best * 1000
+
+    def evaluate(self, top_k: int, search_k: int, threshold: float, sections: int, scoring: str) -> Dict:
+        hits, reciprocal_ranks, tokens, latencies, returned = [], [], [], [], []
+        for item in self.questions:
+            results, latency_ms = self.retrieve(item, top_k, search_k, threshold, sections, scoring)
+            rank = next((i + 1 for i, result in enumerate(results)
+                         if is_relevant(words(result.chunk.text), item["gold_words"], self.match)), None)
+            hits.append(1.0 if rank else 0.0)
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            tokens.append(self.count_tokens(item["question"], results))
+            latencies.append(latency_ms)
+            returned.append(len(results))
+        return {
+            "top_k": top_k, "candidates": search_k, "threshold": threshold, "sections": sections, "scoring": scoring,
+            "recall": round(float(np.mean(hits)), 4),
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+            "prompt_tokens": round(float(np.mean(tokens)), 1),
+            "chunks": round(float(np.mean(returned)), 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        }
+
+
+def choose(results: List[Dict], target_recall: float, scoring: str = "hybrid") -> Optional[Dict]:
+    """Cheapest configuration meeting the recall target: fewest prompt tokens, then best MRR, then shallowest search"""
+    eligible = [result for result in results if result["scoring"] == scoring and result["recall"] >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda result: (result["prompt_tokens"], -result["mrr"], result["candidates"], result["p50_ms"]))
+
+
+def print_table(results: List[Dict], current: Dict, chosen: Optional[Dict]):
+    print(f"\n{'scoring':<11}{'top_k':>6}{'cand':>6}{'thresh':>8}{'sect':>6}{'recall':>8}{'MRR':>7}{'tokens':>8}{'chunks':>8}{'p50 ms':>8}{'p95 ms':>8}")
+    for result in sorted(results, key=lambda r: (r["prompt_tokens"], -r["recall"])):
+        marks = ("*" if result is chosen else "") + ("=" if result is current else "")
+        print(f"{result['scoring']:<11}{result['top_k']:>6}{result['candidates']:>6}{result['threshold']:>8.2f}{result['sections']:>6}"
+              f"{result['recall']:>8.3f}{result['mrr']:>7.3f}{result['prompt_tokens']:>8.0f}{result['chunks']:>8.1f}"
+              f"{result['p50_ms']:>8.2f}{result['p95_ms']:>8.2f} {marks}")
+    print("(* chosen, = configured settings)")
+
+
+def check_regression(current: Dict, baseline: Dict, tolerance: float, target_recall: float) -> List[str]:
+    failures = []
+    if current["recall"] < target_recall:
+        failures.append(f"recall@k {current['recall']:.3f} is below the target {target_recall:.3f}")
+    for metric in ("recall", "mrr"):
+        if current[metric] < baseline[metric] - tolerance:
+            failures.append(f"{metric} fell from {baseline[metric]:.3f} to {current[metric]:.3f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", required=True, help="JSONL of {policy, question, gold[, intent]}")
+    parser.add_argument("--top-k", default="2,3,4,5,6,8", help="TOP_K_RETRIEVAL values to sweep")
+    parser.add_argument("--candidates", default="5,10,15,25,40", help="MAX_SEARCH_CANDIDATES values to sweep")
+    parser.add_argument("--threshold", default="0,0.1,0.2,0.3", help="SIMILARITY_THRESHOLD values to sweep")
+    parser.add_argument("--sections", default=f"0,{settings.SECTION_SEARCH_TOP_SECTIONS}", help="SECTION_SEARCH_TOP_SECTIONS values to sweep")
+    parser.add_argument("--scoring", default="hybrid,similarity", help="hybrid (production reranking) and/or similarity (raw cosine)")
+    parser.add_argument("--match", type=float, default=0.6, help="Word overlap for a chunk to count as the gold passage")
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per query; the fastest is kept")
+    parser.add_argument("--save", help="Write the sweep and the configured settings' metrics as JSON")
+    parser.add_argument("--baseline", help="Earlier --save output to check the configured settings against")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed drop in recall@k and MRR versus --baseline")
+    args = parser.parse_args()
+
+    from services.query_engine import QueryEngine
+
+    rows = load_dataset(args.dataset)
+    configured = (settings.TOP_K_RETRIEVAL, settings.MAX_SEARCH_CANDIDATES, settings.SIMILARITY_THRESHOLD,
+                  settings.SECTION_SEARCH_TOP_SECTIONS if settings.SECTION_SEARCH_ENABLED else 0, "hybrid")
+    # The engine's ingestion and scoring log every chunk; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = QueryEngine()
+        stores = asyncio.run(build_indexes(engine, list(dict.fromkeys(row["policy"] for row in rows))))
+        evaluator = Evaluator(engine, stores, rows, args.match, args.repeat)
+        grid = itertools.product(parse_list(args.top_k, int), parse_list(args.candidates, int),
+                                 parse_list(args.threshold, float), parse_list(args.sections, int), parse_list(args.scoring, str))
+        configs = list(dict.fromkeys(list(grid) + [configured]))
+        results = [evaluator.evaluate(*config) for config in configs]
+
+    current = results[configs.index(configured)]
+    chosen = choose(results, args.target_recall)
+    print(f"{len(rows)} questions over {len(stores)} policies, {len(results)} configurations")
+    print_table(results, current, chosen)
+
+    print(f"\nConfigured: top_k={configured[0]} candidates={configured[1]} threshold={configured[2]} sections={configured[3]} "
+          f"-> recall@k {current['recall']:.3f}, MRR {current['mrr']:.3f}, {current['prompt_tokens']:.0f} prompt tokens")
+    if chosen is None:
+        print(f"No hybrid configuration reaches recall@k {args.target_recall:.2f}")
+    else:
+        change = chosen["prompt_tokens"] / current["prompt_tokens"] - 1 if current["prompt_tokens"] else 0.0
+        print(f"Cheapest at recall@k >= {args.target_recall:.2f}: TOP_K_RETRIEVAL={chosen['top_k']} "
+              f"MAX_SEARCH_CANDIDATES={chosen['candidates']} SIMILARITY_THRESHOLD={chosen['threshold']} SECTION_SEARCH_TOP_SECTIONS={chosen['sections']} "
+              f"({chosen['prompt_tokens']:.0f} prompt tokens, {change:+.0%} vs configured)")
+    similarity = choose(results, args.target_recall, "similarity")
+    if similarity is not None:
+        # Not a setting; shows what the hybrid multipliers buy over plain cosine ranking
+        print(f"Raw similarity alone reaches it with top_k={similarity['top_k']} ({similarity['prompt_tokens']:.0f} prompt tokens, "
+              f"MRR {similarity['mrr']:.3f})")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"dataset": args.dataset, "questions": len(rows), "current": current, "chosen": chosen, "results": results}, f, indent=2)
+        print(f"Saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["current"]
+        failures = check_regression(current, baseline, args.tolerance, args.target_recall)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
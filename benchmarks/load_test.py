@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Load test: drive the query API at a target concurrency or request rate
+
+By default the service runs in-process behind uvicorn with local stand-ins for
+the blob store (a static file server) and Gemini (a fake with fixed latency), so
+only parsing, embedding and retrieval do real work. With --target the load goes
+to an already running server instead; documents are still served locally, so
+the server must be able to reach --blob-host.
+
+Reports throughput, latency percentiles, error rates and per-stage times taken
+from the Server-Timing header, and saves the run as JSON for --compare.
+
+Scenario file (JSON); documents are file names under documents_dir or full URLs,
+"cold" requests get a unique URL so they always ingest from scratch:
+    {"documents_dir": "fixtures",
+     "requests": [
+        {"documents": ["policy.pdf"], "questions": ["What is the grace period?"], "weight": 3},
+        {"documents": ["policy.pdf", "rider.pdf"], "questions": ["..."], "weight": 1, "cold": true}]}
+
+Usage:
+    python -m benchmarks.load_test --concurrency 8 --duration 30
+    python -m benchmarks.load_test --rps 4 --duration 60 --scenario scenario.json --output run.json
+    python -m benchmarks.load_test --concurrency 8 --compare run.json
+    python -m benchmarks.load_test --setting MAX_CONCURRENT_ANSWERING=4 --llm-latency-ms 800
+    python -m benchmarks.load_test --request-timeout 2 --llm-latency-ms 3000
+    python -m benchmarks.load_test --setting CONTEXT_CACHE_PROVIDER=local --llm-prefill-ms-per-1k 100
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+DEFAULT_QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does this policy cover maternity expenses?",
+    "What is the maximum room rent limit?",
+    "How many days of post-hospitalization expenses are covered?",
+    "What is excluded under the policy?",
+]
+
+POLICY_CLAUSES = [
+    "A grace period of thirty (30) days is provided for premium payment after the due date.",
+    "Pre-existing diseases shall be covered after a waiting period of thirty-six (36) months of continuous coverage.",
+    "Accident means a sudden, unforeseen and involuntary event caused by external, visible and violent means.",
+    "The Company shall not be liable for any claim arising out of cosmetic or aesthetic treatment.",
+    "Room rent is limited to one percent of the sum insured per day subject to a maximum of INR 5,000.",
+    "Claims must be submitted within fifteen days of discharge along with all supporting documents.",
+    "Maternity expenses are covered after a continuous coverage of twenty-four (24) months.",
+    "The insured person shall bear a co-payment of 10% on every admissible claim.",
+    "Post-hospitalization expenses are reimbursed for up to 180 days from the date of discharge.",
+    "A No Claim Discount of 5% of the base premium is allowed on renewal for each claim-free year.",
+]
+
+SECTIONS = ["DEFINITIONS", "COVERAGE", "EXCLUSIONS", "LIMITS OF COVERAGE", "CLAIMS PROCEDURE", "GENERAL CONDITIONS"]
+
+
+# ---------------------------------------------------------------- stand-ins
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_blob_server(directory: str, host: str) -> str:
+    """Serve `directory` over HTTP as the blob store stand-in; returns its base URL"""
+    server = http.server.ThreadingHTTPServer((host, 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, name="blob-stand-in", daemon=True).start()
+    return f"http://{host}:{server.server_address[1]}"
+
+
+class _StandInResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+# The model QueryEngine classifies intent with; any other model name generates answers
+INTENT_MODEL = "gemini-1.5-flash"
+
+
+class StandInGemini:
+    """Replaces genai.GenerativeModel with fixed-latency canned responses"""
+
+    latency = 0.3
+    intent_latency = 0.1
+    prefill_per_1k_tokens = 0.0  # Extra answer latency per 1,000 prompt tokens the model has not cached
+
+    def __init__(self, model_name: str = "", *args, **kwargs):
+        self.model_name = model_name
+
+    def _answer_latency(self, prompt) -> float:
+        from services.context_cache import CachedPrefix, estimate_tokens
+
+        parts = prompt if isinstance(prompt, list) else [prompt]
+        uncached = sum(estimate_tokens(part) for part in parts if not isinstance(part, CachedPrefix))
+        return self.latency + self.prefill_per_1k_tokens * uncached / 1000
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self._answer_latency(prompt))
+        return _StandInResponse("The policy provides a grace period of thirty days for premium payment.")
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if self.model_name != INTENT_MODEL:
+            # Answers are generated asynchronously so the request deadline can cancel them
+            await asyncio.sleep(self._answer_latency(prompt))
+            return _StandInResponse("The policy provides a grace period of thirty days for premium payment.")
+        await asyncio.sleep(self.intent_latency)
+        return _StandInResponse(json.dumps({
+            "intent_type": "specific_value", "looking_for": "policy value",
+            "expects_numbers": True, "key_concepts": [],
+        }))
+
+
+def write_sample_policies(directory: str, count: int = 3) -> List[str]:
+    """Synthetic DOCX policies for the default scenario"""
+    import docx
+
+    names = []
+    rng = random.Random(7)
+    for n in range(count):
+        document = docx.Document()
+        document.add_paragraph(f"HEALTH INSURANCE POLICY WORDING {n + 1}")
+        for section in SECTIONS:
+            document.add_paragraph(section)
+            for i in range(25):
+                clause = rng.choice(POLICY_CLAUSES)
+                document.add_paragraph(f"{section.title()} clause {i + 1}. {clause} This applies to plan variant {n + 1}.")
+        name = f"policy_{n + 1}.docx"
+        document.save(os.path.join(directory, name))
+        names.append(name)
+    return names
+
+
+def default_scenario(directory: str) -> Dict:
+    names = write_sample_policies(directory)
+    return {
+        "documents_dir": directory,
+        "requests": [
+            {"documents": [names[0]], "questions": DEFAULT_QUESTIONS[:3], "weight": 4},
+            {"documents": [names[1]], "questions": DEFAULT_QUESTIONS[3:], "weight": 3},
+            {"documents": [names[0], names[2]], "questions": DEFAULT_QUESTIONS[:2], "weight": 1},
+            {"documents": [names[2]], "questions": DEFAULT_QUESTIONS[:2], "weight": 1, "cold": True},
+        ],
+    }
+
+
+def parse_setting_value(value: str):
+    """A --setting value: true/false as booleans, JSON numbers, lists and null as such, anything else as text"""
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def start_in_process_server(args) -> str:
+    """Import the app with stand-ins installed and serve it on a free port"""
+    import google.generativeai as genai
+    import uvicorn
+
+    StandInGemini.latency = args.llm_latency_ms / 1000.0
+    StandInGemini.intent_latency = args.intent_latency_ms / 1000.0
+    StandInGemini.prefill_per_1k_tokens = args.llm_prefill_ms_per_1k / 1000.0
+    genai.GenerativeModel = StandInGemini
+
+    from config.settings import settings
+    for assignment in args.setting:
+        name, value = assignment.split("=", 1)
+        getattr(settings, name)  # Unknown names fail here rather than being silently added
+        setattr(settings, name, parse_setting_value(value))
+
+    import main
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    args.token = args.token or main.VALID_TOKEN
+    return f"http://127.0.0.1:{port}"
+
+
+# ---------------------------------------------------------------- load
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, token: str, scenario: Dict, blob_url: str, timeout: float,
+                 request_timeout: Optional[float] = None):
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {token}"}
+        if request_timeout:
+            self.headers["X-Request-Timeout"] = str(request_timeout)
+        self.blob_url = blob_url
+        self.timeout = timeout
+        self.templates = scenario["requests"]
+        self.weights = [template.get("weight", 1) for template in self.templates]
+        self.rng = random.Random(0)
+        self.sequence = itertools.count()
+        self.results: List[Dict] = []
+
+    def _payload(self, template: Dict) -> Dict:
+        urls = []
+        for document in template["documents"]:
+            url = document if document.startswith(("http://", "https://")) else f"{self.blob_url}/{document}"
+            if template.get("cold"):
+                url += f"{'&' if '?' in url else '?'}load={next(self.sequence)}"
+            urls.append(url)
+        return {"documents": urls if len(urls) > 1 else urls[0], "questions": template["questions"]}
+
+    async def _one(self, client: httpx.AsyncClient):
+        index = self.rng.choices(range(len(self.templates)), self.weights)[0]
+        payload = self._payload(self.templates[index])
+        start = time.perf_counter()
+        record = {"template": index, "started": start}
+        try:
+            response = await client.post("/api/v1/hackrx/run", json=payload, headers=self.headers)
+            record["status"] = response.status_code
+            record["stages"] = parse_server_timing(response.headers.get("Server-Timing"))
+            record["degraded"] = response.headers.get("X-Deadline-Degraded")
+        except Exception as e:
+            record["status"] = type(e).__name__
+            record["stages"] = {}
+        record["latency_ms"] = (time.perf_counter() - start) * 1000
+        self.results.append(record)
+
+    async def closed_loop(self, concurrency: int, duration: float, total: Optional[int]):
+        """`concurrency` clients each sending their next request when the last returns"""
+        deadline = time.perf_counter() + duration
+        remaining = itertools.count()
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            async def worker():
+                while time.perf_counter() < deadline and (total is None or next(remaining) < total):
+                    await self._one(client)
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    async def open_loop(self, rps: float, duration: float, max_in_flight: int):
+        """Poisson arrivals at `rps` regardless of response times"""
+        in_flight = set()
+        dropped = 0
+        limits = httpx.Limits(max_connections=max_in_flight)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            deadline = time.perf_counter() + duration
+            next_arrival = time.perf_counter()
+            while next_arrival < deadline:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                if len(in_flight) >= max_in_flight:
+                    dropped += 1
+                else:
+                    task = asyncio.ensure_future(self._one(client))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                next_arrival += self.rng.expovariate(rps)
+            await asyncio.gather(*in_flight)
+        if dropped:
+            self.results.append({"template": None, "status": "client_overloaded", "latency_ms": 0.0, "stages": {}, "count": dropped})
+
+
+# ---------------------------------------------------------------- report
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1),
+            "max": round(float(max(values)), 1), "mean": round(float(np.mean(values)), 1)}
+
+
+def summarize(results: List[Dict], wall_seconds: float, config: Dict, server_metrics: Optional[Dict]) -> Dict:
+    statuses: Dict[str, int] = {}
+    for record in results:
+        statuses[str(record["status"])] = statuses.get(str(record["status"]), 0) + record.get("count", 1)
+    sent = sum(statuses.values())
+    ok = [record for record in results if record["status"] == 200]
+
+    stage_names = sorted({name for record in ok for name in record["stages"]})
+    stages = {name: percentiles([record["stages"].get(name, 0.0) for record in ok]) for name in stage_names}
+
+    by_template = {}
+    for index in sorted({record["template"] for record in results if record["template"] is not None}):
+        records = [record for record in results if record["template"] == index]
+        by_template[str(index)] = {
+            "requests": len(records),
+            "errors": sum(1 for record in records if record["status"] != 200),
+            "latency_ms": percentiles([record["latency_ms"] for record in records if record["status"] == 200]),
+        }
+
+    return {
+        "config": config,
+        "wall_seconds": round(wall_seconds, 2),
+        "requests": sent,
+        "succeeded": len(ok),
+        "degraded": sum(1 for record in ok if record.get("degraded")),
+        "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+        "error_rate": round(1 - len(ok) / sent, 4) if sent else 0.0,
+        "status_counts": statuses,
+        "latency_ms": percentiles([record["latency_ms"] for record in ok]),
+        "stages_ms": stages,
+        "by_template": by_template,
+        "server_metrics": server_metrics,
+    }
+
+
+def print_summary(summary: Dict):
+    latency = summary["latency_ms"]
+    print(f"\nRequests: {summary['requests']}  succeeded: {summary['succeeded']}  degraded: {summary.get('degraded', 0)}  "
+          f"error rate: {summary['error_rate'] * 100:.1f}%  statuses: {summary['status_counts']}")
+    print(f"Throughput: {summary['throughput_rps']:.2f} req/s over {summary['wall_seconds']:.1f}s")
+    print(f"Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    if summary["stages_ms"]:
+        print(f"\n{'stage':<22}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, stats in sorted(summary["stages_ms"].items(), key=lambda item: -item[1]["mean"]):
+            print(f"{name:<22}{stats['mean']:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+    if summary["by_template"]:
+        print(f"\n{'template':<10}{'requests':>10}{'errors':>8}{'p50':>10}{'p95':>10}")
+        for index, stats in summary["by_template"].items():
+            print(f"{index:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['latency_ms']['p50']:>10.1f}{stats['latency_ms']['p95']:>10.1f}")
+
+
+def compare(summary: Dict, baseline: Dict):
+    rows = [("throughput_rps", summary["throughput_rps"], baseline["throughput_rps"]),
+            ("error_rate", summary["error_rate"], baseline["error_rate"])]
+    rows += [(f"latency {key}", summary["latency_ms"][key], baseline["latency_ms"][key]) for key in ("p50", "p95", "p99")]
+    for name in sorted(set(summary["stages_ms"]) | set(baseline["stages_ms"])):
+        rows.append((f"{name} mean", summary["stages_ms"].get(name, {}).get("mean", 0.0),
+                     baseline["stages_ms"].get(name, {}).get("mean", 0.0)))
+    print(f"\n{'metric':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current, previous in rows:
+        change = f"{(current - previous) / previous * 100:+.1f}%" if previous else "n/a"
+        print(f"{name:<26}{previous:>12}{current:>12}{change:>10}")
+
+
+async def fetch_metrics(base_url: str) -> Optional[Dict]:
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+            return (await client.get("/metrics")).json()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=4, help="Closed-loop clients (default mode)")
+    load.add_argument("--rps", type=float, help="Open-loop Poisson arrival rate instead of fixed concurrency")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load")
+    parser.add_argument("--requests", type=int, help="Stop closed-loop runs after this many requests")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per template before the run")
+    parser.add_argument("--scenario", help="Scenario JSON (default: synthetic policies)")
+    parser.add_argument("--target", help="Base URL of a running server instead of an in-process one")
+    parser.add_argument("--token", help="Bearer token for --target")
+    parser.add_argument("--blob-host", default="127.0.0.1", help="Interface the blob stand-in listens on")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Stand-in Gemini answer latency")
+    parser.add_argument("--intent-latency-ms", type=float, default=100, help="Stand-in Gemini intent latency")
+    parser.add_argument("--llm-prefill-ms-per-1k", type=float, default=0,
+                        help="Stand-in Gemini answer latency per 1,000 uncached prompt tokens")
+    parser.add_argument("--setting", action="append", default=[], help="Override a setting in-process, NAME=VALUE")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--request-timeout", type=float, help="Server-side deadline sent as X-Request-Timeout")
+    parser.add_argument("--output", help="Where to save the run (default: loadtest-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier run to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the in-process server's logging")
+    args = parser.parse_args()
+
+    if args.scenario:
+        with open(args.scenario) as f:
+            scenario = json.load(f)
+        scenario.setdefault("documents_dir", os.path.dirname(os.path.abspath(args.scenario)))
+    else:
+        scenario = default_scenario(tempfile.mkdtemp(prefix="loadtest-"))
+    blob_url = start_blob_server(scenario["documents_dir"], args.blob_host)
+
+    stdout = sys.stdout
+    if not args.verbose and not args.target:
+        # The service logs every stage to stdout; keep the report readable
+        sys.stdout = open(os.devnull, "w")
+    try:
+        base_url = args.target or start_in_process_server(args)
+        if not args.token:
+            raise SystemExit("--token is required with --target")
+        generator = LoadGenerator(base_url, args.token, scenario, blob_url, args.timeout, args.request_timeout)
+
+        async def run():
+            if args.warmup:
+                async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+                    for template in generator.templates:
+                        for _ in range(args.warmup):
+                            await client.post("/api/v1/hackrx/run", json=generator._payload(template), headers=generator.headers)
+            print(f"Generating load against {base_url} for {args.duration:.0f}s...", file=sys.stderr)
+            start = time.perf_counter()
+            if args.rps:
+                await generator.open_loop(args.rps, args.duration, args.max_in_flight)
+            else:
+                await generator.closed_loop(args.concurrency, args.duration, args.requests)
+            wall = time.perf_counter() - start
+            return wall, await fetch_metrics(base_url)
+
+        wall, server_metrics = asyncio.run(run())
+    finally:
+        sys.stdout = stdout
+
+    config = {
+        "mode": "rps" if args.rps else "concurrency",
+        "rps": args.rps,
+        "concurrency": None if args.rps else args.concurrency,
+        "duration": args.duration,
+        "target": args.target or "in-process",
+        "llm_latency_ms": None if args.target else args.llm_latency_ms,
+        "intent_latency_ms": None if args.target else args.intent_latency_ms,
+        "request_timeout": args.request_timeout,
+        "settings": args.setting,
+        "scenario": scenario["requests"],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    summary = summarize(generator.results, wall, config, server_metrics)
+    print_summary(summary)
+
+    output = args.output or f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(summary, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
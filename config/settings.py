@@ -12,13 +12,107 @@ class Settings:
     # Model settings
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSIONS = 384
+    EMBEDDING_MAX_BATCH_SIZE = 64  # Texts per dynamic cross-request batch
+    EMBEDDING_MAX_WAIT_MS = 5  # Max time a batch waits for more texts
+    EMBEDDING_PRIORITY_MAX_TEXTS = 16  # Calls this small (questions) are batched ahead of ingestion backlogs
+    EMBEDDING_TOKEN_BUDGETS = [1024, 2048, 4096, 8192]  # Candidate padded tokens per forward pass
+    EMBEDDING_TUNER_TRIALS = 3  # Full passes measured per candidate budget before picking the fastest
+    EMBEDDING_TUNER_RETUNE_PASSES = 2000  # Passes between re-measuring every candidate
     CHUNK_SIZE = 300  # Optimized chunk size
     CHUNK_OVERLAP = 75   # Optimized overlap
+    CHUNK_MAX_TOKENS = 254  # all-MiniLM-L6-v2 max_seq_length (256) minus [CLS]/[SEP]
+    CHUNK_OVERLAP_TOKENS = 48  # Exact token overlap between consecutive chunks
+    CHUNK_MIN_TOKENS = 50  # Minimum meaningful chunk size
     TOP_K_RETRIEVAL = 4  # Optimized for production
     
     # Enhanced retrieval settings
     SIMILARITY_THRESHOLD = 0.2  # Minimum similarity score
     MAX_SEARCH_CANDIDATES = 15  # Search more candidates for better filtering
+    FILTERABLE_METADATA_KEYS = ['type', 'chunk_type', 'document_id', 'has_numbers', 'has_definitions']  # Pre-filtered with bitmaps inside FAISS
+    INTENT_FILTERS_ENABLED = True  # Restrict e.g. exclusion questions to exclusion chunks
+    
+    # Two-level retrieval: rank sections first, then search chunks only within the best ones
+    SECTION_SEARCH_ENABLED = True
+    SECTION_SEARCH_MIN_SECTIONS = 8  # Documents with fewer sections are searched flat
+    SECTION_SEARCH_TOP_SECTIONS = 4  # Sections whose chunks are searched per question
+    
+    # Lazy ingestion of very large documents: pages are embedded as questions need them
+    LAZY_INGESTION_ENABLED = True
+    LAZY_INGESTION_MIN_CHUNKS = 800  # Documents with more chunks (roughly 200+ pages) are embedded lazily
+    LAZY_PAGES_PER_QUESTION = 6  # Best BM25 pages embedded for each question
+    LAZY_PAGE_CHUNKS = 4  # Chunks per page for formats without pages (DOCX)
+    
+    # Extractive answers for numeric and period questions
+    EXTRACTIVE_ANSWERS_ENABLED = True
+    EXTRACTIVE_MIN_CONFIDENCE = 0.75  # Below this the question goes to the LLM
+    EXTRACTIVE_MAX_CHUNKS = 3  # Top retrieved chunks searched for a value
+    
+    # Near-duplicate embedding reuse across documents
+    NEAR_DUPLICATE_ENABLED = True
+    NEAR_DUPLICATE_THRESHOLD = 0.9  # Min estimated Jaccard similarity of word shingles to reuse a vector
+    NEAR_DUPLICATE_NUM_PERM = 64  # MinHash permutations per signature
+    NEAR_DUPLICATE_BANDS = 8  # LSH bands (8 rows each)
+    NEAR_DUPLICATE_SHINGLE_SIZE = 5  # Words per shingle
+    NEAR_DUPLICATE_MAX_ENTRIES = 20000  # Embedded chunks remembered for reuse
+    
+    # Background ingestion queue
+    INGESTION_WORKERS = None  # Documents ingested concurrently; None follows the CPU allocation (2 without it)
+    INGESTION_QUEUE_SIZE = 100  # Max queued ingestion jobs
+    MAX_RETAINED_DOCUMENTS = 500  # Pre-ingested documents kept; the least recently used beyond this are released
+    DOCUMENT_RETENTION_SECONDS = 24 * 3600  # Pre-ingested documents unused for this long are released
+    
+    # CPU allocation across worker processes and components
+    WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # Uvicorn worker processes sharing the CPU quota
+    RESOURCE_POLICY = "balanced"  # "balanced", "ingestion" or "query": how a worker's CPUs are split
+    RESOURCE_ALLOCATION_ENABLED = True  # Size thread pools and ingestion limits at startup; off keeps library defaults
+    TORCH_THREADS = None  # Encoder intra-op threads per worker; None follows the policy
+    FAISS_THREADS = None  # FAISS OpenMP threads per worker; None follows the policy
+    PARSE_THREADS = None  # Documents parsed at once per worker; None follows the policy
+    
+    # Admission control and load shedding
+    MAX_CONCURRENT_INGESTIONS = None  # Inline document pipelines running at once; None follows the CPU allocation (2 without it)
+    MAX_WAITING_INGESTIONS = 8  # Requests allowed to queue for an ingestion slot
+    MAX_CONCURRENT_ANSWERING = 8  # Question sets being answered at once
+    MAX_WAITING_ANSWERING = 32  # Requests allowed to queue for an answering slot
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = 10  # Max queue time before a 503
+    # Off by default: the API has a single shared bearer token, so a per-token limit would cap the whole service
+    RATE_LIMIT_PER_MINUTE = None  # Sustained requests per bearer token; None disables rate limiting
+    RATE_LIMIT_BURST = 20  # Requests a token may burst above the sustained rate
+    
+    # Request deadlines: stages degrade instead of overrunning
+    REQUEST_DEADLINE_SECONDS = 30.0  # Budget when the client sends no X-Request-Timeout header
+    REQUEST_DEADLINE_MAX_SECONDS = 120.0  # Upper bound on a client-requested budget
+    ABANDONED_DOCUMENT_GRACE_SECONDS = 120.0  # Inline documents finished after their requests timed out are kept this long for retries
+    INTENT_TIMEOUT_SECONDS = 2.0  # Intent LLM wait before the keyword fallback is used
+    DEADLINE_SHRINK_CONTEXT_SECONDS = 6.0  # Below this budget the LLM gets a smaller context
+    DEADLINE_REDUCED_TOP_K = 2  # Chunks sent to the LLM when the context is shrunk
+    DEADLINE_MIN_LLM_SECONDS = 1.0  # Below this budget questions are answered without the LLM
+    
+    # LLM context cache: a per-document prompt prefix registered once and reused by every question
+    CONTEXT_CACHE_ENABLED = True
+    CONTEXT_CACHE_PROVIDER = os.getenv("CONTEXT_CACHE_PROVIDER", "gemini")  # "gemini" (cached-content API) or "local" (offline stand-in)
+    CONTEXT_CACHE_MODEL = "models/gemini-2.0-flash-001"  # Cached content is tied to an explicit model version
+    CONTEXT_CACHE_PREFIX_TOKENS = 8192  # Budget for a document's high-value sections in its prefix
+    CONTEXT_CACHE_MIN_TOKENS = 4096  # Smallest prefix Gemini accepts as cached content
+    CONTEXT_CACHE_TTL_SECONDS = 900  # Provider-side lifetime; re-registered when found expired, deleted with the document
+    CONTEXT_CACHE_MIN_QUESTIONS = 3  # Inline documents asked fewer questions send full prompts; registering costs more than it saves
+    
+    # Resident index pool
+    INDEX_MEMORY_BUDGET_MB = 1024  # Document indexes kept in RAM before spilling to disk
+    INDEX_EVICTION_POLICY = "lru"  # "lru" (least recently used) or "lfu" (least frequently used)
+    INDEX_SPILL_DIR = "index_spill"  # Where evicted indexes are written for lazy reload
+    
+    # On-demand request profiling
+    PROFILE_DIR = "profiles"  # Where captured profiles are written
+    PROFILE_MAX_STORED = 20  # Newest profiles kept on disk
+    PROFILE_SAMPLE_INTERVAL_MS = 5  # Stack sampling interval
+    PROFILE_TRACEMALLOC_FRAMES = 10  # Frames kept per traced allocation
+    
+    # Debug traces of recent questions
+    DEBUG_TRACES_ENABLED = True  # Keep retrieval traces of recent questions in memory
+    DEBUG_TRACE_MAX_ENTRIES = 500  # Newest traces kept
+    DEBUG_TRACE_BUDGET_MB = 4  # Traces kept before the oldest are evicted
+    DEBUG_TRACE_PREVIEW_CHARS = 200  # Characters of each retrieved chunk kept in a trace
     
     # API settings
     MAX_TOKENS = 4096
@@ -1,8 +1,21 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
+from fastapi.responses import JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from models.schemas import QueryRequest, QueryResponse
+from models.schemas import (
+    QueryRequest, QueryResponse, DocumentIngestRequest, DocumentStatusResponse, DocumentQueryRequest
+)
 from services.query_engine import QueryEngine
+from services.ingestion_queue import IngestionQueue
+from services.admission import AdmissionRejected
+from services.profiler import ProfileStore
+from services.stage_timer import start_timing, stage, server_timing_header
+from services.deadline import Deadline, UNANSWERED, start_deadline
+from services.resources import plan_allocation, apply_allocation, live_threads
+from config.settings import settings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
 import uvicorn
 
 app = FastAPI(
@@ -24,8 +37,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Threads per component, sized from the CPU quota and worker count before the services start theirs
+resource_allocation = apply_allocation(plan_allocation())
+
 # Initialize query engine
 query_engine = QueryEngine()
+ingestion_queue = IngestionQueue(query_engine.ingest_document, query_engine.document_chunks, query_engine.release_retained)
+profile_store = ProfileStore()
+
+@app.on_event("startup")
+async def start_ingestion_queue():
+    if resource_allocation.applied:
+        # Named like asyncio's own default pool, whose threads the request profiler samples
+        executor = ThreadPoolExecutor(max_workers=resource_allocation.blocking_threads, thread_name_prefix="asyncio")
+        asyncio.get_running_loop().set_default_executor(executor)
+    await ingestion_queue.start()
+
+@app.on_event("shutdown")
+async def stop_ingestion_queue():
+    await ingestion_queue.stop()
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify bearer token"""
@@ -37,20 +67,167 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         )
     return credentials.credentials
 
+def admit_request(token: str = Depends(verify_token)):
+    """Verify the bearer token and apply its rate limit"""
+    query_engine.admission.rate_limiter.check(token)
+    return token
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Shed load quickly with a Retry-After hint"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def profiling_requested(request: Request) -> bool:
+    """Opt-in profiling via an X-Profile header or ?profile=true"""
+    flag = request.headers.get("X-Profile") or request.query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+def report_degradation(response: Response, deadline: Deadline):
+    """List the stages cut short to meet the deadline in an X-Deadline-Degraded header"""
+    if deadline.degraded:
+        response.headers["X-Deadline-Degraded"] = ",".join(deadline.degraded)
+
 @app.post("/api/v1/hackrx/run", response_model=QueryResponse)
-async def run_query(request: QueryRequest, token: str = Depends(verify_token)):
+async def run_query(request: QueryRequest, http_request: Request, response: Response, token: str = Depends(admit_request)):
     """Main endpoint to process document queries"""
+    timings = start_timing()
+    deadline = start_deadline(http_request.headers.get("X-Request-Timeout"))
     try:
-        response = await query_engine.process_query(request)
-        return response
+        if not profiling_requested(http_request):
+            result = await query_engine.process_query(request)
+        else:
+            async with profile_store.capture("process_query") as profile:
+                response.headers["X-Profile-Id"] = profile.profile_id
+                result = await query_engine.process_query(request)
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        report_degradation(response, deadline)
+        return result
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/documents", response_model=DocumentStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_document(request: DocumentIngestRequest, token: str = Depends(admit_request)):
+    """Queue a document for background ingestion and return its document ID"""
+    document_id = query_engine.document_id_for(request.documents)
+    try:
+        job = ingestion_queue.submit(document_id, request.documents, request.priority)
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full",
+            headers={"Retry-After": str(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)},
+        )
+    return job.to_dict()
+
+@app.get("/api/v1/documents/{document_id}", response_model=DocumentStatusResponse)
+async def get_document_status(document_id: str, token: str = Depends(verify_token)):
+    """Report the ingestion status of a document"""
+    job = ingestion_queue.get(document_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown document ID")
+    return {**job.to_dict(), "dedupe_ratio": query_engine.document_dedupe_ratio(document_id)}
+
+@app.delete("/api/v1/documents/{document_id}", response_model=DocumentStatusResponse)
+async def delete_document(document_id: str, token: str = Depends(verify_token)):
+    """Release a pre-ingested document and forget its job"""
+    job = ingestion_queue.get(document_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown document ID")
+    if job.status == "running":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document is being ingested",
+            headers={"Retry-After": "5"},
+        )
+    ingestion_queue.remove(document_id)
+    return {"document_id": document_id, "status": "deleted"}
+
+@app.get("/api/v1/documents/{document_id}/facts")
+async def get_document_facts(document_id: str, token: str = Depends(verify_token)):
+    """Facts extracted from a document at ingestion, with their source chunks"""
+    facts = query_engine.document_facts(document_id)
+    if facts is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document is not ingested")
+    return {"document_id": document_id, "facts": facts}
+
+@app.post("/api/v1/documents/{document_id}/query", response_model=QueryResponse)
+async def query_document(document_id: str, request: DocumentQueryRequest, http_request: Request, response: Response, token: str = Depends(admit_request)):
+    """Answer questions about a document submitted to /api/v1/documents"""
+    timings = start_timing()
+    deadline = start_deadline(http_request.headers.get("X-Request-Timeout"))
+    job = ingestion_queue.get(document_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown document ID")
+    
+    # Questions on a document still being ingested wait for its job to finish
+    with stage("ingestion_wait"):
+        try:
+            job = await asyncio.wait_for(ingestion_queue.wait(document_id), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            deadline.degrade("ingestion")
+            response.headers["Server-Timing"] = server_timing_header(timings)
+            report_degradation(response, deadline)
+            return QueryResponse(answers=[UNANSWERED for _ in request.questions])
+    if job.status != "ready":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Document ingestion failed: {job.error}")
+    
+    try:
+        answers = await query_engine.answer_questions([document_id], request.questions)
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        report_degradation(response, deadline)
+        return QueryResponse(answers=answers)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/profiles/{profile_id}")
+async def get_profile(profile_id: str, kind: str = "speedscope", token: str = Depends(verify_token)):
+    """Download a captured request profile: speedscope CPU samples or the allocation summary"""
+    kinds = {"speedscope": "speedscope.json", "memory": "memory.json"}
+    path = profile_store.path(profile_id, kinds.get(kind, ""))
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown profile")
+    return FileResponse(path, media_type="application/json")
+
+@app.get("/api/v1/debug/traces")
+async def get_debug_traces(limit: int = 50, document_id: Optional[str] = None, token: str = Depends(verify_token)):
+    """Retrieval traces of recently answered questions, newest first"""
+    return {"traces": query_engine.debug_store.recent(limit, document_id), **query_engine.debug_store.stats()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Policynth is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Admission, queue, batching and index pool counters for capacity sizing"""
+    return {
+        "admission": query_engine.admission.stats(),
+        "ingestion_queue": ingestion_queue.stats(),
+        "embedding_batcher": query_engine.embedding_service.batcher.stats(),
+        "embedding_buckets": query_engine.embedding_service.bucketer.stats(),
+        "index_pool": query_engine.index_pool.stats(),
+        "extractive_answers": query_engine.extractive_answerer.stats(),
+        "fact_sheet": query_engine.fact_extractor.stats(),
+        "lazy_ingestion": query_engine.lazy_stats(),
+        "near_duplicates": query_engine.near_duplicate_stats(),
+        "debug_traces": query_engine.debug_store.stats(),
+        "context_cache": query_engine.llm_service.context_cache.stats(),
+    }
+
+@app.get("/resources")
+async def resources():
+    """CPUs available to this worker and the threads allocated to each component"""
+    return {**resource_allocation.to_dict(), "live_threads": live_threads()}
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -59,7 +236,10 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "query": "/api/v1/hackrx/run",
-            "health": "/health"
+            "documents": "/api/v1/documents",
+            "health": "/health",
+            "metrics": "/metrics",
+            "resources": "/resources"
         }
     }
 
@@ -70,5 +250,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
+        workers=settings.WEB_WORKERS,  # Each worker sizes its threads from its share of the CPUs
         reload=False  # Disable reload in production
     )
\ No newline at end of file
@@ -1,18 +1,38 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 
 class QueryRequest(BaseModel):
-    documents: str  # Blob URL
+    documents: Union[str, List[str]]  # Blob URL, or a policy plus its riders and endorsements
     questions: List[str]
 
+    def document_urls(self) -> List[str]:
+        """Requested documents as a list of blob URLs"""
+        return [self.documents] if isinstance(self.documents, str) else list(self.documents)
+
 class QueryResponse(BaseModel):
     answers: List[str]
 
+class DocumentIngestRequest(BaseModel):
+    documents: str  # Blob URL
+    priority: int = 0  # Higher is ingested first
+
+class DocumentStatusResponse(BaseModel):
+    document_id: str
+    status: str  # queued, running, ready, failed or deleted
+    chunks: Optional[int] = None
+    error: Optional[str] = None
+    queued_seconds: Optional[float] = None
+    processing_seconds: Optional[float] = None
+    dedupe_ratio: Optional[float] = None  # Share of chunks whose embedding was reused from a near-duplicate
+
+class DocumentQueryRequest(BaseModel):
+    questions: List[str]
+
 class DocumentChunk(BaseModel):
     id: str
     text: str
     metadata: Dict[str, Any]
-    embedding: Optional[List[float]] = None
+    embedding_row: Optional[int] = None  # Row of this chunk in the document's embedding matrix
 
 class RetrievalResult(BaseModel):
     chunk: DocumentChunk
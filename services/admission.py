@@ -0,0 +1,132 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from config.settings import settings
+from services.resources import DEFAULT_INGESTION_SLOTS
+from services.stage_timer import stage
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and a Retry-After hint"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class ConcurrencyLimiter:
+    """Concurrency limit with a bounded wait queue and a queue-time deadline"""
+
+    def __init__(self, name: str, limit: int, max_waiting: int, max_queue_seconds: float):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_queue_seconds = max_queue_seconds
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None  # Created on the serving event loop
+        self._mean_hold = 1.0  # EWMA of seconds a slot is held, for Retry-After
+
+    def _retry_after(self) -> float:
+        return self._mean_hold * (self.waiting + 1) / self.limit
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one slot for the duration of the block, or raise AdmissionRejected"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        if not self._semaphore.locked():
+            # A free slot is taken without yielding to the event loop
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_waiting:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(503, f"{self.name} capacity saturated", self._retry_after())
+        else:
+            self.waiting += 1
+            try:
+                with stage(f"{self.name}_queue"):
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_seconds)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(503, f"Timed out waiting for {self.name} capacity", self._retry_after())
+            finally:
+                self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._mean_hold = 0.8 * self._mean_hold + 0.2 * (time.monotonic() - start)
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "mean_hold_seconds": round(self._mean_hold, 3),
+        }
+
+
+class TokenRateLimiter:
+    """Token-bucket rate limit per bearer token; a `per_minute` of None admits everything"""
+
+    def __init__(self, per_minute: Optional[float], burst: int):
+        self.rate = per_minute / 60.0 if per_minute is not None else None
+        self.burst = burst
+        self.rejected = 0
+        self._buckets: Dict[str, list] = {}  # token -> [tokens available, last refill time]
+
+    def check(self, token: str):
+        """Take one request from the token's bucket, or raise AdmissionRejected (429)"""
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(token, [float(self.burst), now])
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Rate limit exceeded", (1 - bucket[0]) / self.rate)
+        bucket[0] -= 1
+
+    def stats(self) -> Dict[str, float]:
+        per_minute = self.rate * 60 if self.rate is not None else None
+        return {"per_minute": per_minute, "burst": self.burst, "tokens": len(self._buckets), "rejected": self.rejected}
+
+
+class AdmissionController:
+    """Separate admission limits for ingestion and answering plus per-token rate limits"""
+
+    def __init__(self):
+        self.ingestion = ConcurrencyLimiter(
+            "ingestion", settings.MAX_CONCURRENT_INGESTIONS or DEFAULT_INGESTION_SLOTS,
+            settings.MAX_WAITING_INGESTIONS, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        )
+        self.answering = ConcurrencyLimiter(
+            "answering", settings.MAX_CONCURRENT_ANSWERING,
+            settings.MAX_WAITING_ANSWERING, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        )
+        self.rate_limiter = TokenRateLimiter(settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            "ingestion": self.ingestion.stats(),
+            "answering": self.answering.stats(),
+            "rate_limit": self.rate_limiter.stats(),
+        }
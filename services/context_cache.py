@@ -0,0 +1,264 @@
+import asyncio
+import datetime
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import google.generativeai as genai
+from config.settings import settings
+from models.schemas import DocumentChunk
+from services.single_flight import SingleFlight
+
+CHARS_PER_TOKEN = 4  # Rough Gemini tokenization of English policy text, for budgets and local counts
+
+# Section types whose chunks answer most questions, most valuable first
+PREFIX_SECTION_PRIORITY = ['limits', 'exclusions', 'coverage', 'definitions', 'conditions', 'claims', 'premiums']
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def high_value_chunks(chunks: List[DocumentChunk], fact_chunk_ids: set, budget_tokens: int) -> List[DocumentChunk]:
+    """Fact sheet sources first, then chunks by section priority, up to the budget; in document order"""
+    def rank(position: int):
+        chunk = chunks[position]
+        section_type = chunk.metadata.get('type')
+        priority = PREFIX_SECTION_PRIORITY.index(section_type) if section_type in PREFIX_SECTION_PRIORITY else len(PREFIX_SECTION_PRIORITY)
+        return chunk.id not in fact_chunk_ids, priority, position
+
+    selected = []
+    used = 0
+    for position in sorted(range(len(chunks)), key=rank):
+        tokens = estimate_tokens(chunks[position].text)
+        if used + tokens > budget_tokens:
+            continue
+        selected.append(position)
+        used += tokens
+    return [chunks[position] for position in sorted(selected)]
+
+
+class CachedPrefix(str):
+    """Prompt text the serving side already holds; stand-in models skip its prefill"""
+
+
+class DocumentPrefix:
+    """The stable start of every prompt about one document: instructions and its high-value sections"""
+
+    def __init__(self, text: str, section_numbers: Dict[str, int]):
+        self.text = text
+        self.section_numbers = section_numbers  # chunk id -> section number in the prefix
+        self.tokens = estimate_tokens(text)
+
+
+class CachedContext:
+    """A document prefix registered with the provider"""
+
+    def __init__(self, key: str, prefix: DocumentPrefix, handle: Any, ttl_seconds: float):
+        self.key = key
+        self.prefix = prefix
+        self.handle = handle
+        # Renewed a little early so a question never references an expiring cache
+        self.expires_at = time.monotonic() + ttl_seconds * 0.9
+        self.uses = 0
+
+
+class GeminiCacheProvider:
+    """Gemini's cached-content API (google-generativeai 0.7 and later)"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.min_tokens = settings.CONTEXT_CACHE_MIN_TOKENS
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(genai, "caching") and hasattr(genai.GenerativeModel, "from_cached_content")
+
+    def create(self, key: str, prefix: DocumentPrefix, ttl_seconds: float) -> Any:
+        return genai.caching.CachedContent.create(
+            model=settings.CONTEXT_CACHE_MODEL,
+            display_name=f"policynth-{key[:16]}",
+            contents=[prefix.text],
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+
+    async def generate(self, context: CachedContext, prompt: str, generation_config) -> Tuple[Any, int]:
+        model = genai.GenerativeModel.from_cached_content(cached_content=context.handle)
+        response = await model.generate_content_async(prompt, generation_config=generation_config)
+        usage = getattr(response, "usage_metadata", None)
+        return response, getattr(usage, "cached_content_token_count", 0) or 0
+
+    def delete(self, handle: Any):
+        handle.delete()
+
+
+class LocalCacheProvider:
+    """Offline stand-in for a cached-content API.
+
+    Prefixes are kept in process and sent along with each question, marked as
+    CachedPrefix, so the answers are the same as with a real cache and stand-in
+    models can bill prefill for the uncached part only.
+    """
+
+    name = "local"
+    min_tokens = 0
+
+    def __init__(self, model):
+        self.model = model
+
+    def create(self, key: str, prefix: DocumentPrefix, ttl_seconds: float) -> Any:
+        return CachedPrefix(prefix.text)
+
+    async def generate(self, context: CachedContext, prompt: str, generation_config) -> Tuple[Any, int]:
+        response = await self.model.generate_content_async([context.handle, prompt], generation_config=generation_config)
+        return response, context.prefix.tokens
+
+    def delete(self, handle: Any):
+        pass
+
+
+def make_provider(model):
+    """The configured provider, or None when caching is off or the SDK lacks the API"""
+    if not settings.CONTEXT_CACHE_ENABLED:
+        return None
+    if settings.CONTEXT_CACHE_PROVIDER == "local":
+        return LocalCacheProvider(model)
+    if settings.CONTEXT_CACHE_PROVIDER != "gemini":
+        raise ValueError(f"Unknown CONTEXT_CACHE_PROVIDER {settings.CONTEXT_CACHE_PROVIDER!r}; expected 'gemini' or 'local'")
+    if not GeminiCacheProvider.available():
+        print(f"Context cache off: google-generativeai {getattr(genai, '__version__', '?')} has no cached-content API")
+        return None
+    return GeminiCacheProvider()
+
+
+class ContextCache:
+    """Per-document prompt prefixes registered once with the LLM provider and referenced by every question.
+
+    A document's prefix is built at ingestion but only registered when its first
+    question reaches the LLM; concurrent first questions share one registration.
+    It is renewed when its TTL runs out and deleted when the document is released.
+    """
+
+    def __init__(self, model):
+        self.provider = make_provider(model)
+        self.prefixes: Dict[str, DocumentPrefix] = {}  # document key -> prefix to register
+        self.contexts: Dict[str, CachedContext] = {}  # document key -> registered prefix
+        self._registrations = SingleFlight()
+        self._stats = {
+            "registered": 0, "renewed": 0, "released": 0, "failed": 0, "below_minimum": 0,
+            "cached_calls": 0, "uncached_calls": 0,
+            "prefix_tokens_registered": 0, "tokens_saved": 0, "uncached_prompt_tokens": 0,
+        }
+        self._seconds = {"cached": 0.0, "uncached": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.provider is not None
+
+    def prepare(self, key: str, prefix: DocumentPrefix):
+        """Remember a document's prefix; nothing is sent to the provider yet"""
+        if not self.enabled:
+            return
+        if prefix.tokens < self.provider.min_tokens:
+            # The provider rejects caches this small; these questions send full prompts
+            self._stats["below_minimum"] += 1
+            return
+        self.prefixes[key] = prefix
+
+    async def acquire(self, key: Optional[str]) -> Optional[CachedContext]:
+        """The registered context for a document, registering or renewing it when needed"""
+        if key is None or key not in self.prefixes:
+            return None
+        context = self.contexts.get(key)
+        if context is not None and time.monotonic() < context.expires_at:
+            return context
+        return await self._registrations.run(key, lambda: self._register(key, context is not None))
+
+    async def _register(self, key: str, renewal: bool) -> Optional[CachedContext]:
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            return None
+        ttl_seconds = settings.CONTEXT_CACHE_TTL_SECONDS
+        try:
+            handle = await asyncio.to_thread(self.provider.create, key, prefix, ttl_seconds)
+        except Exception as e:
+            # Not retried for this document: its questions send full prompts
+            print(f"Context cache registration failed, sending full prompts: {str(e)}")
+            self._stats["failed"] += 1
+            self.prefixes.pop(key, None)
+            return None
+        if key not in self.prefixes:
+            # Released while registering
+            self._delete(handle)
+            return None
+        context = CachedContext(key, prefix, handle, ttl_seconds)
+        previous = self.contexts.get(key)
+        self.contexts[key] = context
+        if previous is not None:
+            # Renewed early, so the provider still holds (and bills) the old one until deleted
+            self._delete(previous.handle)
+        self._stats["renewed" if renewal else "registered"] += 1
+        self._stats["prefix_tokens_registered"] += prefix.tokens
+        return context
+
+    async def generate(self, context: CachedContext, prompt: str, generation_config) -> Any:
+        """Generate with the cached prefix in front of `prompt`"""
+        start = time.perf_counter()
+        response, cached_tokens = await self.provider.generate(context, prompt, generation_config)
+        context.uses += 1
+        self._stats["cached_calls"] += 1
+        # Input tokens the provider read from the cache instead of processing again
+        self._stats["tokens_saved"] += cached_tokens
+        self._stats["uncached_prompt_tokens"] += estimate_tokens(prompt)
+        self._seconds["cached"] += time.perf_counter() - start
+        return response
+
+    def observe_uncached(self, prompt: str, seconds: float):
+        """Count a call that sent its full prompt, as the baseline for the savings"""
+        self._stats["uncached_calls"] += 1
+        self._stats["uncached_prompt_tokens"] += estimate_tokens(prompt)
+        self._seconds["uncached"] += seconds
+
+    def release(self, key: str):
+        """Forget a document's prefix and delete its registration"""
+        self.prefixes.pop(key, None)
+        context = self.contexts.pop(key, None)
+        if context is not None:
+            self._stats["released"] += 1
+            self._delete(context.handle)
+
+    def _delete(self, handle: Any):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        try:
+            if loop is not None:
+                # Deleting is a network call; the cache's TTL covers a failed delete
+                loop.run_in_executor(None, self.provider.delete, handle).add_done_callback(self._deleted)
+            else:
+                self.provider.delete(handle)
+        except Exception as e:
+            print(f"Context cache delete failed: {str(e)}")
+
+    def _deleted(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Context cache delete failed: {str(future.exception())}")
+
+    def stats(self) -> Dict[str, Any]:
+        cached_calls = self._stats["cached_calls"]
+        uncached_calls = self._stats["uncached_calls"]
+        cached_ms = self._seconds["cached"] * 1000 / cached_calls if cached_calls else None
+        uncached_ms = self._seconds["uncached"] * 1000 / uncached_calls if uncached_calls else None
+        saved_seconds = None
+        if cached_ms is not None and uncached_ms is not None:
+            # Against the mean full-prompt call; a rough figure when prompts differ in size
+            saved_seconds = round(cached_calls * (uncached_ms - cached_ms) / 1000, 3)
+        return {
+            "provider": self.provider.name if self.provider is not None else None,
+            "documents": len(self.prefixes),
+            "registered_contexts": len(self.contexts),
+            **self._stats,
+            "mean_cached_call_ms": round(cached_ms, 1) if cached_ms is not None else None,
+            "mean_uncached_call_ms": round(uncached_ms, 1) if uncached_ms is not None else None,
+            "estimated_seconds_saved": saved_seconds,
+        }
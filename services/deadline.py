@@ -0,0 +1,66 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from config.settings import settings
+
+# Markers for answers cut short by the request deadline
+PARTIAL_MARKER = "[PARTIAL: {reason}]"
+UNANSWERED = "[UNANSWERED: the request deadline was reached before this question was answered]"
+
+# The current request's deadline. Tasks and to_thread calls started by the request
+# copy its context, so every stage sees the same budget.
+_deadline: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+
+class Deadline:
+    """Absolute time budget for one request, and the degradations made to meet it"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def degrade(self, what: str):
+        """Record that a stage cut corners to stay within the budget"""
+        if what not in self.degraded:
+            self.degraded.append(what)
+
+
+def start_deadline(header_value: Optional[str] = None) -> Deadline:
+    """Start the current request's deadline from an X-Request-Timeout value in seconds, or the default"""
+    seconds = settings.REQUEST_DEADLINE_SECONDS
+    if header_value:
+        try:
+            seconds = float(header_value)
+        except ValueError:
+            pass
+    seconds = min(max(seconds, 0.1), settings.REQUEST_DEADLINE_MAX_SECONDS)
+    deadline = Deadline(seconds)
+    _deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The current request's deadline; None outside a request, where nothing is time-limited"""
+    return _deadline.get()
+
+
+def time_left(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds a stage may take: the remaining budget, at most `cap`; None when neither limits it"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return cap
+    return deadline.remaining() if cap is None else min(cap, deadline.remaining())
+
+
+def degrade(what: str):
+    """Record a degradation on the current request's deadline, if any"""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.degrade(what)
@@ -0,0 +1,60 @@
+import itertools
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from config.settings import settings
+
+
+class DebugStore:
+    """Traces of recently answered questions, capped by count and bytes; the oldest are evicted first.
+
+    Replaces keeping every past document's chunk metadata around for debugging:
+    a trace records what a question retrieved and how it was answered, and the
+    store's footprint stays fixed however long the service runs.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        # An explicit 0 keeps no traces
+        self.max_entries = max_entries if max_entries is not None else settings.DEBUG_TRACE_MAX_ENTRIES
+        self.max_bytes = max_bytes if max_bytes is not None else settings.DEBUG_TRACE_BUDGET_MB * 1024 * 1024
+        self.entries: Deque[Tuple[Dict[str, Any], int]] = deque()  # (trace, serialized size)
+        self.bytes = 0
+        self.recorded = 0
+        self.evicted = 0
+        self._ids = itertools.count(1)
+
+    def record(self, trace: Dict[str, Any]):
+        """Keep a trace, evicting the oldest ones over the count or byte cap"""
+        trace = dict(trace, trace_id=next(self._ids), timestamp=round(time.time(), 3))
+        size = len(json.dumps(trace, default=str))
+        self.recorded += 1
+        if size > self.max_bytes:
+            self.evicted += 1
+            return
+        self.entries.append((trace, size))
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted_size = self.entries.popleft()
+            self.bytes -= evicted_size
+            self.evicted += 1
+
+    def recent(self, limit: int = 50, document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest traces first, optionally only those that searched a given document"""
+        traces = []
+        for trace, _ in reversed(self.entries):
+            if document_id is None or document_id in trace.get("document_ids", ()):
+                traces.append(trace)
+                if len(traces) >= limit:
+                    break
+        return traces
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "recorded": self.recorded,
+            "evicted": self.evicted,
+        }
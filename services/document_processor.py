@@ -1,19 +1,27 @@
 import fitz  # PyMuPDF
-import docx
 import requests
 import tempfile
+import asyncio
 import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from models.schemas import DocumentChunk
 from config.settings import settings
+from services.term_matcher import term_matcher
+from services.docx_stream import iter_docx_blocks
 import uuid
 import hashlib
+import bisect
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, tokenizer=None):
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
+        # Chunk by the embedding model's own tokens so no chunk is truncated at encode time
+        self.tokenizer = tokenizer
+        self.max_tokens = settings.CHUNK_MAX_TOKENS
+        self.overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+        self.min_tokens = settings.CHUNK_MIN_TOKENS
         self.heading_patterns = [
             re.compile(r'^[A-Z][A-Z\s]{5,}$'),  # ALL CAPS HEADINGS
             re.compile(r'^\d+\.\d+\s+[A-Z]'),    # Numbered sections
@@ -23,42 +31,61 @@ class DocumentProcessor:
     async def download_document(self, blob_url: str) -> str:
         """Download document from blob URL to temporary file"""
         try:
-            response = requests.get(blob_url, stream=True)
-            response.raise_for_status()
-            
-            # Create temporary file
-            suffix = '.pdf' if 'pdf' in blob_url.lower() else '.docx'
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    tmp_file.write(chunk)
-                return tmp_file.name
+            # Blocking network I/O runs in a worker thread so the event loop stays free
+            return await asyncio.to_thread(self._download_to_temp_file, blob_url)
         except Exception as e:
             raise Exception(f"Failed to download document: {str(e)}")
     
+    def _download_to_temp_file(self, blob_url: str) -> str:
+        """Stream a blob URL into a temporary file and return its path"""
+        response = requests.get(blob_url, stream=True)
+        response.raise_for_status()
+        
+        # Create temporary file
+        suffix = '.pdf' if 'pdf' in blob_url.lower() else '.docx'
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            for chunk in response.iter_content(chunk_size=8192):
+                tmp_file.write(chunk)
+            return tmp_file.name
+    
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF using PyMuPDF"""
+        return "\n\n".join(self.extract_pages_from_pdf(file_path)) + "\n"
+    
+    def extract_pages_from_pdf(self, file_path: str) -> List[str]:
+        """Extract the text of each PDF page"""
         try:
             doc = fitz.open(file_path)
-            text = ""
+            pages = []
             for page in doc:
-                page_text = page.get_text()
-                # Clean common PDF artifacts
-                page_text = re.sub(r'\n{3,}', '\n\n', page_text)  # Remove excessive newlines
-                page_text = re.sub(r'\s{2,}', ' ', page_text)     # Remove excessive spaces
-                text += page_text + "\n"
+                # One line per text block, so wrapped lines rejoin and headings stay on their own line
+                blocks = page.get_text("blocks", sort=True)
+                lines = [" ".join(block[4].split()) for block in blocks if block[6] == 0]
+                pages.append("\n".join(line for line in lines if line))
             doc.close()
-            return text
+            return pages
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
     def extract_text_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX"""
+        """Extract text from DOCX, including table rows"""
+        return self.extract_structured_docx(file_path)[0]
+    
+    def extract_structured_docx(self, file_path: str) -> Tuple[str, List[int]]:
+        """Cleaned DOCX text, one line per paragraph or table row, and the offsets of heading-styled lines"""
         try:
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            lines = []
+            heading_starts = []
+            length = 0
+            for kind, block in iter_docx_blocks(file_path):
+                block = self.clean_text(block)
+                if not block:
+                    continue
+                if kind == "heading":
+                    heading_starts.append(length)
+                lines.append(block)
+                length += len(block) + 1
+            return "\n".join(lines), heading_starts
         except Exception as e:
             raise Exception(f"Failed to extract text from DOCX: {str(e)}")
     
@@ -100,14 +127,20 @@ class DocumentProcessor:
             
         return sections
     
-    def create_semantic_chunks(self, text: str) -> List[DocumentChunk]:
-        """STUNNER Semantic Chunking - intelligent clause-based chunking with overlap"""
+    def create_semantic_chunks(self, text: str, heading_starts: Optional[List[int]] = None) -> List[DocumentChunk]:
+        """STUNNER Semantic Chunking - token-aligned clause-based chunking with exact overlap"""
+        # Tokenize the whole document once; sections and chunks are token ranges into it
+        offsets = self._tokenize_with_offsets(text)
+        token_starts = [start for start, _ in offsets]
+        
         # Multi-level splitting for better semantic boundaries
-        sections = self._split_by_semantic_boundaries(text)
+        sections = self._merge_short_sections(text, self._split_by_semantic_boundaries(text, heading_starts), token_starts)
         chunks = []
         
         for section in sections:
-            section_chunks = self._create_overlapping_chunks(section)
+            first = bisect.bisect_left(token_starts, section['start'])
+            last = bisect.bisect_left(token_starts, section['end'])
+            section_chunks = self._create_overlapping_chunks(text, offsets, first, last, section)
             chunks.extend(section_chunks)
         
         print(f"🎯 Created {len(chunks)} semantic chunks with intelligent boundaries")
@@ -121,106 +154,114 @@ class DocumentProcessor:
         print(f"📊 Enhanced chunk distribution: {dict(sorted(type_counts.items(), key=lambda x: x[1], reverse=True))}")
         return chunks
     
-    def _split_by_semantic_boundaries(self, text: str) -> List[Dict]:
-        """Split text by semantic boundaries (headings, clauses, paragraphs)"""
-        lines = text.split('\n')
+    def _tokenize_with_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Tokenize text once and return the (start, end) character offsets of every token"""
+        if self.tokenizer is not None and getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False
+            )
+            return [tuple(offset) for offset in encoding['offset_mapping']]
+        
+        # No fast tokenizer available: whitespace-delimited words approximate tokens
+        return [match.span() for match in re.finditer(r'\S+', text)]
+    
+    def _split_by_semantic_boundaries(self, text: str, heading_starts: Optional[List[int]] = None) -> List[Dict]:
+        """Split text by semantic boundaries (headings, clauses, paragraphs) as character ranges"""
         sections = []
-        current_section = {'text': '', 'heading': '', 'type': 'content'}
+        current_section = None
+        # Lines the source document itself styles as headings (DOCX heading styles)
+        styled_headings = set(heading_starts or ())
         
-        for line in lines:
-            line = line.strip()
+        for match in re.finditer(r'[^\n]+', text):
+            line = match.group().strip()
             if not line:
                 continue
             
             # Detect headings and section breaks
-            if (line.isupper() and len(line) > 10) or \
+            if match.start() in styled_headings or \
+               (line.isupper() and len(line) > 10) or \
                re.match(r'^\d+\.\s+[A-Z]', line) or \
                re.match(r'^[A-Z][A-Z\s]{10,}$', line) or \
                line.endswith(':') and len(line.split()) <= 5:
                 
                 # Save previous section
-                if current_section['text'].strip():
+                if current_section:
                     sections.append(current_section)
                 
                 # Start new section
                 current_section = {
-                    'text': line,
+                    'start': match.start(),
+                    'end': match.end(),
                     'heading': line,
                     'type': 'heading'
                 }
+            elif current_section is None:
+                current_section = {'start': match.start(), 'end': match.end(), 'heading': '', 'type': 'content'}
             else:
-                current_section['text'] += '\n' + line
+                current_section['end'] = match.end()
         
         # Add final section
-        if current_section['text'].strip():
+        if current_section:
             sections.append(current_section)
         
         return sections
     
-    def _create_overlapping_chunks(self, section: Dict) -> List[DocumentChunk]:
-        """Create overlapping chunks within a section for better context"""
-        text = section['text']
-        sentences = self._split_into_sentences(text)
-        chunks = []
-        
-        chunk_size = 200  # words per chunk
-        overlap_size = 50  # overlap words
-        
-        current_chunk = []
-        current_words = 0
-        
-        for sentence in sentences:
-            sentence_words = len(sentence.split())
-            
-            # If adding sentence exceeds limit, create chunk
-            if current_words + sentence_words > chunk_size and current_chunk:
-                chunk_text = ' '.join(current_chunk)
-                
-                if len(chunk_text.split()) >= 50:  # Minimum meaningful size
-                    chunk = self._create_chunk_with_metadata(chunk_text, section, len(chunks))
-                    chunks.append(chunk)
-                
-                # Start new chunk with overlap
-                overlap_sentences = self._get_overlap_sentences(current_chunk, overlap_size)
-                current_chunk = overlap_sentences + [sentence]
-                current_words = sum(len(s.split()) for s in current_chunk)
+    def _merge_short_sections(self, text: str, sections: List[Dict], token_starts: List[int]) -> List[Dict]:
+        """Fold sections shorter than a chunk into their neighbour so no text is dropped"""
+        merged = []
+        for section in sections:
+            section['tokens'] = bisect.bisect_left(token_starts, section['end']) - bisect.bisect_left(token_starts, section['start'])
+            if merged and (section['tokens'] < self.min_tokens or merged[-1]['tokens'] < self.min_tokens):
+                merged[-1]['end'] = section['end']
+                merged[-1]['tokens'] += section['tokens']
             else:
-                current_chunk.append(sentence)
-                current_words += sentence_words
+                merged.append(section)
         
-        # Add final chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            if len(chunk_text.split()) >= 50:
-                chunk = self._create_chunk_with_metadata(chunk_text, section, len(chunks))
-                chunks.append(chunk)
-        
-        return chunks
-    
-    def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences with smart boundary detection"""
-        # Simple sentence splitting with common patterns
-        sentences = re.split(r'(?<=[.!?])\s+(?=[A-Z])', text)
-        return [s.strip() for s in sentences if s.strip()]
+        for index, section in enumerate(merged):
+            section['text'] = text[section['start']:section['end']]
+            section['index'] = index
+        return merged
     
-    def _get_overlap_sentences(self, sentences: List[str], overlap_words: int) -> List[str]:
-        """Get last few sentences for overlap based on word count"""
-        overlap_sentences = []
-        word_count = 0
+    def _create_overlapping_chunks(self, text: str, offsets: List[Tuple[int, int]], first: int, last: int, section: Dict) -> List[DocumentChunk]:
+        """Create overlapping chunks over the token range [first, last) of a section in one pass"""
+        chunks = []
+        max_tokens = self.max_tokens
+        stride = max(1, max_tokens - self.overlap_tokens)
         
-        for sentence in reversed(sentences):
-            sentence_words = len(sentence.split())
-            if word_count + sentence_words <= overlap_words:
-                overlap_sentences.insert(0, sentence)
-                word_count += sentence_words
-            else:
+        if last - first < self.min_tokens:
+            return chunks
+        
+        start = first
+        while True:
+            # Fold a too-short tail into a full-size final window instead of dropping it
+            if chunks and last - start < self.min_tokens:
+                start = max(first, last - max_tokens)
+            end = min(start + max_tokens, last)
+            
+            char_start = offsets[start][0]
+            char_end = offsets[end - 1][1]
+            chunk = self._create_chunk_with_metadata(
+                text[char_start:char_end], section, len(chunks),
+                char_start=char_start, char_end=char_end, token_count=end - start
+            )
+            chunks.append(chunk)
+            
+            if end >= last:
                 break
+            start += stride
         
-        return overlap_sentences
+        return chunks
     
-    def _create_chunk_with_metadata(self, text: str, section: Dict, chunk_index: int) -> DocumentChunk:
+    def _create_chunk_with_metadata(self, text: str, section: Dict, chunk_index: int, char_start: int = None, char_end: int = None, token_count: int = None) -> DocumentChunk:
         """Create chunk with rich metadata for better retrieval"""
-        section_type = self.detect_section_type(text)
+        # One pass over the chunk serves section typing and the rerank term groups
+        hits = term_matcher.match(text)
+        section_type = term_matcher.section_type(hits)
         
         return DocumentChunk(
             id=str(uuid.uuid4()),
@@ -228,37 +269,25 @@ class DocumentProcessor:
             metadata={
                 "source": "document",
                 "section": section.get('heading', f"section_{chunk_index}")[:100],
+                "section_index": section.get('index'),
                 "type": section_type,
                 "chunk_type": section.get('type', 'content'),
                 "is_heading": section.get('type') == 'heading',
                 "chunk_index": chunk_index,
+                "char_start": char_start,
+                "char_end": char_end,
+                "token_count": token_count,
                 "word_count": len(text.split()),
                 "has_numbers": bool(re.search(r'\d+', text)),
-                "has_definitions": 'means' in text.lower() or 'defined as' in text.lower()
+                "has_definitions": bool(hits.get('definitions', set()) & {'means', 'defined as'}),
+                "term_groups": term_matcher.chunk_groups(hits)
             }
         )
     
     def detect_section_type(self, text: str) -> str:
         """Enhanced section type detection for better metadata filtering"""
-        text_lower = text.lower()
-        
-        # Priority-based detection
-        if any(word in text_lower for word in ['definition', 'means', 'defined as', 'shall mean']):
-            return 'definitions'
-        elif any(word in text_lower for word in ['coverage', 'benefit', 'covered', 'insured', 'protection']):
-            return 'coverage'
-        elif any(word in text_lower for word in ['exclusion', 'excluded', 'not covered', 'does not cover']):
-            return 'exclusions'
-        elif any(word in text_lower for word in ['limit', 'maximum', 'minimum', 'deductible', 'amount']):
-            return 'limits'
-        elif any(word in text_lower for word in ['claim', 'procedure', 'process', 'submit']):
-            return 'claims'
-        elif any(word in text_lower for word in ['premium', 'payment', 'cost', 'fee']):
-            return 'premiums'
-        elif any(word in text_lower for word in ['condition', 'requirement', 'must', 'shall']):
-            return 'conditions'
-        else:
-            return 'policy_clause'
+        # Priority-based detection over a single pass of the compiled lexicon
+        return term_matcher.section_type(term_matcher.match(text))
     
     async def process_document(self, blob_url: str) -> List[DocumentChunk]:
         """Main method to process document and return chunks"""
@@ -266,35 +295,49 @@ class DocumentProcessor:
         file_path = await self.download_document(blob_url)
         
         try:
-            # Extract text based on file type
-            if file_path.endswith('.pdf'):
-                text = self.extract_text_from_pdf(file_path)
-            elif file_path.endswith('.docx'):
-                text = self.extract_text_from_docx(file_path)
-            else:
-                raise Exception("Unsupported file format")
-            
-            # Clean text and create semantic chunks
-            text = self.clean_text(text)
-            chunks = self.create_semantic_chunks(text)
-            
-            # Update metadata with source URL
-            for chunk in chunks:
-                chunk.metadata["source"] = blob_url
-            
-            return chunks
-            
+            # Parsing and chunking are CPU-bound; keep them off the event loop
+            return await asyncio.to_thread(self.process_file, file_path, blob_url)
         finally:
             # Clean up temporary file
             if os.path.exists(file_path):
                 os.unlink(file_path)
     
+    def process_file(self, file_path: str, source: str) -> List[DocumentChunk]:
+        """Extract, clean and chunk a downloaded document"""
+        # Extract text based on file type
+        page_starts = None
+        heading_starts = None
+        if file_path.endswith('.pdf'):
+            # Clean page by page so chunks can be mapped back to their page
+            pages = [self.clean_text(page) for page in self.extract_pages_from_pdf(file_path)]
+            page_starts = []
+            text = ""
+            for page in pages:
+                page_starts.append(len(text))
+                text += page + "\n\n"
+        elif file_path.endswith('.docx'):
+            text, heading_starts = self.extract_structured_docx(file_path)
+        else:
+            raise Exception("Unsupported file format")
+        
+        # Create semantic chunks
+        chunks = self.create_semantic_chunks(text, heading_starts)
+        
+        # Update metadata with source URL and the page each chunk starts on
+        for chunk in chunks:
+            chunk.metadata["source"] = source
+            if page_starts is not None:
+                chunk.metadata["page"] = bisect.bisect_right(page_starts, chunk.metadata["char_start"])
+        
+        return chunks
+    
     def clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = " ".join(text.split())
+        """Clean and normalize text, keeping line breaks so headings and sections survive"""
+        # Collapse whitespace within lines (including non-breaking spaces) but not across them
+        text = re.sub(r'[^\S\n]+', ' ', text.replace('\r\n', '\n'))
+        text = re.sub(r' ?\n ?', '\n', text)
+        text = re.sub(r'\n{3,}', '\n\n', text).strip()
         # Remove special characters that might interfere
-        text = text.replace('\u00a0', ' ')  # Non-breaking space
         text = text.replace('\u2019', "'")  # Right single quotation mark
         text = text.replace('\u201c', '"')  # Left double quotation mark
         text = text.replace('\u201d', '"')  # Right double quotation mark
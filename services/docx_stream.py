@@ -0,0 +1,115 @@
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, Tuple
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+HEADING_STYLE_NAME = re.compile(r'^(heading \d|title|subtitle)$', re.IGNORECASE)
+
+# Run children that stand for characters, besides w:t
+RUN_CHARACTERS = {W + "tab": "\t", W + "br": "\n", W + "cr": "\n", W + "noBreakHyphen": "-"}
+
+
+def heading_style_ids(archive: zipfile.ZipFile) -> set:
+    """Style ids of heading, title and outline-level paragraph styles, from word/styles.xml"""
+    try:
+        root = ET.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return set()
+    ids = set()
+    for style in root.iter(W + "style"):
+        if style.get(W + "type") != "paragraph":
+            continue
+        name = style.find(W + "name")
+        outline = style.find(f"{W}pPr/{W}outlineLvl")
+        # Outline levels 0-8 are headings; 9 is body text
+        if (name is not None and HEADING_STYLE_NAME.match(name.get(W + "val", ""))) or \
+           (outline is not None and outline.get(W + "val") != "9"):
+            ids.add(style.get(W + "styleId"))
+    return ids
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[Tuple[str, str]]:
+    """Paragraphs and table rows of a DOCX in document order, as (kind, text).
+
+    kind is "heading" for paragraphs in a heading style or with an outline level,
+    "paragraph" for other paragraphs and "row" for table rows, whose cells are joined
+    with " | ". Nested tables are folded into their enclosing cell. word/document.xml
+    is parsed as a stream straight from the zip and each block is discarded once
+    yielded, so memory stays flat however long the document is.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        headings = heading_style_ids(archive)
+        with archive.open("word/document.xml") as xml:
+            yield from _iter_blocks(xml, headings)
+
+
+def _iter_blocks(xml, headings: set) -> Iterator[Tuple[str, str]]:
+    body = None
+    paragraphs = []  # Open paragraphs (text boxes nest inside runs): [parts, is_heading]
+    tables = []  # Open tables, innermost last: {"cells": current row, "cell": current cell's lines}
+    fallback_depth = 0  # Inside mc:Fallback, which repeats its mc:Choice sibling's content
+
+    for event, elem in ET.iterparse(xml, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif fallback_depth:
+                continue
+            elif tag == W + "p":
+                paragraphs.append([[], False])
+            elif tag == W + "tbl":
+                tables.append({"cells": [], "cell": []})
+            elif tag == W + "tr" and tables:
+                tables[-1]["cells"] = []
+            elif tag == W + "tc" and tables:
+                tables[-1]["cell"] = []
+            elif tag == W + "body":
+                body = elem
+            continue
+
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+            elem.clear()
+            continue
+        if fallback_depth or not paragraphs and not tables and tag not in (W + "p", W + "tbl"):
+            continue
+
+        if tag == W + "t" and paragraphs:
+            if elem.text:
+                paragraphs[-1][0].append(elem.text)
+        elif tag in RUN_CHARACTERS and paragraphs:
+            paragraphs[-1][0].append(RUN_CHARACTERS[tag])
+        elif tag == W + "pStyle" and paragraphs:
+            paragraphs[-1][1] = paragraphs[-1][1] or elem.get(W + "val") in headings
+        elif tag == W + "outlineLvl" and paragraphs:
+            paragraphs[-1][1] = paragraphs[-1][1] or elem.get(W + "val") != "9"
+        elif tag == W + "p" and paragraphs:
+            parts, is_heading = paragraphs.pop()
+            text = "".join(parts)
+            if tables:
+                tables[-1]["cell"].append(text)
+            elif paragraphs:
+                # A text box: keep its text in the paragraph that anchors it
+                paragraphs[-1][0].append(" " + text)
+            else:
+                yield ("heading" if is_heading else "paragraph"), text
+        elif tag == W + "tc" and tables:
+            tables[-1]["cells"].append(" ".join(line.strip() for line in tables[-1]["cell"] if line.strip()))
+        elif tag == W + "tr" and tables:
+            row = " | ".join(cell for cell in tables[-1]["cells"] if cell)
+            if len(tables) > 1:
+                tables[-2]["cell"].append(row)
+            elif row:
+                yield "row", row
+        elif tag == W + "tbl" and tables:
+            tables.pop()
+
+        # Drop finished top-level blocks so the tree never holds more than the current one
+        # (a block inside a content control leaves only its emptied element behind)
+        if not paragraphs and not tables:
+            elem.clear()
+            if body is not None:
+                body.clear()
@@ -0,0 +1,195 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from config.settings import settings
+
+
+class _EncodeRequest:
+    def __init__(self, texts: List[str], priority: bool):
+        self.texts = texts
+        self.priority = priority
+        self.vectors = None
+        self.remaining = len(texts)
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """Dedicated encoder thread that merges encode calls from all requests into dynamic batches.
+
+    Each call is queued; the thread starts a batch with the oldest pending texts and
+    keeps adding texts from other calls until the batch holds `max_batch_size` texts
+    or `max_wait_ms` has passed, runs one forward pass and hands every caller its
+    own slice. Calls larger than a batch are split across consecutive batches.
+
+    Priority calls (questions, and any call of at most EMBEDDING_PRIORITY_MAX_TEXTS
+    texts) have their own lane, batched ahead of ingestion backlogs. A call whose
+    caller has gone away (its future cancelled) is dropped from the backlog.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int = None, max_wait_ms: float = None):
+        self._encode = encode
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (settings.EMBEDDING_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self.priority_max_texts = settings.EMBEDDING_PRIORITY_MAX_TEXTS
+        self._priority: deque = deque()  # [request, next offset] of priority calls not yet fully batched
+        self._backlog: deque = deque()  # [request, next offset] of other calls not yet fully batched
+        self._backlog_texts = 0  # Texts left in both lanes
+        self._stats = {"batches": 0, "texts": 0, "requests": 0, "priority_requests": 0, "dropped_texts": 0,
+                       "errors": 0, "encode_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str], priority: Optional[bool] = None) -> Future:
+        """Queue texts for encoding; the future resolves to a (len(texts), dim) array.
+
+        `priority` puts the call in the priority lane; by default only small calls go there.
+        """
+        texts = list(texts)
+        if priority is None:
+            priority = len(texts) <= self.priority_max_texts
+        request = _EncodeRequest(texts, priority)
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        self._stats["requests"] += 1
+        self._stats["priority_requests"] += priority
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str], priority: Optional[bool] = None) -> np.ndarray:
+        """Blocking encode for worker threads"""
+        return self.submit(texts, priority).result()
+
+    async def encode_async(self, texts: List[str], priority: Optional[bool] = None) -> np.ndarray:
+        """Encode without blocking the event loop; cancelling the await drops the texts not yet encoded"""
+        return await asyncio.wrap_future(self.submit(texts, priority))
+
+    def stats(self) -> Dict[str, float]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "queued_requests": self._queue.qsize() + len(self._priority) + len(self._backlog),
+            "mean_batch_size": round(self._stats["texts"] / batches, 2) if batches else 0.0,
+        }
+
+    def _enqueue(self, request: _EncodeRequest):
+        (self._priority if request.priority else self._backlog).append([request, 0])
+        self._backlog_texts += len(request.texts)
+
+    def _run(self):
+        while True:
+            slices = []
+            try:
+                self._collect()
+                texts, slices = self._take_batch()
+                if texts:
+                    self._encode_and_deliver(texts, slices)
+            except Exception as e:
+                # Keep the only encoder thread alive; fail just the callers of this batch
+                self._stats["errors"] += 1
+                print(f"Embedding batcher error: {str(e)}")
+                self._fail([request for request, _, _ in slices], e)
+
+    def _collect(self):
+        """Block for the first call, then wait briefly for other callers' texts to fill the batch"""
+        if not self._priority and not self._backlog:
+            self._enqueue(self._queue.get())
+        # Calls submitted behind a long backlog still reach their lane before the next batch
+        while True:
+            try:
+                self._enqueue(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        deadline = time.monotonic() + self.max_wait
+        while self._backlog_texts < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self._enqueue(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+    def _encode_and_deliver(self, texts: List[str], slices: list):
+        try:
+            vectors = self._timed_encode(texts)
+        except Exception as e:
+            if len(slices) == 1:
+                self._fail([slices[0][0]], e)
+                return
+            # Re-run each caller's slice alone so one bad input only fails its own caller
+            for request, offset, count in slices:
+                try:
+                    self._deliver(request, offset, count, self._timed_encode(request.texts[offset:offset + count]))
+                except Exception as request_error:
+                    self._fail([request], request_error)
+            return
+
+        position = 0
+        for request, offset, count in slices:
+            self._deliver(request, offset, count, vectors[position:position + count])
+            position += count
+
+    def _timed_encode(self, texts: List[str]) -> np.ndarray:
+        start = time.perf_counter()
+        vectors = self._encode(texts)
+        self._stats["encode_seconds"] += time.perf_counter() - start
+        self._stats["batches"] += 1
+        self._stats["texts"] += len(texts)
+        return vectors
+
+    def _deliver(self, request: _EncodeRequest, offset: int, count: int, vectors: np.ndarray):
+        """Copy a caller's slice into its result and resolve it once complete"""
+        if request.future.done():
+            return
+        if request.vectors is None:
+            request.vectors = np.empty((len(request.texts), vectors.shape[1]), dtype=np.float32)
+        request.vectors[offset:offset + count] = vectors
+        request.remaining -= count
+        if request.remaining == 0:
+            try:
+                request.future.set_result(request.vectors)
+            except InvalidStateError:
+                # Cancelled by its caller's event loop after the check above
+                pass
+
+    def _take_batch(self):
+        """Pop up to max_batch_size texts, priority lane first, oldest request first within a lane"""
+        texts: List[str] = []
+        slices = []
+        for lane in (self._priority, self._backlog):
+            while lane and len(texts) < self.max_batch_size:
+                entry = lane[0]
+                request, offset = entry
+                if request.future.done():
+                    # The caller went away (or an earlier slice failed); skip what is left of it
+                    lane.popleft()
+                    dropped = len(request.texts) - offset
+                    self._backlog_texts -= dropped
+                    self._stats["dropped_texts"] += dropped
+                    continue
+                count = min(self.max_batch_size - len(texts), len(request.texts) - offset)
+                texts.extend(request.texts[offset:offset + count])
+                slices.append((request, offset, count))
+                if offset + count == len(request.texts):
+                    lane.popleft()
+                else:
+                    entry[1] = offset + count
+                self._backlog_texts -= count
+        return texts, slices
+
+    def _fail(self, requests: List[_EncodeRequest], error: Exception):
+        """Fail the given requests; _take_batch drops their unbatched remainder"""
+        for request in requests:
+            if not request.future.done():
+                try:
+                    request.future.set_exception(error)
+                except InvalidStateError:
+                    pass
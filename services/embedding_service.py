@@ -1,6 +1,10 @@
 from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any
 from config.settings import settings
+from services.embedding_batcher import EmbeddingBatcher
+from services.length_buckets import LengthBucketer
+import numpy as np
+import time
 import hashlib
 import json
 
@@ -9,19 +13,64 @@ class EmbeddingService:
         """Initialize with sentence-transformers for local embeddings"""
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
         self.dimension = 384  # all-MiniLM-L6-v2 dimension
+        # Shared with DocumentProcessor so chunks are sized in the model's own tokens
+        self.tokenizer = self.model.tokenizer
+        # Batches are encoded in passes of similar length sized for this CPU
+        self.bucketer = LengthBucketer()
+        # All encode calls go through one dedicated thread that batches across requests
+        self.batcher = EmbeddingBatcher(self._encode_batch)
     
-    def encode_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None) -> List[List[float]]:
-        """Generate embeddings using sentence-transformers with batching"""
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode a dynamic batch in length-bucketed passes; rows come back in input order, L2-normalized float32"""
+        lengths = self._token_lengths(texts)
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for positions in self.bucketer.plan(lengths):
+            start = time.perf_counter()
+            vectors[positions] = self.model.encode(
+                [texts[i] for i in positions], batch_size=len(positions), convert_to_numpy=True, normalize_embeddings=True
+            )
+            self.bucketer.observe(lengths[positions], time.perf_counter() - start)
+        return vectors
+    
+    def _token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Tokens each text occupies in a forward pass, special tokens included and truncation applied"""
+        max_length = self.model.max_seq_length
+        if self.tokenizer is not None and getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+            lengths = [len(ids) for ids in encoding["input_ids"]]
+        else:
+            # No fast tokenizer available: whitespace-delimited words approximate tokens
+            lengths = [len(text.split()) + 2 for text in texts]
+        return np.minimum(np.array(lengths, dtype=np.int64), max_length)
+    
+    def encode_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None) -> np.ndarray:
+        """Embed texts as one (len(texts), dimension) float32 matrix (blocking; call from worker threads)"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        try:
+            return self.batcher.encode(texts)
+        except Exception as e:
+            raise Exception(f"Failed to generate embeddings: {str(e)}")
+    
+    def encode_single_text(self, text: str) -> np.ndarray:
+        """Generate embedding for single text (blocking; call from worker threads)"""
+        try:
+            return self.batcher.encode([text])[0]
+        except Exception as e:
+            raise Exception(f"Failed to generate embedding: {str(e)}")
+    
+    async def encode_texts_async(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as one float32 matrix without blocking the event loop"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
         try:
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            return await self.batcher.encode_async(texts, priority=True)
         except Exception as e:
             raise Exception(f"Failed to generate embeddings: {str(e)}")
     
-    def encode_single_text(self, text: str) -> List[float]:
-        """Generate embedding for single text"""
+    async def encode_single_text_async(self, text: str) -> np.ndarray:
+        """Generate embedding for single text without blocking the event loop"""
         try:
-            embedding = self.model.encode([text], convert_to_tensor=False)[0]
-            return embedding.tolist()
+            return (await self.batcher.encode_async([text], priority=True))[0]
         except Exception as e:
-            raise Exception(f"Failed to generate embedding: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to generate embedding: {str(e)}")
@@ -0,0 +1,166 @@
+import re
+from typing import Dict, List, Optional, Set
+from config.settings import settings
+from models.schemas import RetrievalResult
+from services.term_matcher import term_matcher
+
+EXTRACTIVE_INTENTS = {'specific_value', 'time_period', 'limits'}
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'fifteen': 15, 'eighteen': 18,
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'forty-five': 45, 'sixty': 60, 'ninety': 90,
+    'twenty-four': 24, 'thirty-six': 36, 'forty-eight': 48, 'one hundred eighty': 180,
+}
+
+_UNIT = r'(days?|months?|years?|hours?|weeks?)'
+_WORD_NUMBER = r'[a-z]+(?:[- ][a-z]+){0,2}'
+
+# "thirty (30) days", "thirty-six (36) months", "36 months", "thirty days"
+DURATION_PATTERN = re.compile(
+    rf'(?:\b{_WORD_NUMBER}\s*\(\s*(\d+)\s*\)|\b(\d+)|\b({"|".join(sorted(NUMBER_WORDS, key=len, reverse=True))}))\s*(?:consecutive\s+|continuous\s+)?{_UNIT}\b',
+    re.IGNORECASE
+)
+# "INR 5,000", "Rs. 50,000", "₹ 2 lakh", "10%", "5 percent"
+AMOUNT_PATTERN = re.compile(
+    r'(?:(?:\b(?:rs|inr)\.?|₹)\s*([\d,]+(?:\.\d+)?)(?:\s*(lakhs?|crores?))?'
+    r'|\b(\d+(?:\.\d+)?)\s*(%|percent\b|per cent\b))',
+    re.IGNORECASE
+)
+# Sentence ends, but not after "Rs." or "No."
+SENTENCE_BOUNDARY = re.compile(r'(?<!\b[Rr]s\.)(?<!\bNo\.)(?<=[.;!?])\s+(?=[A-Z(])|\n+')
+WORD_PATTERN = re.compile(r"[a-z][a-z\-']*")
+
+# Question words that carry no information about which fact is asked for
+QUESTION_STOPWORDS = {
+    'what', 'whats', "what's", 'is', 'are', 'the', 'a', 'an', 'of', 'for', 'to', 'in', 'on', 'under', 'this',
+    'that', 'policy', 'how', 'many', 'much', 'long', 'does', 'do', 'there', 'any', 'which', 'with', 'by',
+    'period', 'days', 'months', 'years', 'amount', 'limit', 'maximum', 'minimum', 'covered', 'cover', 'and',
+    'or', 'applicable', 'provided', 'allowed', 'be', 'can', 'i', 'my', 'insured', 'plan', 'it', 'its',
+}
+AMOUNT_CUES = {'percentage', 'percent', 'rate', 'cost', 'discount', 'co-pay', 'copay', 'rent', 'sum', 'premium', 'amount', 'limit'}
+
+
+def extract_values(sentence: str, kind: Optional[str] = None) -> Set[str]:
+    """Normalized values in a sentence, e.g. {'30 day'}; kind is 'duration', 'amount' or None for both"""
+    values = set()
+    if kind in (None, 'duration'):
+        for match in DURATION_PATTERN.finditer(sentence):
+            number = match.group(1) or match.group(2) or NUMBER_WORDS[match.group(3).lower()]
+            values.add(f"{number} {match.group(4).lower().rstrip('s')}")
+    if kind in (None, 'amount'):
+        for match in AMOUNT_PATTERN.finditer(sentence):
+            if match.group(1):
+                values.add(f"INR {match.group(1).replace(',', '')}{' ' + match.group(2).lower().rstrip('s') if match.group(2) else ''}")
+            else:
+                values.add(f"{match.group(3)}%")
+    return values
+
+
+class ExtractiveAnswer:
+    def __init__(self, text: str, value: str, confidence: float, chunk_id: str):
+        self.text = text
+        self.value = value
+        self.confidence = confidence
+        self.chunk_id = chunk_id
+
+
+class ExtractiveAnswerer:
+    """Answer numeric and period questions from a retrieved sentence without an LLM call.
+
+    Candidate values (durations, amounts, percentages) are pulled from the top
+    retrieved chunks that contain numbers. Each candidate's sentence is scored by
+    how many of the question's focus terms it contains, whether the value has the
+    unit the question asks for, and the chunk's retrieval rank. The best sentence
+    is returned verbatim when its confidence clears the threshold and no other
+    sentence offers a different value with similar confidence.
+    """
+
+    def __init__(self, min_confidence: float = None, max_chunks: int = None):
+        self.min_confidence = settings.EXTRACTIVE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.max_chunks = max_chunks or settings.EXTRACTIVE_MAX_CHUNKS
+        self._stats = {"attempts": 0, "answered": 0, "ambiguous": 0}
+
+    def stats(self) -> Dict[str, float]:
+        attempts = self._stats["attempts"]
+        return {**self._stats, "hit_rate": round(self._stats["answered"] / attempts, 3) if attempts else 0.0}
+
+    def answer(self, question: str, query_intent: Dict, results: List[RetrievalResult]) -> Optional[ExtractiveAnswer]:
+        """Extractive answer for an eligible question, or None to fall back to the LLM"""
+        # The LLM classifier sets intent_type; the keyword fallback sets query_type
+        intent = query_intent.get('intent_type') or query_intent.get('query_type')
+        if intent not in EXTRACTIVE_INTENTS or not results:
+            return None
+        self._stats["attempts"] += 1
+
+        question_lower = question.lower()
+        focus = self._focus_terms(question_lower)
+        expected = self._expected_kind(question_lower)
+        candidates = []
+        for rank, result in enumerate(results[:self.max_chunks]):
+            if not result.chunk.metadata.get('has_numbers', True):
+                continue
+            candidates.extend(self._score_sentences(result, rank, focus, expected))
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        confidence, values, sentence, chunk_id = candidates[0]
+        if confidence < self.min_confidence:
+            return None
+        for other_confidence, other_values, _, _ in candidates[1:]:
+            if confidence - other_confidence >= 0.1:
+                break
+            if not other_values & values:
+                # A close runner-up states a different value; let the LLM reconcile them
+                self._stats["ambiguous"] += 1
+                return None
+
+        self._stats["answered"] += 1
+        return ExtractiveAnswer(sentence, ", ".join(sorted(values)), confidence, chunk_id)
+
+    def _focus_terms(self, question_lower: str) -> List[str]:
+        """Content words that say which fact is asked for, e.g. grace, pre-existing"""
+        words = [word.strip("-'") for word in WORD_PATTERN.findall(question_lower)]
+        return [word for word in dict.fromkeys(words) if word and word not in QUESTION_STOPWORDS and len(word) > 2]
+
+    def _expected_kind(self, question_lower: str) -> Optional[str]:
+        hits = term_matcher.match(question_lower)
+        wants_time = 'time_units' in hits or 'period_terms' in hits or 'how long' in question_lower
+        wants_amount = 'deductible_terms' in hits or any(cue in question_lower for cue in AMOUNT_CUES)
+        if wants_time and not wants_amount:
+            return 'duration'
+        if wants_amount and not wants_time:
+            return 'amount'
+        return None
+
+    def _score_sentences(self, result: RetrievalResult, rank: int, focus: List[str], expected: Optional[str]):
+        scored = []
+        rank_weight = 1.0 / (rank + 1)
+        for sentence in SENTENCE_BOUNDARY.split(result.chunk.text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            values = extract_values(sentence, expected)
+            if not values:
+                continue
+            coverage = self._coverage(sentence, focus)
+            if coverage < 0.5:
+                continue
+            unit_match = 1.0 if expected else 0.5
+            confidence = 0.6 * coverage + 0.2 * rank_weight + 0.2 * unit_match
+            scored.append((confidence, values, sentence, result.chunk.id))
+        return scored
+
+    def _coverage(self, sentence: str, focus: List[str]) -> float:
+        """Fraction of focus terms in the sentence, ignoring hyphenation and inflection"""
+        if not focus:
+            return 0.5
+        compact = re.sub(r'[^a-z0-9]', '', sentence.lower())
+        found = 0
+        for term in focus:
+            term = re.sub(r'[^a-z0-9]', '', term)
+            stem = term[:max(4, len(term) - 2)]
+            if stem in compact or (term.startswith('percent') and '%' in sentence):
+                found += 1
+        return found / len(focus)
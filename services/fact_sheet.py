@@ -0,0 +1,137 @@
+import re
+from typing import Callable, Dict, List, Optional
+from models.schemas import DocumentChunk
+from services.extractive_answerer import SENTENCE_BOUNDARY, extract_values
+
+
+class FactSpec:
+    """One commonly asked policy fact: how to find it in text and in questions"""
+
+    def __init__(self, name: str, label: str, sentence: str, question: str, kind: str,
+                 sections: List[str], require: str = None, reject: str = None, units: List[str] = None):
+        self.name = name
+        self.label = label
+        self.sentence = re.compile(sentence, re.IGNORECASE)  # Sentence states this fact
+        self.question = re.compile(question, re.IGNORECASE)  # Question asks about it
+        self.kind = kind  # 'duration' or 'amount'
+        self.sections = set(sections)  # Section types where the fact is usually stated
+        self.require = re.compile(require, re.IGNORECASE) if require else None
+        self.reject = re.compile(reject, re.IGNORECASE) if reject else None
+        self.units = units  # Accepted value suffixes, e.g. ['month', 'year'] or ['%']
+
+
+FACTS = [
+    FactSpec('grace_period', 'Grace period', r'\bgrace period\b', r'\bgrace period\b',
+             'duration', ['premiums', 'conditions', 'definitions'], units=['day', 'month']),
+    FactSpec('ped_waiting_period', 'Pre-existing disease waiting period', r'\bpre[- ]?existing\b|\bPED\b',
+             r'\bpre[- ]?existing\b|\bPED\b', 'duration', ['exclusions', 'conditions', 'coverage'],
+             require=r'waiting|continuous coverage|after', units=['month', 'year']),
+    FactSpec('maternity_waiting_period', 'Maternity waiting period', r'\bmaternity\b|\bpregnan|\bchildbirth\b',
+             r'\bmaternity\b|\bpregnan|\bchildbirth\b', 'duration', ['coverage', 'exclusions', 'conditions'],
+             require=r'waiting|continuous coverage|after', units=['month', 'year']),
+    FactSpec('room_rent_limit', 'Room rent limit', r'\broom rent\b|\broom charges?\b', r'\broom rent\b|\broom charges?\b',
+             'amount', ['limits', 'coverage']),
+    FactSpec('sum_insured', 'Sum insured', r'\bsum insured\b', r'\bsum insured\b',
+             'amount', ['definitions', 'limits', 'coverage'], reject=r'\broom\b|\bICU\b|%|per cent|percent'),
+    FactSpec('co_payment', 'Co-payment', r'\bco-?pay(?:ment)?\b', r'\bco-?pay(?:ment)?\b',
+             'amount', ['limits', 'claims', 'conditions'], units=['%']),
+    FactSpec('no_claim_discount', 'No claim discount', r'\bno[- ]claim discount\b|\bNCD\b', r'\bno[- ]claim discount\b|\bNCD\b',
+             'amount', ['premiums', 'conditions', 'coverage'], units=['%']),
+]
+
+# Questions that ask for a fact's value rather than a yes/no or an explanation
+VALUE_QUESTION = re.compile(r'^\s*(what|how|which|when|within)\b|\b(how many|how much|how long)\b', re.IGNORECASE)
+QUALIFIED_QUESTION = re.compile(r'\b(if|unless|except|exclusion|excluded|difference|compare|why)\b', re.IGNORECASE)
+
+
+class FactSheet:
+    """Facts extracted from one document, each with its source chunk"""
+
+    def __init__(self, facts: Dict[str, Dict]):
+        self.facts = facts
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self.facts.get(name)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return self.facts
+
+
+class FactExtractor:
+    """Builds per-document fact sheets at ingestion and maps questions onto them.
+
+    Each sentence that names a fact and states a value of the right kind is a
+    candidate; candidates from chunks whose detected section type is one where
+    the fact is usually stated win. A fact stated with different values of equal
+    weight is left out of the sheet, so such questions go through retrieval.
+    """
+
+    def __init__(self, detect_section_type: Callable[[str], str]):
+        self.detect_section_type = detect_section_type
+        self._stats = {"lookups": 0, "hits": 0}
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self._stats["lookups"]
+        return {**self._stats, "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0}
+
+    def extract(self, chunks: List[DocumentChunk]) -> FactSheet:
+        """Scan chunks for the known facts"""
+        candidates: Dict[str, List] = {}
+        for chunk in chunks:
+            section_type = chunk.metadata.get("type") or self.detect_section_type(chunk.text)
+            for sentence in SENTENCE_BOUNDARY.split(chunk.text):
+                sentence = sentence.strip()
+                for spec in FACTS:
+                    if not spec.sentence.search(sentence):
+                        continue
+                    if spec.require and not spec.require.search(sentence):
+                        continue
+                    if spec.reject and spec.reject.search(sentence):
+                        continue
+                    values = sorted(value for value in extract_values(sentence, spec.kind)
+                                    if not spec.units or any(value.endswith(unit) for unit in spec.units))
+                    if not values:
+                        continue
+                    weight = (1.0 if section_type in spec.sections else 0.5) + (0.25 if len(sentence.split()) <= 40 else 0.0)
+                    candidates.setdefault(spec.name, []).append((weight, values, sentence, chunk, section_type))
+
+        facts = {}
+        for spec in FACTS:
+            found = sorted(candidates.get(spec.name, []), key=lambda candidate: candidate[0], reverse=True)
+            if not found:
+                continue
+            weight, values, sentence, chunk, section_type = found[0]
+            if any(other[0] == weight and other[1] != values for other in found[1:]):
+                # Stated differently in equally likely places; leave it to retrieval
+                continue
+            facts[spec.name] = {
+                "label": spec.label,
+                "value": ", ".join(values),
+                "answer": sentence,
+                "section": section_type,
+                "chunk_id": chunk.id,
+                "char_start": chunk.metadata.get("char_start"),
+                "char_end": chunk.metadata.get("char_end"),
+            }
+        print(f"Fact sheet: {len(facts)}/{len(FACTS)} facts ({', '.join(facts) or 'none'})")
+        return FactSheet(facts)
+
+    def question_fact(self, question: str) -> Optional[str]:
+        """Name of the single known fact a plain value question asks for"""
+        if not VALUE_QUESTION.search(question) or QUALIFIED_QUESTION.search(question):
+            return None
+        matched = [spec.name for spec in FACTS if spec.question.search(question)]
+        return matched[0] if len(matched) == 1 else None
+
+    def lookup(self, question: str, sheets: List[FactSheet]) -> Optional[Dict]:
+        """Fact answering the question, when exactly one of the documents states it"""
+        self._stats["lookups"] += 1
+        name = self.question_fact(question)
+        if name is None:
+            return None
+        found = [sheet.get(name) for sheet in sheets if sheet.get(name)]
+        if len(found) != 1:
+            # Missing, or a rider may restate it; retrieval sees all the documents
+            return None
+        self._stats["hits"] += 1
+        return found[0]
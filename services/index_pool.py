@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+from config.settings import settings
+from services.single_flight import SingleFlight
+from services.stage_timer import stage
+from services.vector_store import VectorStore
+
+
+class _PooledIndex:
+    def __init__(self, store: VectorStore):
+        self.store = store
+        self.bytes = store.memory_bytes()
+        self.vectors = store.index.ntotal
+        self.hits = 0
+        self.last_used = time.monotonic()
+        self.on_disk = False  # A spill file matching the store exists
+        self.evicting = False
+
+
+class IndexPool:
+    """Document indexes kept in RAM under a memory budget, spilled to disk when over it.
+
+    When the resident footprint exceeds the budget the least recently (or least
+    frequently) used indexes are written to `spill_dir` and dropped from memory;
+    `get` reloads a spilled index transparently. Stores are immutable once pooled,
+    so an index is written to disk at most once. A store that is evicted while a
+    query is still searching it stays alive until that query finishes.
+    """
+
+    def __init__(self, budget_mb: float = None, policy: str = None, spill_dir: str = None):
+        self.budget_bytes = int((budget_mb or settings.INDEX_MEMORY_BUDGET_MB) * 1024 * 1024)
+        self.policy = policy or settings.INDEX_EVICTION_POLICY
+        if self.policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {self.policy}")
+        self.spill_dir = spill_dir or settings.INDEX_SPILL_DIR
+        self._entries: Dict[str, _PooledIndex] = {}
+        self._resident_bytes = 0
+        self._loads = SingleFlight()
+        self._stats = {"hits": 0, "reloads": 0, "evictions": 0, "evicted_bytes": 0, "load_seconds": 0.0, "max_load_seconds": 0.0}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def count(self, key: str) -> Optional[int]:
+        """Number of vectors in an index, resident or not"""
+        entry = self._entries.get(key)
+        return entry.vectors if entry is not None else None
+
+    async def put(self, key: str, store: VectorStore):
+        """Add an index as resident, evicting others if the budget is exceeded"""
+        self.discard(key)
+        entry = _PooledIndex(store)
+        self._entries[key] = entry
+        self._resident_bytes += entry.bytes
+        await self._enforce_budget(keep=key)
+
+    async def get(self, key: str) -> Optional[VectorStore]:
+        """The index for `key`, reloading it from disk if it was evicted"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.hits += 1
+        entry.last_used = time.monotonic()
+        if entry.store is not None:
+            self._stats["hits"] += 1
+            return entry.store
+        # Concurrent queries for the same evicted index share one reload
+        return await self._loads.run(key, lambda: self._reload(key, entry))
+
+    def discard(self, key: str):
+        """Forget an index and delete its spill files"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.store is not None and not entry.evicting:
+            self._resident_bytes -= entry.bytes
+        if entry.on_disk:
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def stats(self) -> Dict[str, float]:
+        reloads = self._stats["reloads"]
+        resident = sum(1 for entry in self._entries.values() if entry.store is not None)
+        return {
+            **self._stats,
+            "load_seconds": round(self._stats["load_seconds"], 4),
+            "max_load_seconds": round(self._stats["max_load_seconds"], 4),
+            "mean_load_seconds": round(self._stats["load_seconds"] / reloads, 4) if reloads else 0.0,
+            "policy": self.policy,
+            "resident": resident,
+            "spilled": len(self._entries) - resident,
+            "resident_mb": round(self._resident_bytes / (1024 * 1024), 2),
+            "budget_mb": round(self.budget_bytes / (1024 * 1024), 2),
+        }
+
+    def _paths(self, key: str):
+        return os.path.join(self.spill_dir, f"{key}.faiss"), os.path.join(self.spill_dir, f"{key}.json")
+
+    def _victim_order(self, entry: _PooledIndex):
+        if self.policy == "lfu":
+            return (entry.hits, entry.last_used)
+        return entry.last_used
+
+    async def _enforce_budget(self, keep: Optional[str] = None):
+        """Spill least valuable resident indexes until the footprint fits the budget"""
+        while self._resident_bytes > self.budget_bytes:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry.store is not None and not entry.evicting and key != keep
+            ]
+            if not candidates:
+                return
+            key, entry = min(candidates, key=lambda item: self._victim_order(item[1]))
+            if not await self._evict(key, entry):
+                return
+
+    async def _evict(self, key: str, entry: _PooledIndex) -> bool:
+        # Count it as gone up front so concurrent budget checks pick other victims;
+        # it keeps serving queries until the spill file is written
+        entry.evicting = True
+        self._resident_bytes -= entry.bytes
+        try:
+            if not entry.on_disk:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                await asyncio.to_thread(entry.store.save_to, *self._paths(key))
+                entry.on_disk = True
+        except Exception as e:
+            # Stay over budget rather than lose the index
+            print(f"Warning: Could not spill index {key}: {e}")
+            if self._entries.get(key) is entry:
+                self._resident_bytes += entry.bytes
+            return False
+        finally:
+            entry.evicting = False
+
+        if self._entries.get(key) is not entry:
+            # Discarded while being written
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.unlink(path)
+            return True
+        entry.store = None
+        self._stats["evictions"] += 1
+        self._stats["evicted_bytes"] += entry.bytes
+        print(f"Evicted index {key} ({entry.bytes / (1024 * 1024):.1f} MB) to {self.spill_dir}")
+        return True
+
+    async def _reload(self, key: str, entry: _PooledIndex) -> VectorStore:
+        start = time.perf_counter()
+        try:
+            with stage("index_reload"):
+                store = await asyncio.to_thread(VectorStore.load_from, *self._paths(key))
+        except Exception as e:
+            raise Exception(f"Failed to reload index: {str(e)}")
+        elapsed = time.perf_counter() - start
+        self._stats["reloads"] += 1
+        self._stats["load_seconds"] += elapsed
+        self._stats["max_load_seconds"] = max(self._stats["max_load_seconds"], elapsed)
+        print(f"Reloaded index {key} from disk in {elapsed * 1000:.1f} ms")
+
+        if self._entries.get(key) is entry:
+            entry.store = store
+            self._resident_bytes += entry.bytes
+            await self._enforce_budget(keep=key)
+        return store
@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from config.settings import settings
+from services.resources import DEFAULT_INGESTION_SLOTS
+
+
+class IngestionJob:
+    """Status of one queued document ingestion"""
+
+    def __init__(self, document_id: str, blob_url: str, priority: int):
+        self.document_id = document_id
+        self.blob_url = blob_url
+        self.priority = priority
+        self.status = "queued"  # queued -> running -> ready | failed
+        self.error: Optional[str] = None
+        self.chunks: Optional[int] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_used = self.submitted_at  # Last submit, status check or query
+        self.deleted = False
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict:
+        now = time.time()
+        queued_until = self.started_at or now
+        return {
+            "document_id": self.document_id,
+            "status": self.status,
+            "chunks": self.chunks,
+            "error": self.error,
+            "queued_seconds": round(queued_until - self.submitted_at, 3),
+            "processing_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+        }
+
+
+class IngestionQueue:
+    """Bounded priority queue of document ingestions served by a fixed worker pool.
+
+    Finished jobs are kept while their documents are retained. A document idle
+    for DOCUMENT_RETENTION_SECONDS, or the least recently used beyond
+    MAX_RETAINED_DOCUMENTS, is released through `release` and its job dropped.
+    """
+
+    def __init__(self, ingest: Callable[[str], Awaitable[str]], count_chunks: Callable[[str], Optional[int]],
+                 release: Callable[[str], None], workers: int = None, max_queued: int = None):
+        self.ingest = ingest
+        self.count_chunks = count_chunks
+        self.release = release
+        self.worker_count = workers or settings.INGESTION_WORKERS or DEFAULT_INGESTION_SLOTS
+        self.max_queued = max_queued or settings.INGESTION_QUEUE_SIZE
+        self.jobs: Dict[str, IngestionJob] = {}
+        self.expired = 0
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+    async def start(self):
+        """Start the worker pool and the expiry sweep on the running event loop"""
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self._workers.append(asyncio.create_task(self._expire_periodically()))
+        print(f"Ingestion queue started with {self.worker_count} workers")
+
+    async def stop(self):
+        """Cancel the worker pool"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, document_id: str, blob_url: str, priority: int = 0) -> IngestionJob:
+        """Enqueue a document; higher priority is served first. Raises asyncio.QueueFull when full"""
+        job = self.jobs.get(document_id)
+        if job and job.status != "failed":
+            job.last_used = time.time()
+            return job
+
+        job = IngestionJob(document_id, blob_url, priority)
+        self._queue.put_nowait((-priority, next(self._sequence), job))
+        self.jobs[document_id] = job
+        self.expire()
+        return job
+
+    def get(self, document_id: str) -> Optional[IngestionJob]:
+        job = self.jobs.get(document_id)
+        if job is not None:
+            job.last_used = time.time()
+        return job
+
+    def remove(self, document_id: str) -> Optional[IngestionJob]:
+        """Drop a job that is not running and release its document; a queued job is skipped by the workers"""
+        job = self.jobs.get(document_id)
+        if job is None or job.status == "running":
+            return job
+        del self.jobs[document_id]
+        if job.status == "queued":
+            job.deleted = True
+            job.status = "failed"
+            job.error = "Document deleted"
+            job.done.set()
+        self.release(document_id)
+        return job
+
+    def expire(self):
+        """Release idle finished documents, and the least recently used ones over the cap"""
+        finished = sorted((job for job in self.jobs.values() if job.status in ("ready", "failed")),
+                          key=lambda job: job.last_used)
+        idle_before = time.time() - settings.DOCUMENT_RETENTION_SECONDS
+        excess = len(finished) - settings.MAX_RETAINED_DOCUMENTS
+        for position, job in enumerate(finished):
+            if position >= excess and job.last_used >= idle_before:
+                break
+            self.remove(job.document_id)
+            self.expired += 1
+
+    async def _expire_periodically(self):
+        while True:
+            await asyncio.sleep(60)
+            self.expire()
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        counts = {"queued": 0, "running": 0, "ready": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        counts["expired"] = self.expired
+        return counts
+
+    async def wait(self, document_id: str) -> IngestionJob:
+        """Wait until a submitted job is ready or failed"""
+        job = self.jobs[document_id]
+        await job.done.wait()
+        return job
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.deleted:
+                self._queue.task_done()
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await self.ingest(job.blob_url)
+                job.chunks = self.count_chunks(job.document_id)
+                job.status = "ready"
+                print(f"Worker {worker_id}: ingested {job.document_id} ({job.chunks} chunks)")
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Ingestion cancelled"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"Worker {worker_id}: failed to ingest {job.document_id}: {e}")
+            finally:
+                job.finished_at = time.time()
+                # Counts as a use, so the cap never releases a document its submitter is about to query
+                job.last_used = job.finished_at
+                job.done.set()
+                self._queue.task_done()
+            self.expire()
@@ -0,0 +1,110 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set
+import numpy as np
+from config.settings import settings
+from models.schemas import DocumentChunk
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'to', 'in', 'on', 'for', 'and', 'or', 'is', 'are', 'be', 'by', 'with', 'as', 'at',
+    'this', 'that', 'it', 'its', 'what', 'which', 'how', 'does', 'do', 'any', 'there', 'under', 'from', 'policy',
+}
+
+
+def bm25_terms(text: str) -> List[str]:
+    """Lowercased content words with a light plural strip, shared by pages and questions"""
+    terms = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        terms.append(word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word)
+    return terms
+
+
+class PageIndex:
+    """BM25 over page texts; per-term weights are precomputed so a query is a few array adds"""
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(texts)
+        counts = [Counter(bm25_terms(text)) for text in texts]
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+        average = float(lengths.mean()) if self.size and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List] = {}
+        for page, count in enumerate(counts):
+            for term, tf in count.items():
+                postings.setdefault(term, []).append((page, tf))
+        self.postings: Dict[str, tuple] = {}
+        for term, entries in postings.items():
+            pages = np.array([page for page, _ in entries], dtype=np.int64)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            weights = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[pages] / average))
+            self.postings[term] = (pages, weights.astype(np.float32))
+
+    def top_pages(self, query: str, limit: int) -> List[int]:
+        """Pages with the highest BM25 score for the query; pages sharing no term are never returned"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(bm25_terms(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        return [int(page) for page in matched[np.argsort(-scores[matched])]]
+
+
+class LazyDocument:
+    """A very large document whose chunks are embedded page by page as questions need them.
+
+    All chunks are parsed up front (cheap) but only pages that BM25 ranks highly
+    for an incoming question are embedded and added to the document's index.
+    Embedded pages accumulate, so later questions on the same topics cost nothing.
+    PDF chunks are grouped by the page they start on; formats without pages use
+    runs of LAZY_PAGE_CHUNKS consecutive chunks.
+    """
+
+    def __init__(self, chunks: List[DocumentChunk], page_chunks: int = None):
+        page_chunks = page_chunks or settings.LAZY_PAGE_CHUNKS
+        pages: Dict[int, List[DocumentChunk]] = {}
+        for position, chunk in enumerate(chunks):
+            page = chunk.metadata.get("page")
+            pages.setdefault(page if page is not None else position // page_chunks, []).append(chunk)
+        self.pages: List[List[DocumentChunk]] = [pages[key] for key in sorted(pages)]
+        self.page_index = PageIndex([" ".join(chunk.text for chunk in page) for page in self.pages])
+        self.embedded: Set[int] = set()
+        self.total_chunks = len(chunks)
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Serializes index growth; created on first use so it binds to the running loop"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def pages_for(self, questions: List[str], per_question: int = None) -> List[int]:
+        """Pages the questions point to that are not embedded yet"""
+        per_question = per_question or settings.LAZY_PAGES_PER_QUESTION
+        wanted = set()
+        for question in questions:
+            wanted.update(self.page_index.top_pages(question, per_question))
+        return sorted(wanted - self.embedded)
+
+    def chunks_for(self, pages: List[int]) -> List[DocumentChunk]:
+        return [chunk for page in pages for chunk in self.pages[page]]
+
+    def mark_embedded(self, pages: List[int]):
+        self.embedded.update(pages)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pages": len(self.pages),
+            "pages_embedded": len(self.embedded),
+            "chunks": self.total_chunks,
+            "chunks_embedded": sum(len(self.pages[page]) for page in self.embedded),
+        }
@@ -0,0 +1,79 @@
+from typing import Dict, List
+import numpy as np
+from config.settings import settings
+
+
+class LengthBucketer:
+    """Splits a batch into forward passes of similar token length, sized by a measured token budget.
+
+    Texts are sorted by token length and cut into passes whose padded size
+    (texts x longest text) stays within a token budget, so short headings are
+    encoded together in wide passes and long clauses in narrow ones instead of
+    every text being padded to the longest in the batch. The budget is chosen
+    from EMBEDDING_TOKEN_BUDGETS by measured throughput on this machine: each
+    candidate is tried for a few full passes, the fastest is used, and the
+    candidates are measured again every EMBEDDING_TUNER_RETUNE_PASSES passes.
+    """
+
+    def __init__(self, budgets: List[int] = None, trials: int = None, retune_passes: int = None):
+        self.budgets = sorted(budgets or settings.EMBEDDING_TOKEN_BUDGETS)
+        self.trials = trials or settings.EMBEDDING_TUNER_TRIALS
+        self.retune_passes = retune_passes or settings.EMBEDDING_TUNER_RETUNE_PASSES
+        self.samples = {budget: 0 for budget in self.budgets}  # Full passes measured since the last retune
+        self.throughput = {budget: 0.0 for budget in self.budgets}  # EWMA of real tokens per second
+        self.budget = self.budgets[len(self.budgets) // 2]
+        self._passes_since_tune = 0
+        self._stats = {"batches": 0, "passes": 0, "real_tokens": 0, "padded_tokens": 0, "unbucketed_padded_tokens": 0}
+
+    def plan(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Positions of each forward pass, shortest texts first; together they cover every position once"""
+        self.budget = self._choose_budget()
+        order = np.argsort(lengths, kind="stable")
+        passes = []
+        start = 0
+        for end in range(1, len(order) + 1):
+            # Sorted ascending, so the newest text is the longest in its pass
+            if end < len(order) and (end + 1 - start) * lengths[order[end]] <= self.budget:
+                continue
+            passes.append(order[start:end])
+            start = end
+
+        self._stats["batches"] += 1
+        self._stats["passes"] += len(passes)
+        self._stats["real_tokens"] += int(lengths.sum())
+        self._stats["padded_tokens"] += sum(len(positions) * int(lengths[positions[-1]]) for positions in passes)
+        self._stats["unbucketed_padded_tokens"] += len(lengths) * int(lengths.max())
+        return passes
+
+    def observe(self, lengths: np.ndarray, seconds: float):
+        """Record how long one pass over texts of these lengths took"""
+        padded = len(lengths) * int(lengths.max())
+        # Passes well short of the budget (a lone query) say nothing about the budget's throughput
+        if seconds <= 0 or padded < self.budget // 2:
+            return
+        rate = float(lengths.sum()) / seconds
+        previous = self.throughput[self.budget]
+        self.throughput[self.budget] = rate if not self.samples[self.budget] else 0.7 * previous + 0.3 * rate
+        self.samples[self.budget] += 1
+        self._passes_since_tune += 1
+        if self._passes_since_tune >= self.retune_passes:
+            # Load and thread contention change over time; measure every candidate again
+            self.samples = {budget: 0 for budget in self.budgets}
+            self._passes_since_tune = 0
+
+    def _choose_budget(self) -> int:
+        untried = [budget for budget in self.budgets if self.samples[budget] < self.trials]
+        if untried:
+            return min(untried, key=lambda budget: self.samples[budget])
+        return max(self.budgets, key=lambda budget: self.throughput[budget])
+
+    def stats(self) -> Dict[str, float]:
+        padded = self._stats["padded_tokens"]
+        unbucketed = self._stats["unbucketed_padded_tokens"]
+        return {
+            **self._stats,
+            "padding_waste": round(1 - self._stats["real_tokens"] / padded, 4) if padded else 0.0,
+            "unbucketed_padding_waste": round(1 - self._stats["real_tokens"] / unbucketed, 4) if unbucketed else 0.0,
+            "token_budget": self.budget,
+            "tokens_per_second": {str(budget): round(rate, 1) for budget, rate in self.throughput.items()},
+        }
@@ -1,56 +1,148 @@
 import google.generativeai as genai
-from typing import List
+import time
+from typing import List, Optional
 from config.settings import settings
-from models.schemas import RetrievalResult
+from models.schemas import DocumentChunk, RetrievalResult
+from services.context_cache import ContextCache, DocumentPrefix, high_value_chunks
+
+ANALYST_ROLE = "You are an expert insurance policy analyst."
+
+INSTRUCTIONS = """INSTRUCTIONS:
+- Search through ALL provided sections carefully
+- Extract exact numbers, periods, percentages, and conditions
+- If information spans multiple sections, combine them logically
+- Quote specific policy terms when relevant
+- If the exact answer isn't in the context, state what related information is available
+- Be precise with technical insurance terms"""
 
 class LLMService:
     def __init__(self):
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.context_cache = ContextCache(self.model)  # Per-document prompt prefixes held by the provider
     
     def generate_answer(self, question: str, context_chunks: List[RetrievalResult]) -> str:
         """Generate answer using Gemini with enhanced context handling"""
         if not context_chunks:
             return "No relevant information found in the document."
 
+        prompt = self.build_prompt(question, context_chunks)
+
+        try:
+            response = self.model.generate_content(prompt, generation_config=self._generation_config())
+            return self._answer_text(response)
+        except Exception as e:
+            return f"Error generating response: {str(e)}"
+    
+    async def generate_answer_async(self, question: str, context_chunks: List[RetrievalResult],
+                                    document_key: Optional[str] = None) -> str:
+        """Generate an answer without blocking the event loop; cancelling the call abandons the request.
+
+        With the `document_key` of a prepared document the prompt refers to the
+        document's cached prefix and carries only the question and the retrieved
+        sections the prefix lacks.
+        """
+        if not context_chunks:
+            return "No relevant information found in the document."
+
+        try:
+            context = await self.context_cache.acquire(document_key)
+            if context is not None:
+                prompt = self.build_cached_prompt(question, context_chunks, context.prefix)
+                response = await self.context_cache.generate(context, prompt, self._generation_config())
+            else:
+                prompt = self.build_prompt(question, context_chunks)
+                start = time.perf_counter()
+                response = await self.model.generate_content_async(prompt, generation_config=self._generation_config())
+                self.context_cache.observe_uncached(prompt, time.perf_counter() - start)
+            return self._answer_text(response)
+        except Exception as e:
+            return f"Error generating response: {str(e)}"
+    
+    def prepare_document(self, document_key: str, chunks: List[DocumentChunk], fact_chunk_ids: set):
+        """Build a document's cacheable prompt prefix from its high-value sections"""
+        if not self.context_cache.enabled:
+            return
+        sections = high_value_chunks(chunks, fact_chunk_ids, settings.CONTEXT_CACHE_PREFIX_TOKENS)
+        if sections:
+            self.context_cache.prepare(document_key, self._create_prefix(sections))
+    
+    def _generation_config(self):
+        return genai.types.GenerationConfig(
+            temperature=0.1,
+            max_output_tokens=512
+        )
+    
+    def _answer_text(self, response) -> str:
+        return response.text.strip() if response.text else "Unable to generate response from the provided context."
+    
+    def build_prompt(self, question: str, context_chunks: List[RetrievalResult]) -> str:
+        """Full Gemini prompt for a question and its retrieved chunks"""
         # Sort chunks by relevance and prepare context
         sorted_chunks = sorted(context_chunks, key=lambda x: x.score, reverse=True)
 
+        # Name the source document when sections come from a policy and its riders
+        sources = {result.chunk.metadata.get("source") for result in sorted_chunks}
+        def label(result: RetrievalResult) -> str:
+            if len(sources) < 2:
+                return ""
+            source = result.chunk.metadata.get("source") or "unknown"
+            return f", Document: {source.split('?')[0].rsplit('/', 1)[-1]}"
+
         # Format chunks with clear separation
         context_text = "\n\n---\n\n".join([
-            f"RELEVANT SECTION {i+1} (Score: {result.score:.3f}):\n{result.chunk.text.strip()}" 
+            f"RELEVANT SECTION {i+1} (Score: {result.score:.3f}{label(result)}):\n{result.chunk.text.strip()}" 
             for i, result in enumerate(sorted_chunks)
         ])
 
-        prompt = self._create_prompt(question, context_text)
+        return self._create_prompt(question, context_text)
+    
+    def build_cached_prompt(self, question: str, context_chunks: List[RetrievalResult], prefix: DocumentPrefix) -> str:
+        """Question prompt that follows a document's cached prefix"""
+        sorted_chunks = sorted(context_chunks, key=lambda x: x.score, reverse=True)
+        # Retrieved sections already in the prefix are named by number, in relevance order, not resent
+        cached = [prefix.section_numbers[result.chunk.id] for result in sorted_chunks if result.chunk.id in prefix.section_numbers]
+        additional = [result for result in sorted_chunks if result.chunk.id not in prefix.section_numbers]
+        context_text = "\n\n---\n\n".join([
+            f"ADDITIONAL SECTION {i+1} (Score: {result.score:.3f}):\n{result.chunk.text.strip()}"
+            for i, result in enumerate(additional)
+        ]) or "None"
+        cached_text = ", ".join(f"POLICY SECTION {number}" for number in cached) or "None"
 
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,
-                    max_output_tokens=512
-                )
-            )
-            return response.text.strip() if response.text else "Unable to generate response from the provided context."
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+        return f"""MOST RELEVANT POLICY SECTIONS ABOVE: {cached_text}
+
+ADDITIONAL RELEVANT SECTIONS:
+{context_text}
+
+QUESTION: {question}
+
+ANSWER:"""
     
     def _create_prompt(self, question: str, context: str) -> str:
         """Create focused prompt for accurate document analysis"""
-        return f"""You are an expert insurance policy analyst. Answer the question using ONLY the provided context.
+        return f"""{ANALYST_ROLE} Answer the question using ONLY the provided context.
 
 DOCUMENT CONTEXT:
 {context}
 
 QUESTION: {question}
 
-INSTRUCTIONS:
-- Search through ALL provided sections carefully
-- Extract exact numbers, periods, percentages, and conditions
-- If information spans multiple sections, combine them logically
-- Quote specific policy terms when relevant
-- If the exact answer isn't in the context, state what related information is available
-- Be precise with technical insurance terms
+{INSTRUCTIONS}
+
+ANSWER:"""
+    
+    def _create_prefix(self, sections: List[DocumentChunk]) -> DocumentPrefix:
+        """Instructions and policy sections shared by every question about one document"""
+        section_numbers = {chunk.id: i + 1 for i, chunk in enumerate(sections)}
+        policy_text = "\n\n---\n\n".join([
+            f"POLICY SECTION {i+1}:\n{chunk.text.strip()}" for i, chunk in enumerate(sections)
+        ])
+        text = f"""{ANALYST_ROLE} Answer each question that follows using ONLY the policy sections below and any additional sections given with the question.
+
+{INSTRUCTIONS}
+
+POLICY SECTIONS:
+{policy_text}
 
-ANSWER:"""
\ No newline at end of file
+"""
+        return DocumentPrefix(text, section_numbers)
\ No newline at end of file
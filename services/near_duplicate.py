@@ -0,0 +1,97 @@
+import re
+import zlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Any, Optional, Tuple
+from config.settings import settings
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index mapping chunk text to a payload of a near-identical earlier chunk.
+
+    Signatures are MinHash sketches over word shingles; LSH banding finds candidates
+    and the estimated Jaccard similarity must reach `threshold` for a match. The
+    index is bounded to `max_entries`, evicting the oldest entries first. Safe to
+    share between ingestion threads.
+    """
+
+    def __init__(self, threshold: float = None, num_perm: int = None, bands: int = None,
+                 shingle_size: int = None, max_entries: int = None, seed: int = 1):
+        self.threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm or settings.NEAR_DUPLICATE_NUM_PERM
+        self.bands = bands or settings.NEAR_DUPLICATE_BANDS
+        self.shingle_size = shingle_size or settings.NEAR_DUPLICATE_SHINGLE_SIZE
+        self.max_entries = max_entries or settings.NEAR_DUPLICATE_MAX_ENTRIES
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.rows = self.num_perm // self.bands
+
+        # Hash functions (a * x + b) mod p with a, b < 2^32 so the product cannot overflow
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Any]]" = OrderedDict()
+        self._buckets = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles"""
+        words = _WORD_PATTERN.findall(text.lower())
+        size = self.shingle_size
+        if len(words) <= size:
+            shingles = {' '.join(words)}
+        else:
+            shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def lookup(self, signature: np.ndarray) -> Optional[Any]:
+        """Payload of the most similar indexed entry at or above the threshold, if any"""
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            best_payload, best_similarity = None, self.threshold
+            for entry_id in candidates:
+                entry_signature, payload = self._entries[entry_id]
+                similarity = float(np.mean(entry_signature == signature))
+                if similarity >= best_similarity:
+                    best_payload, best_similarity = payload, similarity
+            return best_payload
+
+    def add(self, signature: np.ndarray, payload: Any):
+        """Index a signature with its payload, evicting the oldest entry when full"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature, payload)
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, []).append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                old_id, (old_signature, _) = self._entries.popitem(last=False)
+                for key in self._band_keys(old_signature):
+                    bucket = self._buckets.get(key)
+                    if bucket:
+                        bucket.remove(old_id)
+                        if not bucket:
+                            del self._buckets[key]
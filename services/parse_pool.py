@@ -0,0 +1,48 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from services.document_processor import DocumentProcessor
+from models.schemas import DocumentChunk
+
+# Each worker process builds its own processor once
+_processor = None
+
+
+def _init_worker(tokenizer, quiet: bool):
+    global _processor
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    _processor = DocumentProcessor(tokenizer=tokenizer)
+
+
+def _process_file(file_path: str, source: str) -> List[DocumentChunk]:
+    return _processor.process_file(file_path, source)
+
+
+class ParsePool:
+    """Parses and chunks downloaded documents in worker processes, so bulk ingestion uses every core.
+
+    Extraction and chunking hold the GIL, so threads cannot run them in parallel.
+    Workers are spawned rather than forked: the parent has already started torch
+    and tokenizer threads, which do not survive a fork.
+    """
+
+    def __init__(self, workers: int, tokenizer=None, quiet: bool = False):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(tokenizer, quiet),
+        )
+
+    async def process_file(self, file_path: str, source: str) -> List[DocumentChunk]:
+        """DocumentProcessor.process_file in a worker process"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _process_file, file_path, source)
+
+    def shutdown(self):
+        self._executor.shutdown()
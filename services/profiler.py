@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from config.settings import settings
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+_MAX_STACK_DEPTH = 128
+
+# tracemalloc is process-wide; it runs while at least one profiled request is in flight
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class _StackSampler(threading.Thread):
+    """Samples the Python stacks of the request's threads at a fixed interval"""
+
+    def __init__(self, loop_thread: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.frames: List[Dict] = []
+        self.samples: Dict[str, List[Tuple[List[int], float]]] = {}  # thread name -> (stack, weight ms)
+        self._frame_ids: Dict[Tuple[str, str, int], int] = {}
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def _threads(self) -> Dict[int, str]:
+        """Event loop, to_thread workers and the embedding batcher; the rest of the process is not sampled"""
+        threads = {}
+        for thread in threading.enumerate():
+            if thread.ident == self.loop_thread:
+                threads[thread.ident] = "event-loop"
+            elif thread.name.startswith("asyncio_") or thread.name == "embedding-batcher":
+                threads[thread.ident] = thread.name
+        return threads
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return frame_id
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight = (now - last) * 1000
+            last = now
+            threads = self._threads()
+            for ident, frame in sys._current_frames().items():
+                name = threads.get(ident)
+                if name is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.setdefault(name, []).append((stack, weight))
+
+    def speedscope(self, name: str) -> Dict:
+        """Samples as a speedscope file, one sampled profile per thread"""
+        profiles = []
+        for thread_name, samples in sorted(self.samples.items()):
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight in samples),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(weight, 3) for _, weight in samples],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "policynth",
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+class RequestProfile:
+    """CPU samples and allocation snapshots captured for one request"""
+
+    def __init__(self, name: str):
+        self.profile_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.sampler: Optional[_StackSampler] = None
+        self.start_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.end_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_bytes = 0
+
+    def memory_summary(self, limit: int = 25) -> Dict:
+        """Net allocations made during the request, largest first"""
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+        start = self.start_snapshot.filter_traces(ignore)
+        end = self.end_snapshot.filter_traces(ignore)
+        top = []
+        for stat in end.compare_to(start, "lineno")[:limit]:
+            frame = stat.traceback[0]
+            top.append({
+                "file": frame.filename,
+                "line": frame.lineno,
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+                "size_kb": round(stat.size / 1024, 1),
+            })
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "duration_seconds": round(self.duration, 3),
+            "peak_traced_kb": round(self.peak_bytes / 1024, 1),
+            "top_allocations": top,
+        }
+
+
+class ProfileStore:
+    """Opt-in request profiler writing to a bounded on-disk store.
+
+    `capture()` samples the event loop thread and the pipeline's worker threads
+    (to_thread workers, embedding batcher) and traces allocations for the block.
+    Each capture writes `<id>.speedscope.json` (open at https://www.speedscope.app),
+    `<id>.memory.json` (net allocations by line) and `<id>.tracemalloc` (raw
+    snapshot, load with tracemalloc.Snapshot.load). Only the newest `max_profiles`
+    captures are kept. Requests that run concurrently with a profiled one show up
+    in its samples and allocations too.
+    """
+
+    def __init__(self, directory: str = None, max_profiles: int = None, interval_ms: float = None):
+        self.directory = directory or settings.PROFILE_DIR
+        self.max_profiles = max_profiles or settings.PROFILE_MAX_STORED
+        self.interval = (interval_ms or settings.PROFILE_SAMPLE_INTERVAL_MS) / 1000.0
+
+    @asynccontextmanager
+    async def capture(self, name: str):
+        """Profile the enclosed block; enter it on the event loop.
+
+        Snapshots, the stack sampler's shutdown and saving run in worker threads,
+        so concurrent requests keep being served meanwhile.
+        """
+        global _tracing_users
+        profile = RequestProfile(name)
+        with _tracing_lock:
+            if _tracing_users == 0:
+                tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+            _tracing_users += 1
+            tracemalloc.reset_peak()
+        profile.start_snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+        profile.sampler = _StackSampler(threading.get_ident(), self.interval)
+        profile.sampler.start()
+        start = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.duration = time.perf_counter() - start
+            await asyncio.to_thread(profile.sampler.stop)
+            profile.end_snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+            profile.peak_bytes = tracemalloc.get_traced_memory()[1]
+            with _tracing_lock:
+                _tracing_users -= 1
+                if _tracing_users == 0:
+                    tracemalloc.stop()
+            try:
+                await asyncio.to_thread(self._save, profile)
+            except Exception as e:
+                print(f"Warning: Could not save profile {profile.profile_id}: {e}")
+
+    def path(self, profile_id: str, kind: str) -> Optional[str]:
+        """File of a stored profile ('speedscope.json', 'memory.json' or 'tracemalloc'), if present"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{kind}")
+        return path if os.path.exists(path) else None
+
+    def _save(self, profile: RequestProfile):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile.profile_id)
+        with open(f"{base}.speedscope.json", "w") as f:
+            json.dump(profile.sampler.speedscope(profile.name), f)
+        with open(f"{base}.memory.json", "w") as f:
+            json.dump(profile.memory_summary(), f, indent=2)
+        profile.end_snapshot.dump(f"{base}.tracemalloc")
+        print(f"Saved profile {profile.profile_id} ({profile.duration:.2f}s) to {self.directory}")
+        self._prune()
+
+    def _prune(self):
+        """Delete all but the newest max_profiles captures"""
+        captures = {}
+        for file_name in os.listdir(self.directory):
+            profile_id = file_name.split(".", 1)[0]
+            if _PROFILE_ID.match(profile_id):
+                mtime = os.path.getmtime(os.path.join(self.directory, file_name))
+                captures[profile_id] = max(captures.get(profile_id, 0), mtime)
+        stale = sorted(captures, key=captures.get, reverse=True)[self.max_profiles:]
+        for profile_id in stale:
+            for kind in ("speedscope.json", "memory.json", "tracemalloc"):
+                path = os.path.join(self.directory, f"{profile_id}.{kind}")
+                if os.path.exists(path):
+                    os.unlink(path)
@@ -1,21 +1,53 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set, Optional
 from services.document_processor import DocumentProcessor
 from services.embedding_service import EmbeddingService
 from services.vector_store import VectorStore
 from services.llm_service import LLMService
+from services.term_matcher import term_matcher
+from services.near_duplicate import NearDuplicateIndex
+from services.single_flight import SingleFlight
+from services.admission import AdmissionController, AdmissionRejected
+from services.index_pool import IndexPool
+from services.stage_timer import stage
+from services.extractive_answerer import ExtractiveAnswerer
+from services.fact_sheet import FactExtractor, FactSheet
+from services.lazy_document import LazyDocument
+from services.debug_store import DebugStore
+from services.sibling_tasks import gather_or_cancel
+from services.deadline import PARTIAL_MARKER, UNANSWERED, current_deadline, time_left, degrade
 
-from models.schemas import QueryRequest, QueryResponse
+from models.schemas import QueryRequest, QueryResponse, DocumentChunk, RetrievalResult
 from config.settings import settings
 import google.generativeai as genai
 import re
 import json
+import asyncio
+import hashlib
+import os
+import numpy as np
 
 class QueryEngine:
     def __init__(self):
-        self.doc_processor = DocumentProcessor()
         self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+        self.doc_processor = DocumentProcessor(tokenizer=self.embedding_service.tokenizer)
+        self.documents: Dict[str, str] = {}  # document_id -> content hash of its pooled index
+        self.retained: Set[str] = set()  # Pre-ingested documents kept after answering
+        self._inline_users: Dict[str, int] = {}  # Requests still using an inline document
+        # Ingestions finish even when every request waiting on them times out: cancelling would
+        # not stop their worker threads, and a retry joins the flight instead of starting over
+        self._ingestions = SingleFlight(cancel_abandoned=False)
+        self.admission = AdmissionController()
+        self.index_pool = IndexPool()  # content hash -> index, spilled to disk over the memory budget
         self.llm_service = LLMService()
+        self.near_duplicates = NearDuplicateIndex()
+        self.embedding_reuse: Dict[str, Dict[str, int]] = {}  # content hash -> chunks embedded and reused from near-duplicates
+        self._reuse_totals = {"chunks": 0, "reused": 0}
+        self.extractive_answerer = ExtractiveAnswerer()
+        self.fact_extractor = FactExtractor(self.doc_processor.detect_section_type)
+        self.fact_sheets: Dict[str, FactSheet] = {}  # content hash -> facts extracted at ingestion
+        self.lazy_documents: Dict[str, LazyDocument] = {}  # content hash -> pages not yet embedded
+        self.parse_pool = None  # ParsePool set by the batch runner to parse in worker processes
+        self.debug_store = DebugStore()  # Retrieval traces of recent questions
         
         # Initialize lightweight LLM for intent analysis
         genai.configure(api_key=settings.GEMINI_API_KEY)
@@ -28,48 +60,393 @@ class QueryEngine:
         start_time = time.time()
         
         try:
-            # Step 1: Process document
-            print("Processing document...")
-            chunks = await self.doc_processor.process_document(request.documents)
-            print(f"Created {len(chunks)} semantic chunks")
-            
-            # Step 2: Generate embeddings for chunks with metadata context
-            print("Generating embeddings with context...")
-            texts = [chunk.text for chunk in chunks]
-            metadatas = [chunk.metadata for chunk in chunks]
-            embeddings = self.embedding_service.encode_texts(texts, metadatas)
+            # Documents pre-ingested through the job queue are answered at retrieval-only latency;
+            # inline ones are held while any request still uses them and dropped afterwards
+            urls = list(dict.fromkeys(request.document_urls()))
+            document_ids = [self.document_id_for(url) for url in urls]
+            for document_id in document_ids:
+                self._inline_users[document_id] = self._inline_users.get(document_id, 0) + 1
+            try:
+                # A policy and its riders are ingested in parallel, within the request's deadline. When
+                # one fails or time runs out this request stops waiting; ingestions it started still
+                # finish and release their document if no request is using it by then
+                try:
+                    await asyncio.wait_for(gather_or_cancel([self._ingest_inline(url) for url in urls]), timeout=time_left())
+                except asyncio.TimeoutError:
+                    print("Deadline reached while ingesting documents")
+                    degrade("ingestion")
+                    answers = [UNANSWERED for _ in request.questions]
+                else:
+                    answers = await self.answer_questions(document_ids, request.questions)
+            finally:
+                for document_id in document_ids:
+                    self._inline_users[document_id] -= 1
+                    if not self._inline_users[document_id]:
+                        del self._inline_users[document_id]
+                        if document_id not in self.retained:
+                            self.release_document(document_id)
             
-            # Add embeddings to chunks
-            for chunk, embedding in zip(chunks, embeddings):
-                chunk.embedding = embedding
+            total_time = time.time() - start_time
+            print(f"\nCOMPLETED: {len(answers)} answers generated in {total_time:.2f}s")
             
-            # Step 3: Clear existing data and store in vector database
-            print("Storing in vector database...")
-            self.vector_store.clear_index()
-            self.vector_store.store_chunks(chunks)
+            return QueryResponse(answers=answers)
             
-            # Step 4: Process each question
-            print(f"Processing {len(request.questions)} questions...")
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to process query: {str(e)}")
+    
+    async def _ingest_inline(self, blob_url: str):
+        """Ingest a document for a single request"""
+        await self.ingest_document(blob_url, retain=False, admit=True)
+    
+    def document_id_for(self, blob_url: str) -> str:
+        """Stable document ID for a blob URL"""
+        return hashlib.sha256(blob_url.encode('utf-8')).hexdigest()[:16]
+    
+    async def ingest_document(self, blob_url: str, retain: bool = True, admit: bool = False) -> str:
+        """Download, chunk, embed and index a document; return its document ID.
+
+        With `admit`, a new pipeline holds an inline ingestion slot until it has finished.
+        """
+        document_id = self.document_id_for(blob_url)
+        if retain:
+            self.retained.add(document_id)
+        if document_id in self.documents:
+            return document_id
+        
+        # Concurrent requests for the same URL share one download and pipeline
+        await self._ingestions.run(f"url:{blob_url}", lambda: self._ingest_admitted(blob_url, document_id, admit))
+        return document_id
+    
+    async def _ingest_admitted(self, blob_url: str, document_id: str, admit: bool):
+        """Run a new pipeline, holding an ingestion slot when asked to, and keep or drop its document"""
+        if admit:
+            # The slot is held by the shared pipeline, not the request, so it stays taken
+            # until the worker threads are done even if the request has timed out
+            async with self.admission.ingestion.slot():
+                await self._ingest_url(blob_url, document_id)
+        else:
+            await self._ingest_url(blob_url, document_id)
+        if document_id not in self.retained and document_id not in self._inline_users:
+            # Every request for it has gone; keep it a while for their retries
+            asyncio.get_running_loop().call_later(
+                settings.ABANDONED_DOCUMENT_GRACE_SECONDS, self._release_if_unused, document_id
+            )
+    
+    def _release_if_unused(self, document_id: str):
+        if document_id not in self.retained and document_id not in self._inline_users:
+            self.release_document(document_id)
+    
+    async def _ingest_url(self, blob_url: str, document_id: str):
+        """Download a document and index it, sharing work with identical content"""
+        # Step 1: Download and fingerprint the content
+        print("Processing document...")
+        with stage("download"):
+            file_path = await self.doc_processor.download_document(blob_url)
+        handed_over = False
+        
+        def ingest_file():
+            # The shared task owns the file from here on, even if this caller is cancelled
+            nonlocal handed_over
+            handed_over = True
+            return self._ingest_file(file_path, blob_url, document_id, content_hash)
+        
+        try:
+            content_hash = await asyncio.to_thread(self._hash_file, file_path)
+            vector_store = None
+            if content_hash not in self.index_pool:
+                # The same bytes behind different URLs are only parsed and embedded once
+                vector_store = await self._ingestions.run(f"content:{content_hash}", ingest_file)
+            else:
+                print(f"Reusing index of identical content {content_hash[:12]}")
+        finally:
+            # Clean up temporary file
+            if not handed_over and os.path.exists(file_path):
+                os.unlink(file_path)
+        
+        self.documents[document_id] = content_hash
+        if vector_store is not None and content_hash not in self.index_pool:
+            # Another URL with this content was released before this one registered
+            await self.index_pool.put(content_hash, vector_store)
+    
+    async def _ingest_file(self, file_path: str, blob_url: str, document_id: str, content_hash: str) -> VectorStore:
+        """Chunk, embed and index a downloaded document, then delete the file"""
+        try:
+            with stage("parse"):
+                if self.parse_pool is not None:
+                    chunks = await self.parse_pool.process_file(file_path, blob_url)
+                else:
+                    chunks = await asyncio.to_thread(self.doc_processor.process_file, file_path, blob_url)
+        finally:
+            if os.path.exists(file_path):
+                os.unlink(file_path)
+        print(f"Created {len(chunks)} semantic chunks")
+        
+        # Commonly asked facts are extracted once so they are answered without retrieval
+        with stage("facts"):
+            fact_sheet = await asyncio.to_thread(self.fact_extractor.extract, chunks)
+        
+        for chunk in chunks:
+            chunk.metadata["document_id"] = document_id
+        
+        if settings.LAZY_INGESTION_ENABLED and len(chunks) > settings.LAZY_INGESTION_MIN_CHUNKS:
+            # Very large documents: only a BM25 page index now, pages are embedded as questions arrive
+            with stage("page_index"):
+                lazy_document = await asyncio.to_thread(LazyDocument, chunks)
+            print(f"Lazy ingestion: {len(chunks)} chunks over {len(lazy_document.pages)} pages, embedding on demand")
+            vector_store = VectorStore(index_path=None, metadata_path=None)
+            await self.index_pool.put(content_hash, vector_store)
+            self._register_document(content_hash, chunks, fact_sheet)
+            self.lazy_documents[content_hash] = lazy_document
+            return vector_store
+        
+        # Step 2: Generate embeddings for chunks with metadata context
+        print("Generating embeddings with context...")
+        with stage("embed"):
+            embeddings = await asyncio.to_thread(self._embed_chunks, chunks, content_hash)
+        
+        # Chunks refer to their row of the embedding matrix
+        for row, chunk in enumerate(chunks):
+            chunk.embedding_row = row
+        
+        # Step 3: Store in this document's own vector index
+        print("Storing in vector database...")
+        vector_store = VectorStore(index_path=None, metadata_path=None)
+        with stage("index"):
+            vector_store.store_chunks(chunks, embeddings)
+            await self.index_pool.put(content_hash, vector_store)
+        self._register_document(content_hash, chunks, fact_sheet)
+        return vector_store
+    
+    def _register_document(self, content_hash: str, chunks: List[DocumentChunk], fact_sheet: FactSheet):
+        """Keep what questions use besides the index: the fact sheet and the LLM's cacheable prompt prefix"""
+        self.fact_sheets[content_hash] = fact_sheet
+        fact_chunk_ids = {fact["chunk_id"] for fact in fact_sheet.to_dict().values()}
+        self.llm_service.prepare_document(content_hash, chunks, fact_chunk_ids)
+    
+    def _hash_file(self, file_path: str) -> str:
+        """SHA-256 of a file's content"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def document_chunks(self, document_id: str) -> Optional[int]:
+        """Number of indexed chunks for an ingested document"""
+        content_hash = self.documents.get(document_id)
+        if content_hash in self.lazy_documents:
+            return self.lazy_documents[content_hash].total_chunks
+        return self.index_pool.count(content_hash) if content_hash is not None else None
+    
+    def release_document(self, document_id: str):
+        """Drop a document's index from memory and disk"""
+        content_hash = self.documents.pop(document_id, None)
+        self.retained.discard(document_id)
+        # Identical content behind another URL keeps the shared index
+        if content_hash is not None and content_hash not in self.documents.values():
+            self.index_pool.discard(content_hash)
+            self.fact_sheets.pop(content_hash, None)
+            self.lazy_documents.pop(content_hash, None)
+            self.embedding_reuse.pop(content_hash, None)
+            self.llm_service.context_cache.release(content_hash)
+    
+    def release_retained(self, document_id: str):
+        """Stop retaining a pre-ingested document; an inline request still using it releases it when done"""
+        self.retained.discard(document_id)
+        if document_id not in self._inline_users:
+            self.release_document(document_id)
+    
+    def document_facts(self, document_id: str) -> Optional[Dict[str, Dict]]:
+        """Fact sheet extracted from an ingested document"""
+        content_hash = self.documents.get(document_id)
+        fact_sheet = self.fact_sheets.get(content_hash) if content_hash is not None else None
+        return fact_sheet.to_dict() if fact_sheet is not None else None
+    
+    async def answer_questions(self, document_ids: List[str], questions: List[str]) -> List[str]:
+        """Answer questions against one or more ingested documents"""
+        content_hashes = []
+        for document_id in document_ids:
+            content_hash = self.documents.get(document_id)
+            if content_hash is None:
+                raise KeyError(f"Document {document_id} is not ingested")
+            # URLs with identical content share one index; search it once
+            if content_hash not in content_hashes:
+                content_hashes.append(content_hash)
+        fact_sheets = [self.fact_sheets[content_hash] for content_hash in content_hashes if content_hash in self.fact_sheets]
+        vector_stores = None
+        question_embeddings = None
+        deadline = current_deadline()
+        # A prompt can refer to one cached document prefix; policies asked with riders send full prompts,
+        # and so do inline documents asked too few questions to repay registering their prefix
+        document_key = None
+        if len(content_hashes) == 1 and (
+            any(document_id in self.retained for document_id in document_ids)
+            or len(questions) >= settings.CONTEXT_CACHE_MIN_QUESTIONS
+            or content_hashes[0] in self.llm_service.context_cache.contexts
+        ):
+            document_key = content_hashes[0]
+        
+        async with self.admission.answering.slot():
+            print(f"Processing {len(questions)} questions...")
             answers = []
-            for i, question in enumerate(request.questions, 1):
-                print(f"   Question {i}/{len(request.questions)}: Processing...")
-                answer = await self._answer_question(question)
+            for i, question in enumerate(questions, 1):
+                print(f"   Question {i}/{len(questions)}: Processing...")
+                trace = {"question": question, "document_ids": document_ids}
+                fact = self.fact_extractor.lookup(question, fact_sheets)
+                if fact is not None:
+                    print(f"   Question {i} answered from the fact sheet: {fact['label']} = {fact['value']}")
+                    answers.append(fact["answer"])
+                    trace["path"] = "fact_sheet"
+                    self._record_trace(trace, fact["answer"])
+                    continue
+                
+                if deadline is not None and deadline.expired():
+                    # Fact sheet answers above cost nothing; anything needing retrieval is marked
+                    print(f"   Question {i}: deadline reached, not answered")
+                    deadline.degrade("unanswered")
+                    answers.append(UNANSWERED)
+                    trace["path"] = "unanswered"
+                    self._record_trace(trace, UNANSWERED)
+                    continue
+                
+                if vector_stores is None:
+                    # Evicted indexes are reloaded from disk here
+                    vector_stores = await asyncio.gather(*[self.index_pool.get(content_hash) for content_hash in content_hashes])
+                    if any(vector_store is None for vector_store in vector_stores):
+                        raise KeyError("Document was released while being queried")
+                    # Lazily ingested documents embed the pages this request's questions point to
+                    vector_stores = await asyncio.gather(*[
+                        self._expand_lazy_document(content_hash, vector_store, questions[i - 1:])
+                        for content_hash, vector_store in zip(content_hashes, vector_stores)
+                    ])
+                if question_embeddings is None:
+                    # The remaining questions are embedded in one batch
+                    with stage("query_embed"):
+                        embedded = await self.embedding_service.encode_texts_async(questions[i - 1:])
+                    question_embeddings = dict(zip(range(i, len(questions) + 1), embedded))
+                answer = await self._answer_question(question, vector_stores, question_embeddings[i], trace, document_key)
                 answers.append(answer)
+                self._record_trace(trace, answer)
                 print(f"   Question {i} completed")
+        return answers
+    
+    async def _expand_lazy_document(self, content_hash: str, vector_store: VectorStore, questions: List[str]) -> VectorStore:
+        """Embed the not yet embedded pages that BM25 selects for the questions and grow the index"""
+        lazy_document = self.lazy_documents.get(content_hash)
+        if lazy_document is None:
+            return vector_store
+        
+        async with lazy_document.lock:
+            pages = lazy_document.pages_for(questions)
+            # Another request may have grown the index while this one waited
+            vector_store = await self.index_pool.get(content_hash) or vector_store
+            if not pages:
+                return vector_store
             
-            total_time = time.time() - start_time
-            print(f"\nCOMPLETED: {len(chunks)} chunks processed, {len(answers)} answers generated in {total_time:.2f}s")
-            
-
-            
-            # Clear FAISS index after processing (but keep metadata for debugging)
-            self.vector_store.clear_index()
-            print("FAISS index cleared (metadata preserved for debugging)")
+            chunks = lazy_document.chunks_for(pages)
+            with stage("lazy_embed"):
+                embeddings = await asyncio.to_thread(self._embed_chunks, chunks, content_hash)
+            for row, chunk in enumerate(chunks):
+                chunk.embedding_row = row
             
-            return QueryResponse(answers=answers)
+            def grow():
+                # Pooled stores are never mutated; queries still searching the old one are unaffected
+                grown = vector_store.copy()
+                grown.add_chunks(chunks, embeddings)
+                return grown
             
-        except Exception as e:
-            raise Exception(f"Failed to process query: {str(e)}")
+            with stage("index"):
+                grown = await asyncio.to_thread(grow)
+                if self.lazy_documents.get(content_hash) is lazy_document:
+                    await self.index_pool.put(content_hash, grown)
+            lazy_document.mark_embedded(pages)
+            stats = lazy_document.stats()
+            print(f"Lazy ingestion: embedded {len(chunks)} chunks from {len(pages)} pages "
+                  f"({stats['pages_embedded']}/{stats['pages']} pages now indexed)")
+            return grown
+    
+    def lazy_stats(self) -> Dict[str, int]:
+        """Totals over lazily ingested documents"""
+        totals = {"documents": len(self.lazy_documents), "pages": 0, "pages_embedded": 0, "chunks": 0, "chunks_embedded": 0}
+        for lazy_document in self.lazy_documents.values():
+            for key, value in lazy_document.stats().items():
+                totals[key] += value
+        return totals
+    
+    def near_duplicate_stats(self) -> Dict[str, Any]:
+        """Chunks embedded since startup and the share whose vector was reused from a near-duplicate"""
+        chunks = self._reuse_totals["chunks"]
+        reused = self._reuse_totals["reused"]
+        return {
+            "enabled": settings.NEAR_DUPLICATE_ENABLED,
+            "remembered": len(self.near_duplicates),
+            "chunks": chunks,
+            "reused": reused,
+            "dedupe_ratio": round(reused / chunks, 4) if chunks else None,
+        }
+    
+    def document_dedupe_ratio(self, document_id: str) -> Optional[float]:
+        """Share of a document's embedded chunks whose vector was reused from a near-duplicate"""
+        reuse = self.embedding_reuse.get(self.documents.get(document_id))
+        if not reuse or not reuse["chunks"]:
+            return None
+        return round(reuse["reused"] / reuse["chunks"], 4)
+    
+    def _count_reuse(self, content_hash: Optional[str], chunks: int, reused: int):
+        self._reuse_totals["chunks"] += chunks
+        self._reuse_totals["reused"] += reused
+        if content_hash is not None:
+            # Lazily ingested documents add each batch of pages they embed
+            reuse = self.embedding_reuse.setdefault(content_hash, {"chunks": 0, "reused": 0})
+            reuse["chunks"] += chunks
+            reuse["reused"] += reused
+    
+    def _embed_chunks(self, chunks: List[DocumentChunk], content_hash: Optional[str] = None) -> np.ndarray:
+        """Embed chunks into one float32 matrix, reusing vectors of near-identical chunks embedded before"""
+        if not settings.NEAR_DUPLICATE_ENABLED or not chunks:
+            self._count_reuse(content_hash, len(chunks), 0)
+            return self.embedding_service.encode_texts([chunk.text for chunk in chunks], [chunk.metadata for chunk in chunks])
+        
+        signatures = [self.near_duplicates.signature(chunk.text) for chunk in chunks]
+        embeddings = np.empty((len(chunks), self.embedding_service.dimension), dtype=np.float32)
+        
+        # Chunks that repeat within this document share one encode via a local index of row positions
+        pending = NearDuplicateIndex(max_entries=len(chunks))
+        to_embed = []
+        aliases = []
+        for i, signature in enumerate(signatures):
+            reused = self.near_duplicates.lookup(signature)
+            if reused is not None:
+                embeddings[i] = reused
+                chunks[i].metadata["embedding_reused"] = True
+                continue
+            row = pending.lookup(signature)
+            if row is not None:
+                aliases.append((i, row))
+                chunks[i].metadata["embedding_reused"] = True
+                continue
+            pending.add(signature, i)
+            to_embed.append(i)
+        
+        if to_embed:
+            encoded = self.embedding_service.encode_texts(
+                [chunks[i].text for i in to_embed],
+                [chunks[i].metadata for i in to_embed]
+            )
+            embeddings[to_embed] = encoded
+            for i, vector in zip(to_embed, encoded):
+                # Copy so the cache does not keep the whole batch matrix alive
+                self.near_duplicates.add(signatures[i], vector.copy())
+        for i, row in aliases:
+            embeddings[i] = embeddings[row]
+        
+        reused_count = len(chunks) - len(to_embed)
+        self._count_reuse(content_hash, len(chunks), reused_count)
+        print(f"♻️ Reused {reused_count}/{len(chunks)} embeddings from near-duplicate chunks "
+              f"(dedupe ratio {reused_count / len(chunks):.1%}, {len(self.near_duplicates)} remembered)")
+        return embeddings
     
     async def _analyze_query_intent_smart(self, question: str) -> Dict[str, Any]:
         """Use lightweight LLM to intelligently analyze query intent"""
@@ -94,7 +471,11 @@ Return ONLY this JSON format:
     "key_concepts": ["main_insurance_terms_in_question"]
 }}"""
             
-            response = await self.intent_analyzer.generate_content_async(prompt)
+            timeout = time_left(settings.INTENT_TIMEOUT_SECONDS)
+            if timeout is not None and timeout <= 0:
+                degrade("intent")
+                return self._extract_query_intent_fallback(question)
+            response = await asyncio.wait_for(self.intent_analyzer.generate_content_async(prompt), timeout=timeout)
             
             # Clean response and extract JSON
             response_text = response.text.strip()
@@ -109,6 +490,10 @@ Return ONLY this JSON format:
             except json.JSONDecodeError:
                 return self._extract_query_intent_fallback(question)
                 
+        except asyncio.TimeoutError:
+            print("      WARNING: LLM intent analysis timed out, using fallback")
+            degrade("intent")
+            return self._extract_query_intent_fallback(question)
         except Exception as e:
             print(f"      WARNING: LLM intent analysis failed, using fallback: {e}")
             return self._extract_query_intent_fallback(question)
@@ -117,8 +502,11 @@ Return ONLY this JSON format:
         """Intelligent query intent analysis with priority-based classification"""
         question_lower = question.lower()
         
+        # Single pass over the question against the shared insurance lexicon
+        hits = term_matcher.match(question_lower)
+        
         # Extract key insurance terms and phrases
-        key_terms = self._extract_insurance_key_terms(question_lower)
+        key_terms = self._extract_insurance_key_terms(hits)
         
         intent = {
             "keywords": re.findall(r'\b\w+\b', question_lower),
@@ -126,13 +514,13 @@ Return ONLY this JSON format:
             "priority_sections": [],
             "expected_content": [],
             "key_terms": key_terms,
-            "expects_numbers": self._expects_numerical_answer(question_lower),
-            "expects_definitions": self._expects_definition_answer(question_lower),
+            "expects_numbers": self._expects_numerical_answer(hits),
+            "expects_definitions": self._expects_definition_answer(hits),
             "intent_confidence": 0.0
         }
         
         # PRIORITY 1: Specific insurance terms (highest priority)
-        if any(term in question_lower for term in ['grace period', 'waiting period', 'cooling period']):
+        if 'period_terms' in hits:
             intent.update({
                 "query_type": "time_period",
                 "priority_sections": ['conditions', 'coverage', 'definitions'],
@@ -140,7 +528,7 @@ Return ONLY this JSON format:
                 "intent_confidence": 0.95
             })
             
-        elif any(term in question_lower for term in ['pre-existing', 'pre existing', 'ped']):
+        elif 'pre_existing_terms' in hits:
             intent.update({
                 "query_type": "pre_existing",
                 "priority_sections": ['conditions', 'exclusions', 'definitions'],
@@ -148,7 +536,7 @@ Return ONLY this JSON format:
                 "intent_confidence": 0.95
             })
             
-        elif any(term in question_lower for term in ['maternity', 'pregnancy', 'childbirth']):
+        elif 'maternity_terms' in hits:
             intent.update({
                 "query_type": "maternity",
                 "priority_sections": ['coverage', 'benefits', 'conditions'],
@@ -156,7 +544,7 @@ Return ONLY this JSON format:
                 "intent_confidence": 0.95
             })
             
-        elif any(term in question_lower for term in ['deductible', 'co-pay', 'copay', 'excess']):
+        elif 'deductible_terms' in hits:
             intent.update({
                 "query_type": "deductible",
                 "priority_sections": ['limits', 'conditions'],
@@ -165,15 +553,15 @@ Return ONLY this JSON format:
             })
         
         # PRIORITY 2: Question structure analysis (medium priority)
-        elif self._is_asking_for_specific_value(question_lower):
-            if any(word in question_lower for word in ['days', 'months', 'years', 'period', 'duration']):
+        elif self._is_asking_for_specific_value(hits):
+            if 'time_units' in hits:
                 intent.update({
                     "query_type": "time_period",
                     "priority_sections": ['coverage', 'conditions', 'limits'],
                     "expected_content": ['days', 'months', 'years', 'period'],
                     "intent_confidence": 0.85
                 })
-            elif any(word in question_lower for word in ['amount', 'limit', 'maximum', 'minimum', 'sum']):
+            elif 'amount_terms' in hits:
                 intent.update({
                     "query_type": "limits",
                     "priority_sections": ['limits', 'coverage'],
@@ -189,7 +577,7 @@ Return ONLY this JSON format:
                 })
         
         # PRIORITY 3: General categories (lower priority)
-        elif any(word in question_lower for word in ['covered', 'coverage', 'benefit', 'include', 'does cover']):
+        elif 'coverage_cues' in hits:
             intent.update({
                 "query_type": "coverage",
                 "priority_sections": ['coverage', 'benefits'],
@@ -197,7 +585,7 @@ Return ONLY this JSON format:
                 "intent_confidence": 0.70
             })
             
-        elif any(word in question_lower for word in ['excluded', 'exclusion', 'not covered', 'does not cover']):
+        elif 'exclusion_cues' in hits:
             intent.update({
                 "query_type": "exclusion",
                 "priority_sections": ['exclusions'],
@@ -206,7 +594,7 @@ Return ONLY this JSON format:
             })
         
         # PRIORITY 4: Definition queries (only if very explicit and no specific values asked)
-        elif self._is_pure_definition_query(question_lower):
+        elif self._is_pure_definition_query(question_lower, hits):
             intent.update({
                 "query_type": "definition",
                 "priority_sections": ['definitions'],
@@ -216,76 +604,91 @@ Return ONLY this JSON format:
         
         return intent
     
-    def _extract_insurance_key_terms(self, question_lower: str) -> List[str]:
+    def _extract_insurance_key_terms(self, hits: Dict[str, Set[str]]) -> List[str]:
         """Extract key insurance terms from question"""
-        insurance_terms = [
-            'grace period', 'waiting period', 'cooling period',
-            'pre-existing', 'pre existing', 'maternity', 'pregnancy',
-            'deductible', 'co-pay', 'copay', 'excess',
-            'sum insured', 'coverage limit', 'room rent',
-            'icu charges', 'hospitalization', 'outpatient',
-            'cashless', 'reimbursement', 'claim settlement',
-            'no claim discount', 'ncd', 'bonus'
-        ]
-        
-        found_terms = []
-        for term in insurance_terms:
-            if term in question_lower:
-                found_terms.append(term)
-        
-        return found_terms
+        return term_matcher.ordered(hits, 'key_terms')
     
-    def _expects_numerical_answer(self, question_lower: str) -> bool:
+    def _expects_numerical_answer(self, hits: Dict[str, Set[str]]) -> bool:
         """Determine if question expects numerical answer"""
-        numerical_indicators = [
-            'how much', 'how many', 'what is the amount',
-            'what is the limit', 'how long', 'duration',
-            'period', 'days', 'months', 'years',
-            'percentage', 'rate', 'cost', 'premium'
-        ]
-        return any(indicator in question_lower for indicator in numerical_indicators)
+        return 'numerical_cues' in hits
     
-    def _expects_definition_answer(self, question_lower: str) -> bool:
+    def _expects_definition_answer(self, hits: Dict[str, Set[str]]) -> bool:
         """Determine if question expects definition/explanation"""
-        definition_indicators = [
-            'what is', 'what does', 'define', 'definition',
-            'meaning', 'explain', 'what are'
-        ]
-        return any(indicator in question_lower for indicator in definition_indicators)
+        return 'definition_cues' in hits
     
-    def _is_asking_for_specific_value(self, question_lower: str) -> bool:
+    def _is_asking_for_specific_value(self, hits: Dict[str, Set[str]]) -> bool:
         """Check if asking for specific values rather than definitions"""
-        specific_value_patterns = [
-            'what is the', 'how much is the', 'what\'s the',
-            'how many', 'how long is the', 'what are the limits'
-        ]
-        return any(pattern in question_lower for pattern in specific_value_patterns)
+        return 'specific_value_cues' in hits
     
-    def _is_pure_definition_query(self, question_lower: str) -> bool:
+    def _is_pure_definition_query(self, question_lower: str, hits: Dict[str, Set[str]]) -> bool:
         """Check if it's purely asking for definition (not specific values)"""
         # Only consider it a definition query if it starts with definition words
         # AND doesn't ask for specific values
         starts_with_definition = question_lower.startswith(('what is', 'define', 'what does', 'meaning of'))
-        asks_for_values = any(word in question_lower for word in ['amount', 'limit', 'period', 'days', 'months'])
+        asks_for_values = 'value_words' in hits
         
         return starts_with_definition and not asks_for_values
 
-    async def _answer_question(self, question: str) -> str:
-        """Answer individual question using enhanced RAG"""
+    def _intent_filter(self, query_intent: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Metadata filter implied by the question's intent, searched as a bitmap inside FAISS"""
+        if not settings.INTENT_FILTERS_ENABLED:
+            return None
+        # The LLM classifier sets intent_type; the keyword fallback sets query_type
+        intent = query_intent.get('intent_type') or query_intent.get('query_type')
+        if intent in ('exclusion_check', 'exclusion'):
+            return {'type': 'exclusions'}
+        return None
+
+    async def _answer_question(self, question: str, vector_stores: List[VectorStore],
+                               question_embedding: Optional[np.ndarray] = None, trace: Optional[Dict[str, Any]] = None,
+                               document_key: Optional[str] = None) -> str:
+        """Answer individual question using enhanced RAG; `trace` collects what was retrieved and how it was answered.
+
+        `document_key` names the single document searched, whose cached prompt prefix the LLM call may use.
+        """
+        trace = {} if trace is None else trace
         try:
             # Generate embedding for question
-            question_embedding = self.embedding_service.encode_single_text(question)
+            if question_embedding is None:
+                with stage("query_embed"):
+                    question_embedding = await self.embedding_service.encode_single_text_async(question)
 
             # Intelligent query intent analysis using LLM
-            query_intent = await self._analyze_query_intent_smart(question)
+            with stage("intent"):
+                query_intent = await self._analyze_query_intent_smart(question)
             
-            relevant_chunks = self.vector_store.search_similar(
-                question_embedding,
-                top_k=settings.TOP_K_RETRIEVAL,
-                query_text=question,
-                query_intent=query_intent
-            )
+            with stage("search"):
+                metadata_filter = self._intent_filter(query_intent)
+                relevant_chunks = await VectorStore.federated_search(
+                    vector_stores,
+                    question_embedding,
+                    top_k=settings.TOP_K_RETRIEVAL,
+                    metadata_filter=metadata_filter,
+                    query_text=question,
+                    query_intent=query_intent
+                )
+                if metadata_filter and len(relevant_chunks) < settings.TOP_K_RETRIEVAL:
+                    # Too few chunks of the expected type; fill up from the whole document
+                    seen = {result.chunk.id for result in relevant_chunks}
+                    unfiltered = await VectorStore.federated_search(
+                        vector_stores,
+                        question_embedding,
+                        top_k=settings.TOP_K_RETRIEVAL,
+                        query_text=question,
+                        query_intent=query_intent
+                    )
+                    relevant_chunks += [result for result in unfiltered if result.chunk.id not in seen][:settings.TOP_K_RETRIEVAL - len(relevant_chunks)]
 
+            trace["intent"] = query_intent.get('intent_type') or query_intent.get('query_type')
+            trace["metadata_filter"] = metadata_filter
+            trace["chunks"] = [{
+                "id": result.chunk.id,
+                "document_id": result.chunk.metadata.get('document_id'),
+                "type": result.chunk.metadata.get('type'),
+                "score": round(result.score, 4),
+                "text": result.chunk.text[:settings.DEBUG_TRACE_PREVIEW_CHARS],
+            } for result in relevant_chunks]
+            
             # Clean output - show retrieved chunks with key info
             intent_type = query_intent.get('intent_type', 'general')
             looking_for = query_intent.get('looking_for', 'information')
@@ -293,18 +696,58 @@ Return ONLY this JSON format:
             print(f"      Retrieved {len(relevant_chunks)} chunks:")
             for i, chunk in enumerate(relevant_chunks, 1):
                 chunk_preview = chunk.chunk.text[:60].replace('\n', ' ') + "..."
-                print(f"         {i}. {chunk.score:.3f} | {chunk.chunk.metadata.get('type', 'unknown')} | {chunk_preview}")
+                print(f"         {i}. {chunk.score:.3f} | {chunk.chunk.metadata.get('document_id', '?')} | {chunk.chunk.metadata.get('type', 'unknown')} | {chunk_preview}")
             
 
 
+            # Numeric and period lookups stated verbatim in a top chunk skip the LLM
+            if settings.EXTRACTIVE_ANSWERS_ENABLED:
+                with stage("extractive"):
+                    extracted = self.extractive_answerer.answer(question, query_intent, relevant_chunks)
+                if extracted is not None:
+                    print(f"      Extractive answer {extracted.value} (confidence {extracted.confidence:.2f}), LLM skipped")
+                    trace["path"] = "extractive"
+                    return extracted.text
+
             # Use retrieved chunks for LLM
             llm_chunks = relevant_chunks
+            remaining = time_left()
+            if remaining is not None and remaining < settings.DEADLINE_MIN_LLM_SECONDS:
+                degrade("llm")
+                trace["path"] = "partial"
+                return self._partial_answer(relevant_chunks, "no time left to generate an answer")
+            if remaining is not None and remaining < settings.DEADLINE_SHRINK_CONTEXT_SECONDS:
+                # A shorter prompt is generated faster
+                degrade("context")
+                llm_chunks = relevant_chunks[:settings.DEADLINE_REDUCED_TOP_K]
             
-            # Generate answer using LLM
-            answer = self.llm_service.generate_answer(question, llm_chunks)
+            # Generate answer using LLM; the call is abandoned when the deadline passes
+            with stage("llm"):
+                try:
+                    answer = await asyncio.wait_for(self.llm_service.generate_answer_async(question, llm_chunks, document_key), timeout=time_left())
+                    trace["path"] = "llm"
+                    trace["llm_chunks"] = len(llm_chunks)
+                    trace["context_cached"] = document_key in self.llm_service.context_cache.contexts
+                except asyncio.TimeoutError:
+                    print("      Deadline reached while generating the answer")
+                    degrade("llm")
+                    trace["path"] = "partial"
+                    return self._partial_answer(relevant_chunks, "the answer could not be generated in time")
 
             return answer
 
         except Exception as e:
             return f"Error answering question: {str(e)}"
-    
\ No newline at end of file
+    
+    def _record_trace(self, trace: Dict[str, Any], answer: str):
+        if settings.DEBUG_TRACES_ENABLED:
+            # Questions that failed inside _answer_question never set a path
+            trace.setdefault("path", "error")
+            trace["answer"] = answer[:settings.DEBUG_TRACE_PREVIEW_CHARS]
+            self.debug_store.record(trace)
+    
+    def _partial_answer(self, relevant_chunks: List[RetrievalResult], reason: str) -> str:
+        """Best retrieved policy text, marked as partial, when there is no time for the LLM"""
+        if not relevant_chunks:
+            return UNANSWERED
+        return f"{PARTIAL_MARKER.format(reason=reason)} Most relevant policy text: {relevant_chunks[0].chunk.text.strip()}"
@@ -0,0 +1,113 @@
+import math
+import os
+from typing import Dict, Optional
+from config.settings import settings
+
+# Share of a worker's CPUs each component gets. Shares may add up to more than one:
+# parsing and encoding mostly alternate within a pipeline rather than overlap.
+POLICIES = {
+    "balanced": {"torch": 0.75, "parse": 0.5},
+    "ingestion": {"torch": 1.0, "parse": 0.5},  # Bulk ingestion: encoding dominates
+    "query": {"torch": 0.5, "parse": 0.25},  # Pre-ingested documents: keep cores for request handling
+}
+
+# Concurrent ingestions when neither the settings nor an applied allocation size them
+DEFAULT_INGESTION_SLOTS = 2
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs granted by the container's cgroup quota (v2 or v1), or None when unlimited"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> Dict[str, Optional[float]]:
+    """CPUs this process may use: its affinity mask, capped by the cgroup quota"""
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = cgroup_cpu_limit()
+    effective = affinity if quota is None else max(1, min(affinity, math.floor(quota)))
+    return {"host": os.cpu_count(), "affinity": affinity, "cgroup_quota": quota, "effective": effective}
+
+
+class ResourceAllocation:
+    """Threads each component of one worker process may use"""
+
+    def __init__(self, cpus: Dict[str, Optional[float]], workers: int, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown RESOURCE_POLICY {policy!r}; expected one of {sorted(POLICIES)}")
+        self.cpus = cpus
+        self.workers = workers
+        self.policy = policy
+        self.cpus_per_worker = max(1, cpus["effective"] // workers)
+        shares = POLICIES[policy]
+        self.torch_threads = settings.TORCH_THREADS or max(1, round(self.cpus_per_worker * shares["torch"]))
+        # A flat search over one document's chunks is too small to split across cores
+        self.faiss_threads = settings.FAISS_THREADS or 1
+        self.parse_threads = settings.PARSE_THREADS or max(1, round(self.cpus_per_worker * shares["parse"]))
+        # One more pipeline than parsers, so a download or encode overlaps the parsing
+        self.ingestion_slots = self.parse_threads + 1
+        # asyncio's default would size the to_thread pool from the host's cores, not the quota
+        self.blocking_threads = min(32, self.cpus_per_worker + 4)
+        self.applied = False
+
+    def to_dict(self) -> Dict:
+        return {
+            "policy": self.policy,
+            "cpus": self.cpus,
+            "workers": self.workers,
+            "cpus_per_worker": self.cpus_per_worker,
+            "torch_threads": self.torch_threads,
+            "faiss_threads": self.faiss_threads,
+            "parse_threads": self.parse_threads,
+            "ingestion_slots": self.ingestion_slots,
+            "blocking_threads": self.blocking_threads,
+            "applied": self.applied,
+        }
+
+
+def plan_allocation(workers: int = None, policy: str = None) -> ResourceAllocation:
+    """Split this machine's CPUs between worker processes and, within each, between components"""
+    return ResourceAllocation(available_cpus(), workers or settings.WEB_WORKERS, policy or settings.RESOURCE_POLICY)
+
+
+def apply_allocation(allocation: ResourceAllocation) -> ResourceAllocation:
+    """Size torch, FAISS and tokenizer thread pools and the ingestion limits; call before the services are built"""
+    if not settings.RESOURCE_ALLOCATION_ENABLED:
+        return allocation
+    import faiss
+    import torch
+
+    # Read by OpenMP and the tokenizers' thread pool when they start, and by child processes
+    os.environ["OMP_NUM_THREADS"] = str(allocation.torch_threads)
+    os.environ["RAYON_NUM_THREADS"] = str(allocation.torch_threads)
+    torch.set_num_threads(allocation.torch_threads)
+    faiss.omp_set_num_threads(allocation.faiss_threads)
+    # Limits set explicitly are kept
+    if settings.MAX_CONCURRENT_INGESTIONS is None:
+        settings.MAX_CONCURRENT_INGESTIONS = allocation.ingestion_slots
+    if settings.INGESTION_WORKERS is None:
+        settings.INGESTION_WORKERS = allocation.ingestion_slots
+    allocation.applied = True
+    print(f"CPU allocation ({allocation.policy}): {allocation.cpus['effective']} CPUs over {allocation.workers} workers, "
+          f"torch {allocation.torch_threads}, faiss {allocation.faiss_threads}, parse {allocation.parse_threads} threads")
+    return allocation
+
+
+def live_threads() -> Dict[str, int]:
+    """Thread counts the libraries report now, to confirm the allocation took effect"""
+    import faiss
+    import torch
+
+    return {"torch": torch.get_num_threads(), "faiss": faiss.omp_get_max_threads()}
@@ -0,0 +1,19 @@
+import asyncio
+from typing import Any, Awaitable, Iterable, List
+
+
+async def gather_or_cancel(awaitables: Iterable[Awaitable[Any]]) -> List[Any]:
+    """Like asyncio.gather, but when one fails or the caller is cancelled, the others are
+    cancelled and awaited before the error propagates (asyncio.TaskGroup needs Python 3.11).
+
+    Cleanup that runs after the error, such as releasing documents, then never races
+    sibling work that is still registering what it built.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one shared task.
+
+    The work runs as its own task, so cancelling one caller does not cancel it for
+    the others; it is cancelled only when every caller has gone away, or never with
+    `cancel_abandoned=False`. Results, exceptions and cancellation of the shared task
+    reach every caller.
+    """
+
+    def __init__(self, cancel_abandoned: bool = True):
+        self.cancel_abandoned = cancel_abandoned
+        self._flights: Dict[str, _Flight] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the in-flight call for `key`, starting `factory()` if there is none"""
+        flight = self._flights.get(key)
+        if flight is None or flight.task.cancelled():
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._land(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and self.cancel_abandoned and not flight.task.done():
+                # The last interested caller was cancelled; stop the shared work. A caller
+                # arriving before the task has unwound starts a fresh flight instead of joining it
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _land(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception as retrieved even when every caller has already gone
+        if not flight.task.cancelled():
+            flight.task.exception()
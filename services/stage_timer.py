@@ -0,0 +1,38 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Per-request stage totals in milliseconds. Tasks and to_thread calls started by the
+# request copy its context, so they add to the same dict.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def start_timing() -> Dict[str, float]:
+    """Start collecting stage timings for the current request"""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """Add the block's wall time to the current request's `name` stage, if timing is on"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format timings as a Server-Timing header value.
+
+    Stages that run in parallel (e.g. ingesting several documents) are summed, so
+    the stages can add up to more than the request's wall time.
+    """
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
@@ -0,0 +1,181 @@
+from typing import List, Dict, Set, Tuple
+
+# Insurance vocabulary shared by ingestion, intent analysis and rerank.
+# Each group is matched on whole words; simple inflections (-s, -es, -ed, -ing)
+# of a term's last word are matched as the term itself.
+LEXICON: Dict[str, List[str]] = {
+    # Section types (see SECTION_TYPES for priority order)
+    'definitions': ['definition', 'means', 'defined as', 'shall mean'],
+    'coverage': ['coverage', 'benefit', 'covered', 'insured', 'protection'],
+    'exclusions': ['exclusion', 'excluded', 'not covered', 'does not cover'],
+    'limits': ['limit', 'maximum', 'minimum', 'deductible', 'amount'],
+    'claims': ['claim', 'procedure', 'process', 'submit'],
+    'premiums': ['premium', 'payment', 'cost', 'fee'],
+    'conditions': ['condition', 'requirement', 'must', 'shall'],
+
+    # Query intent analysis
+    'key_terms': [
+        'grace period', 'waiting period', 'cooling period',
+        'pre-existing', 'pre existing', 'maternity', 'pregnancy',
+        'deductible', 'co-pay', 'copay', 'co-payment', 'copayment', 'excess',
+        'sum insured', 'coverage limit', 'room rent',
+        'icu charges', 'hospitalization', 'outpatient',
+        'cashless', 'reimbursement', 'claim settlement',
+        'no claim discount', 'ncd', 'bonus'
+    ],
+    'period_terms': ['grace period', 'waiting period', 'cooling period'],
+    'pre_existing_terms': ['pre-existing', 'pre existing', 'ped'],
+    'maternity_terms': ['maternity', 'pregnancy', 'childbirth'],
+    # Whole words: 'co-pay' no longer matches inside 'co-payment', so each spelling is listed
+    'deductible_terms': ['deductible', 'co-pay', 'copay', 'co-payment', 'copayment', 'excess'],
+    'time_units': ['days', 'months', 'years', 'period', 'duration'],
+    'amount_terms': ['amount', 'limit', 'maximum', 'minimum', 'sum'],
+    'coverage_cues': ['covered', 'coverage', 'benefit', 'include', 'does cover'],
+    'exclusion_cues': ['excluded', 'exclusion', 'not covered', 'does not cover'],
+    'numerical_cues': [
+        'how much', 'how many', 'what is the amount',
+        'what is the limit', 'how long', 'duration',
+        'period', 'days', 'months', 'years',
+        'percentage', 'rate', 'cost', 'premium'
+    ],
+    'definition_cues': [
+        'what is', 'what does', 'define', 'definition',
+        'meaning', 'explain', 'what are'
+    ],
+    'specific_value_cues': [
+        'what is the', 'how much is the', 'what\'s the',
+        'how many', 'how long is the', 'what are the limits'
+    ],
+    'value_words': ['amount', 'limit', 'period', 'days', 'months'],
+
+    # Hybrid rerank: query side
+    'definition_query': ['definition', 'define', 'what is', 'meaning'],
+    'coverage_query': ['covered', 'coverage', 'benefit', 'include'],
+    'exclusion_query': ['excluded', 'exclusion', 'not covered', 'exception'],
+    'rerank_topics': ['premium', 'deductible', 'claim', 'hospitalization', 'pre-existing', 'waiting period'],
+
+    # Hybrid rerank: chunk side
+    'definition_markers': ['means', 'definition'],
+    'coverage_markers': ['covered', 'coverage', 'benefit', 'include', 'pay', 'reimburse'],
+    'exclusion_markers': ['excluded', 'exclusion', 'not covered', 'exception', 'does not'],
+    'time_markers': ['days', 'months', 'years'],
+    'amount_markers': ['limit', 'amount', 'maximum', 'minimum', 'sum', 'usd', 'inr', '$'],
+    'topic_premium': ['premium', 'payment', 'cost'],
+    'topic_deductible': ['deductible', 'excess', 'co-pay', 'copay', 'co-payment', 'copayment'],
+    'topic_claim': ['claim', 'settlement', 'reimbursement'],
+    'topic_hospitalization': ['hospitalization', 'hospital', 'inpatient'],
+    'topic_pre-existing': ['pre-existing', 'pre existing', 'prior condition'],
+    'topic_waiting period': ['waiting period', 'waiting', 'exclusion period'],
+}
+
+# Priority order used by DocumentProcessor.detect_section_type
+SECTION_TYPES = ['definitions', 'coverage', 'exclusions', 'limits', 'claims', 'premiums', 'conditions']
+
+# Chunk-side groups precomputed at ingestion and stored in chunk metadata
+CHUNK_GROUPS = SECTION_TYPES + [
+    'definition_markers', 'coverage_markers', 'exclusion_markers', 'time_markers', 'amount_markers',
+    'topic_premium', 'topic_deductible', 'topic_claim', 'topic_hospitalization',
+    'topic_pre-existing', 'topic_waiting period'
+]
+
+# Byte translation table that turns every ASCII character except letters, digits and
+# '$' into a space; non-ASCII bytes (e.g. the UTF-8 of '₹') are kept inside tokens.
+_SEPARATORS = bytes(
+    byte if byte > 127 or chr(byte).isalnum() or chr(byte) == '$' else 32
+    for byte in range(256)
+)
+_CURRENCY_SYMBOLS = ['$', '₹']
+
+
+def _normalize(text: str) -> bytes:
+    """Lowercase, split currency symbols into their own tokens and collapse separators"""
+    text = text.lower()
+    for symbol in _CURRENCY_SYMBOLS:
+        if symbol in text:
+            text = text.replace(symbol, f' {symbol} ')
+    return text.encode('utf-8').translate(_SEPARATORS)
+
+
+class TermMatcher:
+    """Multi-pattern matcher compiled into hash tables over word tokens.
+
+    Text is normalized and tokenized in one C-level pass; single-word terms are
+    found by one set intersection and multi-word terms are only probed when their
+    first word occurs, so every hit (including overlapping and nested terms) comes
+    out of a single pass with whole-word boundaries.
+    """
+
+    def __init__(self, lexicon: Dict[str, List[str]]):
+        self.lexicon = lexicon
+        single: Dict[bytes, Set[Tuple[str, str]]] = {}
+        phrases: Dict[bytes, Dict[bytes, Set[Tuple[str, str]]]] = {}
+        for group, terms in lexicon.items():
+            for term in terms:
+                for tokens in self._term_variants(term):
+                    if len(tokens) == 1:
+                        single.setdefault(tokens[0], set()).add((group, term))
+                    else:
+                        phrase = b' ' + b' '.join(tokens) + b' '
+                        phrases.setdefault(tokens[0], {}).setdefault(phrase, set()).add((group, term))
+        self._single = {token: frozenset(found) for token, found in single.items()}
+        self._phrases = {
+            first: [(phrase, frozenset(found)) for phrase, found in variants.items()]
+            for first, variants in phrases.items()
+        }
+
+    def _term_variants(self, term: str) -> List[Tuple[bytes, ...]]:
+        """Token sequences for a term and the simple inflections of its last word"""
+        tokens = tuple(_normalize(term).split())
+        if not tokens:
+            return []
+        last = tokens[-1]
+        if not last.isalpha():
+            return [tokens]
+        stem = last[:-1] if last.endswith(b'e') else last
+        inflections = {last, last + b's', last + b'es', stem + b'ed', stem + b'ing'}
+        return [tokens[:-1] + (word,) for word in inflections]
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """Return {group: matched terms} for every group with at least one hit"""
+        if not text:
+            return {}
+        tokens = _normalize(text).split()
+        present = set(tokens)
+        terminals = [self._single[token] for token in present.intersection(self._single)]
+        
+        starts = present.intersection(self._phrases)
+        if starts:
+            joined = b' ' + b' '.join(tokens) + b' '
+            for first in starts:
+                for phrase, found in self._phrases[first]:
+                    if phrase in joined:
+                        terminals.append(found)
+        
+        hits: Dict[str, Set[str]] = {}
+        for group, term in frozenset().union(*terminals):
+            if group in hits:
+                hits[group].add(term)
+            else:
+                hits[group] = {term}
+        return hits
+
+    def ordered(self, hits: Dict[str, Set[str]], group: str) -> List[str]:
+        """Matched terms of a group in lexicon order"""
+        found = hits.get(group)
+        if not found:
+            return []
+        return [term for term in self.lexicon[group] if term in found]
+
+    def section_type(self, hits: Dict[str, Set[str]]) -> str:
+        """Highest-priority section type present in the hits"""
+        for section_type in SECTION_TYPES:
+            if section_type in hits:
+                return section_type
+        return 'policy_clause'
+
+    def chunk_groups(self, hits: Dict[str, Set[str]]) -> List[str]:
+        """Chunk-side groups to store in chunk metadata for rerank"""
+        return [group for group in CHUNK_GROUPS if group in hits]
+
+
+term_matcher = TermMatcher(LEXICON)
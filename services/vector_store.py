@@ -1,51 +1,41 @@
+import asyncio
+import heapq
+import itertools
 import faiss
 import numpy as np
 import json
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from models.schemas import DocumentChunk, RetrievalResult
 from config.settings import settings
+from services.term_matcher import term_matcher
 
 class VectorStore:
-    def __init__(self):
-        """Initialize FAISS vector store"""
+    def __init__(self, index_path: Optional[str] = settings.FAISS_INDEX_PATH, metadata_path: Optional[str] = settings.FAISS_METADATA_PATH):
+        """Initialize FAISS vector store (in memory only when no paths are given)"""
         self.dimension = 384  # all-MiniLM-L6-v2 dimension
         self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
         self.chunks_metadata = {}  # Store full chunk data
-        self.index_path = settings.FAISS_INDEX_PATH
-        self.metadata_path = settings.FAISS_METADATA_PATH
+        self.section_index = None  # One centroid per document section, when sections are worth ranking
+        self.section_chunks: List[np.ndarray] = []  # Chunk positions of each section_index row
+        self.metadata_masks: Dict[str, Dict[Any, np.ndarray]] = {}  # key -> value -> membership bitmap over positions
+        self.index_path = index_path
+        self.metadata_path = metadata_path
         
         # Load existing index if available
         self._load_index()
     
-    def store_chunks(self, chunks: List[DocumentChunk]):
-        """Store document chunks in FAISS index"""
+    def store_chunks(self, chunks: List[DocumentChunk], embeddings: np.ndarray):
+        """Store document chunks in FAISS index; each chunk's embedding_row indexes `embeddings`"""
         if not chunks:
             return
             
         # Clear existing data
         self.clear_index()
         
-        vectors = []
-        for chunk in chunks:
-            if chunk.embedding:
-                # Normalize for cosine similarity
-                embedding = np.array(chunk.embedding, dtype=np.float32)
-                embedding = embedding / np.linalg.norm(embedding)
-                vectors.append(embedding)
-                
-                # Store full chunk data
-                self.chunks_metadata[len(vectors) - 1] = {
-                    "id": chunk.id,
-                    "text": chunk.text,
-                    "metadata": chunk.metadata
-                }
-        
-        if vectors:
-            # Add to FAISS index
-            vectors_array = np.array(vectors, dtype=np.float32)
-            self.index.add(vectors_array)
-            print(f"Stored {len(vectors)} chunks in FAISS index")
+        added = self.add_chunks(chunks, embeddings)
+        if added:
+            print(f"Stored {added} chunks in FAISS index")
             
             # Print metadata distribution for debugging
             types = {}
@@ -55,69 +45,247 @@ class VectorStore:
             
             print(f"   Chunk types: {dict(sorted(types.items(), key=lambda x: x[1], reverse=True))}")
             
+            if self.section_index is not None:
+                print(f"   Section index: {self.section_index.ntotal} sections")
+            
             # Save to disk
             self._save_index()
     
-    def search_similar(self, query_embedding: List[float], top_k: int = 4, metadata_filter: Dict = None, debug: bool = False, query_text: str = None, query_intent: Dict = None) -> List[RetrievalResult]:
-        """Enhanced search with better scoring and filtering"""
+    def add_chunks(self, chunks: List[DocumentChunk], embeddings: np.ndarray) -> int:
+        """Append chunks to the index without clearing it; each chunk's embedding_row indexes `embeddings`"""
+        rows = [chunk.embedding_row for chunk in chunks if chunk.embedding_row is not None]
+        if not rows:
+            return 0
+        # The common case (every chunk, in order) hands the encoder's matrix to FAISS without a copy
+        if rows == list(range(len(embeddings))):
+            vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        else:
+            vectors = np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+        # Normalize in bulk for cosine similarity (a no-op pass for the model's normalized rows)
+        faiss.normalize_L2(vectors)
+        first = self.index.ntotal
+        self.index.add(vectors)
+        
+        # Store full chunk data
+        stored = [chunk for chunk in chunks if chunk.embedding_row is not None]
+        for position, chunk in enumerate(stored, first):
+            self.chunks_metadata[position] = {
+                "id": chunk.id,
+                "text": chunk.text,
+                "metadata": chunk.metadata
+            }
+        self._build_section_index()
+        self._build_metadata_masks()
+        return len(rows)
+    
+    def copy(self) -> "VectorStore":
+        """In-memory copy that can be extended while this store keeps serving searches"""
+        store = VectorStore(index_path=None, metadata_path=None)
+        store.index = faiss.clone_index(self.index)
+        store.chunks_metadata = {position: self.chunks_metadata[position] for position in range(self.index.ntotal)}
+        store.section_index, store.section_chunks = self.section_index, self.section_chunks
+        store.metadata_masks = self.metadata_masks
+        return store
+    
+    def search_similar(self, query_embedding: np.ndarray, top_k: int = 4, metadata_filter: Dict = None, debug: bool = False, query_text: str = None, query_intent: Dict = None,
+                       search_k: int = None, threshold: float = None) -> List[RetrievalResult]:
+        """Enhanced search with better scoring and filtering; search_k and threshold default to settings"""
         try:
             if self.index.ntotal == 0:
                 return []
             
-            # Normalize query embedding
-            query_vector = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
-            query_vector = query_vector / np.linalg.norm(query_vector)
+            query_vector = self._normalize_query(query_embedding)
+            candidates = self.search_candidates(query_vector, search_k or settings.MAX_SEARCH_CANDIDATES, metadata_filter, debug)
+            return self.rank_candidates(candidates, top_k, query_text, query_intent, threshold)
             
-            # Search more candidates for better filtering
-            search_k = min(settings.MAX_SEARCH_CANDIDATES, self.index.ntotal)
-            scores, indices = self.index.search(query_vector, search_k)
+        except Exception as e:
+            raise Exception(f"Failed to search vectors: {str(e)}")
+    
+    @staticmethod
+    async def federated_search(stores: List["VectorStore"], query_embedding: np.ndarray, top_k: int = 4, metadata_filter: Dict = None, query_text: str = None, query_intent: Dict = None,
+                               search_k: int = None, threshold: float = None) -> List[RetrievalResult]:
+        """Search several document indexes concurrently and rerank one merged candidate pool"""
+        try:
+            stores = [store for store in stores if store.index.ntotal]
+            if not stores:
+                return []
+            search_k = search_k or settings.MAX_SEARCH_CANDIDATES
+            if len(stores) == 1:
+                return stores[0].search_similar(query_embedding, top_k, metadata_filter, query_text=query_text, query_intent=query_intent,
+                                                search_k=search_k, threshold=threshold)
             
-            if debug:
-                print(f"   Searched {search_k} candidates from {self.index.ntotal} total chunks")
+            # FAISS releases the GIL during search, so per-document searches overlap
+            query_vector = VectorStore._normalize_query(query_embedding)
+            per_store = await asyncio.gather(*[
+                asyncio.to_thread(store.search_candidates, query_vector, search_k, metadata_filter)
+                for store in stores
+            ])
             
-            results = []
-            filtered_count = 0
+            # Global candidate pool by raw similarity, so hybrid scores are comparable across documents
+            merged = heapq.nlargest(search_k, itertools.chain.from_iterable(per_store), key=lambda candidate: candidate[0])
+            return stores[0].rank_candidates(merged, top_k, query_text, query_intent, threshold)
             
-            for score, idx in zip(scores[0], indices[0]):
-                if idx == -1:
-                    continue
-                    
-                chunk_data = self.chunks_metadata.get(idx)
-                if not chunk_data:
-                    continue
-                
-                # Apply metadata filtering
-                if metadata_filter and not self._matches_filter(chunk_data["metadata"], metadata_filter):
-                    filtered_count += 1
-                    continue
-                
-                # Advanced hybrid scoring with insurance-specific optimizations
-                enhanced_score = self._calculate_enhanced_score(score, chunk_data["metadata"], query_text, chunk_data["text"], query_intent)
-                
-                # Apply similarity threshold
-                if enhanced_score < settings.SIMILARITY_THRESHOLD:
-                    continue
-                
-                chunk = DocumentChunk(
-                    id=chunk_data["id"],
-                    text=chunk_data["text"],
-                    metadata=chunk_data["metadata"]
-                )
+        except Exception as e:
+            raise Exception(f"Failed to search vectors: {str(e)}")
+    
+    @staticmethod
+    def _normalize_query(query_embedding: np.ndarray) -> np.ndarray:
+        """Query embedding as a normalized (1, dim) float32 array"""
+        query_vector = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(query_vector)
+        return query_vector
+    
+    def search_candidates(self, query_vector: np.ndarray, search_k: int, metadata_filter: Dict = None, debug: bool = False, top_sections: int = None) -> List[Tuple[float, Dict]]:
+        """Raw (similarity, chunk data) candidates from this index, metadata filter applied"""
+        # Filters on indexed metadata keys become a bitmap, so FAISS only scores eligible chunks
+        mask, metadata_filter = self._filter_mask(metadata_filter)
+        if mask is None:
+            # Long documents: only chunks of the sections closest to the query are compared
+            selected = self._select_sections(query_vector, search_k, top_sections)
+            if selected is not None:
+                mask = np.zeros(self.index.ntotal, dtype=bool)
+                mask[selected] = True
+        
+        eligible = self.index.ntotal if mask is None else int(np.count_nonzero(mask))
+        search_k = min(search_k, eligible)
+        if search_k == 0:
+            return []
+        if mask is None:
+            scores, indices = self.index.search(query_vector, search_k)
+        else:
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            scores, indices = self.index.search(query_vector, search_k, params=faiss.SearchParameters(sel=selector))
+        
+        if debug:
+            print(f"   Searched {search_k} candidates from {eligible} of {self.index.ntotal} total chunks")
+        
+        candidates = []
+        filtered_count = 0
+        for score, idx in zip(scores[0], indices[0]):
+            if idx == -1:
+                continue
                 
-                results.append(RetrievalResult(
-                    chunk=chunk,
-                    score=enhanced_score
-                ))
+            chunk_data = self.chunks_metadata.get(idx)
+            if not chunk_data:
+                continue
             
-            if debug and filtered_count > 0:
-                print(f"   Filtered {filtered_count} chunks by metadata")
+            # Apply metadata filtering
+            if metadata_filter and not self._matches_filter(chunk_data["metadata"], metadata_filter):
+                filtered_count += 1
+                continue
             
-            # Sort by enhanced score and return top_k
-            results.sort(key=lambda x: x.score, reverse=True)
-            return results[:top_k]
+            candidates.append((float(score), chunk_data))
+        
+        if debug and filtered_count > 0:
+            print(f"   Filtered {filtered_count} chunks by metadata")
+        
+        return candidates
+    
+    def _filter_mask(self, metadata_filter: Dict = None) -> Tuple[Optional[np.ndarray], Dict]:
+        """Bitmap of chunks matching the filter on indexed keys, and the conditions left to check per candidate"""
+        mask = None
+        remaining = {}
+        for key, value in (metadata_filter or {}).items():
+            masks = self.metadata_masks.get(key)
+            if masks is None:
+                remaining[key] = value
+                continue
+            value_mask = masks.get(value)
+            if value_mask is None:
+                return np.zeros(self.index.ntotal, dtype=bool), {}
+            mask = value_mask if mask is None else mask & value_mask
+        return mask, remaining
+    
+    def _build_metadata_masks(self):
+        """Per-value membership bitmaps for the metadata keys filters usually target"""
+        self.metadata_masks = {}
+        total = self.index.ntotal
+        for key in settings.FILTERABLE_METADATA_KEYS:
+            positions: Dict[Any, List[int]] = {}
+            for position in range(total):
+                metadata = self.chunks_metadata.get(position, {}).get("metadata", {})
+                value = metadata.get(key)
+                if value is not None and not isinstance(value, (list, dict)):
+                    positions.setdefault(value, []).append(position)
+            masks = {}
+            for value, members in positions.items():
+                masks[value] = np.zeros(total, dtype=bool)
+                masks[value][members] = True
+            self.metadata_masks[key] = masks
+    
+    def _select_sections(self, query_vector: np.ndarray, search_k: int, top_sections: int = None) -> Optional[np.ndarray]:
+        """Chunk positions in the sections most similar to the query, or None to search every chunk"""
+        top_sections = settings.SECTION_SEARCH_TOP_SECTIONS if top_sections is None else top_sections
+        if self.section_index is None or not top_sections or not settings.SECTION_SEARCH_ENABLED:
+            return None
+        
+        _, order = self.section_index.search(query_vector, self.section_index.ntotal)
+        selected = []
+        covered = 0
+        for rank, section in enumerate(order[0]):
+            # Take at least top_sections, and enough of them to fill the candidate list
+            if rank >= top_sections and covered >= search_k:
+                break
+            selected.append(self.section_chunks[section])
+            covered += len(self.section_chunks[section])
+        if covered >= self.index.ntotal:
+            return None
+        return np.concatenate(selected)
+    
+    def _build_section_index(self):
+        """Index the mean embedding of each section's chunks, used to narrow chunk search"""
+        self.section_index = None
+        self.section_chunks = []
+        if not settings.SECTION_SEARCH_ENABLED or self.index.ntotal == 0:
+            return
+        
+        members: Dict[int, List[int]] = {}
+        for position in range(self.index.ntotal):
+            section = self.chunks_metadata.get(position, {}).get("metadata", {}).get("section_index")
+            if section is None:
+                return  # Chunked before sections were recorded; search flat
+            members.setdefault(section, []).append(position)
+        if len(members) < settings.SECTION_SEARCH_MIN_SECTIONS:
+            return
+        
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        self.section_chunks = [np.array(positions, dtype=np.int64) for positions in members.values()]
+        centroids = np.stack([vectors[positions].mean(axis=0) for positions in self.section_chunks]).astype(np.float32)
+        faiss.normalize_L2(centroids)
+        self.section_index = faiss.IndexFlatIP(self.dimension)
+        self.section_index.add(centroids)
+    
+    def rank_candidates(self, candidates: List[Tuple[float, Dict]], top_k: int, query_text: str = None, query_intent: Dict = None, threshold: float = None) -> List[RetrievalResult]:
+        """Hybrid-score candidates, apply the similarity threshold and keep the top_k"""
+        if threshold is None:
+            threshold = settings.SIMILARITY_THRESHOLD
+        # Match the query against the lexicon once, not once per candidate
+        query_hits = term_matcher.match(query_text) if query_text else None
+        
+        results = []
+        for score, chunk_data in candidates:
+            # Advanced hybrid scoring with insurance-specific optimizations
+            enhanced_score = self._calculate_enhanced_score(score, chunk_data["metadata"], query_text, chunk_data["text"], query_intent, query_hits)
             
-        except Exception as e:
-            raise Exception(f"Failed to search vectors: {str(e)}")
+            # Apply similarity threshold
+            if enhanced_score < threshold:
+                continue
+            
+            chunk = DocumentChunk(
+                id=chunk_data["id"],
+                text=chunk_data["text"],
+                metadata=chunk_data["metadata"]
+            )
+            
+            results.append(RetrievalResult(
+                chunk=chunk,
+                score=enhanced_score
+            ))
+        
+        # Sort by enhanced score and return top_k
+        results.sort(key=lambda x: x.score, reverse=True)
+        return results[:top_k]
     
     def _matches_filter(self, metadata: Dict, filter_dict: Dict) -> bool:
         """Check if metadata matches filter criteria"""
@@ -126,7 +294,7 @@ class VectorStore:
                 return False
         return True
     
-    def _calculate_enhanced_score(self, base_score: float, metadata: Dict, query_text: str = None, chunk_text: str = None, query_intent: Dict = None) -> float:
+    def _calculate_enhanced_score(self, base_score: float, metadata: Dict, query_text: str = None, chunk_text: str = None, query_intent: Dict = None, query_hits: Dict = None) -> float:
         """Advanced hybrid scoring for insurance policy retrieval"""
         score = base_score
         
@@ -173,8 +341,13 @@ class VectorStore:
             query_lower = query_text.lower()
             chunk_lower = chunk_text.lower()
             
-            # Insurance-specific query patterns
-            score = self._apply_insurance_query_boosts(score, query_lower, chunk_lower, section_type)
+            # Insurance-specific query patterns, using term groups precomputed at ingestion
+            if query_hits is None:
+                query_hits = term_matcher.match(query_lower)
+            chunk_groups = metadata.get('term_groups')
+            if chunk_groups is None:
+                chunk_groups = term_matcher.chunk_groups(term_matcher.match(chunk_lower))
+            score = self._apply_insurance_query_boosts(score, query_hits, set(chunk_groups), section_type, metadata.get('has_numbers', False))
             
             # Keyword density scoring
             score = self._apply_keyword_density_boost(score, query_lower, chunk_lower)
@@ -184,50 +357,40 @@ class VectorStore:
         
         return score
     
-    def _apply_insurance_query_boosts(self, score: float, query_lower: str, chunk_lower: str, section_type: str) -> float:
+    def _apply_insurance_query_boosts(self, score: float, query_hits: Dict[str, Set[str]], chunk_groups: Set[str], section_type: str, has_numbers: bool = False) -> float:
         """Apply insurance domain-specific query boosts"""
         
         # Definition queries
-        if any(word in query_lower for word in ['definition', 'define', 'what is', 'meaning']):
-            if 'means' in chunk_lower or 'definition' in chunk_lower:
+        if 'definition_query' in query_hits:
+            if 'definition_markers' in chunk_groups:
                 score *= 2.2
             if section_type == 'definitions':
                 score *= 1.8
         
         # Coverage/benefit queries
-        if any(word in query_lower for word in ['covered', 'coverage', 'benefit', 'include']):
-            if any(word in chunk_lower for word in ['covered', 'coverage', 'benefit', 'include', 'pay', 'reimburse']):
+        if 'coverage_query' in query_hits:
+            if 'coverage_markers' in chunk_groups:
                 score *= 1.8
         
         # Exclusion queries
-        if any(word in query_lower for word in ['excluded', 'exclusion', 'not covered', 'exception']):
-            if any(word in chunk_lower for word in ['excluded', 'exclusion', 'not covered', 'exception', 'does not']):
+        if 'exclusion_query' in query_hits:
+            if 'exclusion_markers' in chunk_groups:
                 score *= 1.9
         
         # Time period queries
-        if any(word in query_lower for word in ['days', 'months', 'years', 'period', 'duration']):
-            if any(char.isdigit() for char in chunk_lower) and any(word in chunk_lower for word in ['days', 'months', 'years']):
+        if 'time_units' in query_hits:
+            if has_numbers and 'time_markers' in chunk_groups:
                 score *= 1.7
         
         # Limit/amount queries
-        if any(word in query_lower for word in ['limit', 'amount', 'maximum', 'minimum', 'sum']):
-            if any(word in chunk_lower for word in ['limit', 'amount', 'maximum', 'minimum', 'sum', 'usd', 'inr', '$']):
+        if 'amount_terms' in query_hits:
+            if 'amount_markers' in chunk_groups:
                 score *= 1.6
         
         # Specific insurance terms
-        insurance_terms = {
-            'premium': ['premium', 'payment', 'cost'],
-            'deductible': ['deductible', 'excess', 'co-pay'],
-            'claim': ['claim', 'settlement', 'reimbursement'],
-            'hospitalization': ['hospitalization', 'hospital', 'inpatient'],
-            'pre-existing': ['pre-existing', 'pre existing', 'prior condition'],
-            'waiting period': ['waiting period', 'waiting', 'exclusion period']
-        }
-        
-        for query_term, chunk_terms in insurance_terms.items():
-            if query_term in query_lower:
-                if any(term in chunk_lower for term in chunk_terms):
-                    score *= 1.5
+        for query_term in query_hits.get('rerank_topics', ()):
+            if f'topic_{query_term}' in chunk_groups:
+                score *= 1.5
         
         return score
     
@@ -285,38 +448,66 @@ class VectorStore:
         return results[:limit]
     
     def clear_index(self):
-        """Clear FAISS index but keep metadata for debugging"""
+        """Clear the FAISS index and its chunk metadata; recent retrievals are traced by DebugStore instead"""
         self.index = faiss.IndexFlatIP(self.dimension)
-        # Don't clear metadata - keep for debugging
-        # self.chunks_metadata.clear()
-        
-        # Remove only index file, keep metadata
-        if os.path.exists(self.index_path):
-            os.remove(self.index_path)
-        # Keep metadata file for debugging
-        # if os.path.exists(self.metadata_path):
-        #     os.remove(self.metadata_path)
+        self.chunks_metadata = {}
+        self.section_index = None
+        self.section_chunks = []
+        self.metadata_masks = {}
+        
+        for path in (self.index_path, self.metadata_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the index vectors and chunk metadata"""
+        vector_bytes = self.index.ntotal * self.dimension * 4
+        if self.section_index is not None:
+            vector_bytes += self.section_index.ntotal * self.dimension * 4 + self.index.ntotal * 8
+        vector_bytes += sum(len(masks) for masks in self.metadata_masks.values()) * self.index.ntotal
+        # Chunk text plus roughly 2.4 KB of dict, key and metadata overhead per chunk
+        metadata_bytes = sum(len(chunk_data["text"]) + 2400 for chunk_data in self.chunks_metadata.values())
+        return vector_bytes + metadata_bytes
+    
+    def save_to(self, index_path: str, metadata_path: str):
+        """Write the FAISS index and chunk metadata to the given files"""
+        faiss.write_index(self.index, index_path)
+        with open(metadata_path, 'w') as f:
+            json.dump(self.chunks_metadata, f)
+    
+    @classmethod
+    def load_from(cls, index_path: str, metadata_path: str) -> "VectorStore":
+        """In-memory store read back from files written by save_to"""
+        store = cls(index_path=None, metadata_path=None)
+        store.index = faiss.read_index(index_path)
+        with open(metadata_path, 'r') as f:
+            # Convert string keys back to integers
+            store.chunks_metadata = {int(k): v for k, v in json.load(f).items()}
+        store._build_section_index()
+        store._build_metadata_masks()
+        return store
     
     def _save_index(self):
         """Save FAISS index and metadata to disk"""
+        if not self.index_path or not self.metadata_path:
+            return
         try:
-            faiss.write_index(self.index, self.index_path)
-            with open(self.metadata_path, 'w') as f:
-                json.dump(self.chunks_metadata, f)
+            self.save_to(self.index_path, self.metadata_path)
         except Exception as e:
             print(f"Warning: Could not save index: {e}")
     
     def _load_index(self):
         """Load FAISS index and metadata from disk"""
+        if not self.index_path or not self.metadata_path:
+            return
         try:
             if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-                self.index = faiss.read_index(self.index_path)
-                with open(self.metadata_path, 'r') as f:
-                    # Convert string keys back to integers
-                    metadata = json.load(f)
-                    self.chunks_metadata = {int(k): v for k, v in metadata.items()}
+                loaded = self.load_from(self.index_path, self.metadata_path)
+                self.index, self.chunks_metadata = loaded.index, loaded.chunks_metadata
+                self.section_index, self.section_chunks = loaded.section_index, loaded.section_chunks
+                self.metadata_masks = loaded.metadata_masks
                 print(f"Loaded existing FAISS index with {self.index.ntotal} vectors")
         except Exception as e:
             print(f"Warning: Could not load existing index: {e}")
             self.index = faiss.IndexFlatIP(self.dimension)
-            self.chunks_metadata = {}
\ No newline at end of file
+            self.chunks_metadata = {}